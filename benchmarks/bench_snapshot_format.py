@@ -0,0 +1,79 @@
+import os
+import sys
+import json
+import time
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from src.models.snapshot_format import encode_compact, decode_snapshot
+
+
+DEFAULT_INPUT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'models', 'json', 'permissions.json')
+
+
+def best_of(func, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def scale_permissions(permissions, copies):
+    if copies <= 1:
+        return permissions
+    entries = permissions['Permissions']
+    return {'Permissions': {
+        f"{name}#{i}" if i else name: value
+        for i in range(copies) for name, value in entries.items()
+    }}
+
+
+def run(permissions, bandwidth, repeat):
+    formats = {
+        'json (indent=4)': lambda: json.dumps(permissions, indent=4, ensure_ascii=False).encode('utf-8'),
+        'json (compact)': lambda: json.dumps(permissions, separators=(',', ':'), ensure_ascii=False).encode('utf-8'),
+        'compact v1': lambda: encode_compact(permissions),
+    }
+    results = []
+    for name, encode in formats.items():
+        data = encode()
+        results.append({
+            'format': name,
+            'bytes': len(data),
+            'encode_ms': best_of(encode, repeat) * 1000,
+            'parse_ms': best_of(lambda: decode_snapshot(data), repeat) * 1000,
+            'transfer_ms': len(data) / bandwidth * 1000,
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare permissions.json against the compact snapshot format")
+    parser.add_argument('--input', default=DEFAULT_INPUT)
+    parser.add_argument('--copies', type=int, default=1, help="repeat every entry N times to simulate larger files")
+    parser.add_argument('--bandwidth', type=float, default=256 * 1024, help="link speed in bytes/s for the transfer estimate")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--json', action='store_true', help="print results as JSON")
+    args = parser.parse_args()
+
+    with open(args.input, 'r', encoding='utf-8') as file:
+        permissions = scale_permissions(json.load(file), args.copies)
+
+    results = run(permissions, args.bandwidth, args.repeat)
+    if args.json:
+        print(json.dumps({'entries': len(permissions['Permissions']), 'results': results}, indent=2))
+        return
+
+    print(f"{len(permissions['Permissions'])} permissions, transfer estimate at {args.bandwidth / 1024:.0f} KB/s")
+    print(f"{'format':<18}{'bytes':>12}{'encode ms':>12}{'parse ms':>12}{'transfer ms':>14}")
+    for result in results:
+        print(f"{result['format']:<18}{result['bytes']:>12}{result['encode_ms']:>12.2f}"
+              f"{result['parse_ms']:>12.2f}{result['transfer_ms']:>14.1f}")
+
+
+if __name__ == '__main__':
+    main()
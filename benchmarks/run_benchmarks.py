@@ -0,0 +1,225 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import tempfile
+import statistics
+import contextlib
+from datetime import datetime, timezone
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, '..'))
+
+from PyQt6.QtCore import QT_VERSION_STR
+from PyQt6.QtWidgets import QApplication
+
+from s3_stub import LocalS3Stub
+from src.controllers.s3_transfer import S3Transfer
+from src.controllers.s3_cache import PERMISSIONS_KEY, DownloadCache, download_permissions
+from src.models.role_registry import DEFAULT_ROLES
+from src.models.change_set import ChangeSet
+from src.models.snapshot_format import encode_compact
+from src.models.model_version import ModelVersion
+from src.models.name_search import NameSearch, SearchQuery, FUZZY, REGEX
+from src.models.shared_tables import SharedTables
+from src.permissions.workspace import promotion_entries
+from src.ui.main_window import MainWindow
+from src.ui.workers import SaveRequest
+
+
+DEFAULT_SIZES = [1000, 10000, 100000]
+GROUPS = ["Battery1", "Battery2", "Controller", "Motor", "HMI", "Charger", "Derailleur", "Page"]
+FIELDS = ["Bank {} CRC", "Application flag {}", "Cell {} Voltage", "Temperature {}", "Firmware Version {}", "Serial {}"]
+
+
+def generate_permissions(size, seed=0):
+    # 依實際檔案的特性產生: 名稱為 <Group>Parameter_<Field>, 角色組合只有幾十種
+    rng = random.Random(seed)
+    role_sets = [sorted(rng.sample(DEFAULT_ROLES, rng.randint(1, len(DEFAULT_ROLES)))) for _ in range(30)]
+    entries = {}
+    for i in range(size):
+        group = GROUPS[i % len(GROUPS)]
+        field = FIELDS[(i // len(GROUPS)) % len(FIELDS)].format(i)
+        entries[f"{group}Parameter_{field}"] = {
+            'AllowedRoles': list(rng.choice(role_sets)),
+            'DefaultValue': rng.random() < 0.2,
+        }
+    return {'Permissions': entries}
+
+
+def measure(func, repeat, setup=None):
+    samples = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return {
+        'min_ms': round(min(samples), 3),
+        'median_ms': round(statistics.median(samples), 3),
+        'max_ms': round(max(samples), 3),
+        'repeat': repeat,
+    }
+
+
+def bench_size(app, size, repeat, workdir):
+    permissions = generate_permissions(size)
+    local_json_path = os.path.join(workdir, f"permissions_{size}.json")
+    with open(local_json_path, 'w', encoding='utf-8') as file:
+        json.dump(permissions, file, indent=4, ensure_ascii=False)
+
+    s3_client = LocalS3Stub()
+    with open(local_json_path, 'rb') as file:
+        s3_client.put_object(Bucket='bench', Key=PERMISSIONS_KEY, Body=file.read())
+    window = MainWindow(transfer=S3Transfer(s3_client, 'bench'), local_json_path=local_json_path, autoload=False)
+
+    results = {}
+
+    def parse(path):
+        worker = window.load_permissions_worker
+        worker.parse(path)
+        app.processEvents()
+        window.on_load_complete(True)
+
+    results['on_load_complete_parse'] = measure(lambda: parse(local_json_path), repeat)
+    # 程式實際載入的是壓縮快照 (.pcs)
+    snapshot_path = os.path.join(workdir, f"permissions_{size}.pcs")
+    with open(snapshot_path, 'wb') as file:
+        file.write(encode_compact(permissions))
+    results['on_load_complete_parse_snapshot'] = measure(lambda: parse(snapshot_path), repeat)
+    # ModelVersion 在 worker 中建立; GUI thread 只負責 adopt_version 的替換
+    results['build_version'] = measure(lambda: ModelVersion(permissions), repeat)
+    versions = []
+    results['adopt_version'] = measure(lambda: window.adopt_version(versions.pop()), repeat,
+                                       lambda: versions.append(ModelVersion(permissions)))
+
+    def filter_permissions(text):
+        window.search_input_permission.setText(text)
+        window.filter_permissions(text)
+        window.apply_filters()
+
+    def filter_roles(text):
+        window.search_input_roles.setText(text)
+        window.filter_roles(text)
+        window.apply_filters()
+
+    def clear_filters():
+        window.search_input_permission.setText('')
+        window.search_input_roles.setText('')
+        window.apply_filters()
+
+    results['filter_permissions'] = measure(lambda: filter_permissions('bank 1'), repeat, clear_filters)
+    results['filter_roles'] = measure(lambda: filter_roles('charger'), repeat, clear_filters)
+    clear_filters()
+
+    # 實際每次按鍵的成本: 視窗顯示中逐字輸入, 含 view 的重繪
+    window.show()
+    app.processEvents()
+    keys = []
+
+    def keystroke():
+        if not keys:
+            keys.extend(reversed(['bank 1'[:end] for end in range(len('bank 1') + 1)]))
+        filter_permissions(keys.pop())
+        app.processEvents()
+
+    results['filter_keystroke'] = measure(keystroke, repeat * 7)
+    clear_filters()
+    window.hide()
+    app.processEvents()
+
+    # 模糊 / regex 搜尋在 SearchWorker 中執行, 這裡直接量測 NameSearch
+    search = NameSearch()
+    search.sync(list(window.table_model.store.names))
+    results['search_fuzzy'] = measure(lambda: search.search(SearchQuery(FUZZY, 'bat1 crc 99')), repeat)
+    results['search_regex'] = measure(lambda: search.search(SearchQuery(REGEX, r'^motor.*bank \d+ ')), repeat)
+
+    # 工作區: 兩個環境共用 SharedTables, 來源比目標多 200 列變更時的差異比對
+    tables = SharedTables()
+    target_store = tables.store_from_dict(permissions)
+    source_store = tables.store_from_dict(permissions)
+    for row in range(0, size, max(1, size // 200)):
+        source_store.set_row(row, True, ['FW', 'Q'])
+    results['promote_diff'] = measure(lambda: promotion_entries(source_store, target_store), repeat)
+
+    # 模擬 enable_editing 的結果, 量測存檔的序列化與上傳 (本地 stub)
+    rows = range(0, size, max(1, size // 10))
+    rounds = []
+
+    def edit():
+        # 每輪寫入不同的值, 確保每次存檔都有變更
+        rounds.append(None)
+        for row in rows:
+            window.table_model.update_row(row, len(rounds) % 2 == 1, ['FW', 'Q'])
+            window.search_index.update_row(row)
+            window.dirty_rows.add(row)
+
+    # 同 save_changes, 但 worker 直接在這個 thread 執行, 並略過完成後的訊息框
+    save_worker = window.save_worker
+    saved = []
+    save_worker.finished.disconnect()
+    save_worker.finished.connect(lambda result, version: saved.append(result))
+    save_worker.error.disconnect()
+    save_worker.error.connect(lambda message: print(f"save error: {message}", file=sys.stderr))
+
+    # 基準版本的 ETag 與 S3 相同, 存檔不會走「S3 已變更 -> 下載 + 合併」的路徑
+    _, path = download_permissions(window.get_transfer(), local_json_path)
+    window.base_meta = DownloadCache(path).load()
+
+    def save():
+        change_set = ChangeSet.from_rows(
+            window.table_model.store, sorted(window.dirty_rows), window.permissions['Permissions'])
+        save_worker.request = SaveRequest(change_set, window.permissions, window.base_meta, False)
+        save_worker.run()
+        result = saved.pop()
+        if result.merged:
+            print("save merged with S3 changes, the sample is not a plain save", file=sys.stderr)
+        window.permissions = result.permissions
+        window.base_meta = DownloadCache(result.saved_path).load()
+        window.dirty_rows.clear()
+
+    results['enable_editing_save'] = measure(save, repeat, edit)
+
+    window.close()
+    window.deleteLater()
+    app.processEvents()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load / populate / filter / save benchmarks (offscreen Qt, stubbed S3)")
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', help="write JSON results to this file instead of stdout")
+    args = parser.parse_args()
+
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    report = {
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'qt': QT_VERSION_STR,
+        'platform': platform.platform(),
+        'results': [],
+    }
+    # 其他輸出導到 stderr, stdout 只輸出 JSON
+    with tempfile.TemporaryDirectory() as workdir, contextlib.redirect_stdout(sys.stderr):
+        for size in args.sizes:
+            for operation, timing in bench_size(app, size, args.repeat, workdir).items():
+                report['results'].append(dict(size=size, operation=operation, **timing))
+                print(f"{size:>8} {operation:<32} median {timing['median_ms']:>10.2f} ms", file=sys.stderr)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            file.write(output)
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+import io
+import hashlib
+from datetime import datetime, timezone
+from botocore.exceptions import ClientError
+
+
+def _client_error(code, status, operation):
+    return ClientError({'Error': {'Code': code, 'Message': code}, 'ResponseMetadata': {'HTTPStatusCode': status}}, operation)
+
+
+class LocalS3Stub:
+    # 取代 s3_client 的記憶體內實作, 只支援本程式用到的 API
+    def __init__(self):
+        self.objects = {}
+        self.calls = []
+
+    @staticmethod
+    def etag_of(data):
+        return '"%s"' % hashlib.md5(data).hexdigest()
+
+    def _metadata(self, key):
+        data, last_modified = self.objects[key]
+        return {
+            'ETag': self.etag_of(data),
+            'LastModified': last_modified,
+            'ContentLength': len(data),
+            'ResponseMetadata': {'HTTPStatusCode': 200, 'RetryAttempts': 0},
+        }
+
+    def _store(self, key, data):
+        self.objects[key] = (bytes(data), datetime.now(timezone.utc))
+
+    def _require(self, key, operation):
+        if key not in self.objects:
+            raise _client_error('NoSuchKey', 404, operation)
+
+    def head_object(self, Bucket, Key, **kwargs):
+        self.calls.append(('head_object', Key))
+        self._require(Key, 'HeadObject')
+        return self._metadata(Key)
+
+    def get_object(self, Bucket, Key, IfNoneMatch=None, **kwargs):
+        self.calls.append(('get_object', Key))
+        self._require(Key, 'GetObject')
+        response = self._metadata(Key)
+        if IfNoneMatch is not None and IfNoneMatch == response['ETag']:
+            raise _client_error('304', 304, 'GetObject')
+        response['Body'] = io.BytesIO(self.objects[Key][0])
+        return response
+
+    def put_object(self, Bucket, Key, Body, IfMatch=None, IfNoneMatch=None, **kwargs):
+        self.calls.append(('put_object', Key))
+        exists = Key in self.objects
+        if IfNoneMatch == '*' and exists:
+            raise _client_error('PreconditionFailed', 412, 'PutObject')
+        if IfMatch is not None and (not exists or IfMatch != self._metadata(Key)['ETag']):
+            raise _client_error('PreconditionFailed' if exists else 'NoSuchKey', 412 if exists else 404, 'PutObject')
+        self._store(Key, Body if isinstance(Body, (bytes, bytearray)) else Body.read())
+        return self._metadata(Key)
+
+    def upload_fileobj(self, Fileobj, Bucket, Key, ExtraArgs=None, Callback=None, Config=None):
+        self.calls.append(('upload_fileobj', Key))
+        data = Fileobj.read()
+        self._store(Key, data)
+        if Callback is not None:
+            Callback(len(data))
+
+    def copy_object(self, Bucket, Key, CopySource, **kwargs):
+        self.calls.append(('copy_object', Key))
+        self._require(CopySource['Key'], 'CopyObject')
+        self._store(Key, self.objects[CopySource['Key']][0])
+        return {'CopyObjectResult': {'ETag': self.etag_of(self.objects[Key][0])}}
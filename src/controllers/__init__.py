@@ -1 +1,3 @@
- 
+from .s3_cache import DownloadCache, conditional_download, download_permissions, cached_snapshot_path, PERMISSIONS_KEY, COMPACT_KEY, S3Layout, DEFAULT_LAYOUT
+from .s3_publish import publish_changes, fetch_remote_if_changed, RemoteChangedError, BACKUP_KEY
+from .s3_transfer import S3Transfer, TransferStats, create_s3_client, default_transfer_config, S3ClientPool
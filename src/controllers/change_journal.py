@@ -0,0 +1,54 @@
+import os
+import json
+from datetime import datetime, timezone
+from ..models.change_set import ChangeSet
+
+
+class ChangeJournal:
+    # 寫在 local_json_path 旁的 append-only 日誌 (JSON Lines)
+    # 存檔前先寫入日誌並 fsync, 上傳成功才清除; 離線時的變更會留到下次同步
+    def __init__(self, local_json_path):
+        self.path = local_json_path + '.journal'
+
+    def append(self, change_set, base_meta):
+        entry = {
+            'time': datetime.now(timezone.utc).isoformat(),
+            'base': base_meta,
+            'changes': [[name, before, after] for name, (before, after) in change_set.changes.items()],
+        }
+        line = json.dumps(entry, separators=(',', ':'), ensure_ascii=False) + '\n'
+        with open(self.path, 'a', encoding='utf-8') as file:
+            file.write(line)
+            file.flush()
+            os.fsync(file.fileno())
+
+    def entries(self):
+        if not os.path.exists(self.path):
+            return []
+        entries = []
+        with open(self.path, 'r', encoding='utf-8') as file:
+            for line in file:
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    # 寫到一半就當機的最後一行, 忽略
+                    break
+        return entries
+
+    def __bool__(self):
+        return os.path.exists(self.path) and os.path.getsize(self.path) > 0
+
+    def pending(self):
+        # 依序合併所有尚未同步的變更; 回傳 (ChangeSet, 第一筆的基準 meta)
+        # ChangeSet 保留第一次的 before, 三方合併以它為基準
+        change_set = ChangeSet()
+        entries = self.entries()
+        for entry in entries:
+            for name, before, after in entry['changes']:
+                change_set.record(name, before, after)
+        base_meta = entries[0].get('base', {}) if entries else {}
+        return change_set, base_meta
+
+    def clear(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
@@ -0,0 +1,160 @@
+import os
+import json
+
+
+class S3Layout:
+    # 一個權限集合在 bucket 中的 key; 不同環境 (staging / production) 以 prefix 區分
+    def __init__(self, prefix='InHouseTool/'):
+        self.prefix = prefix
+        self.permissions = prefix + 'permissions.json'
+        self.compact = prefix + 'permissions.pcs'
+        self.backup = prefix + 'backup/permissions.json'
+        self.patch_prefix = prefix + 'patches/'
+        self.history_prefix = prefix + 'history/'
+        self.history_index = self.history_prefix + 'index.json'
+        self.snapshot_prefix = self.history_prefix + 'snapshots/'
+
+
+DEFAULT_LAYOUT = S3Layout()
+PERMISSIONS_KEY = DEFAULT_LAYOUT.permissions
+COMPACT_KEY = DEFAULT_LAYOUT.compact
+CHUNK_SIZE = 64 * 1024
+
+
+def atomic_write(path, data):
+    # 先寫暫存檔並 fsync, 再以 rename 取代: 當機或斷電時不會留下寫到一半的檔案
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as file:
+        file.write(data)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(tmp_path, path)
+
+
+class DownloadCache:
+    # 在 local_json_path 旁邊記錄上次下載的 ETag / VersionId / LastModified
+    def __init__(self, local_path):
+        self.local_path = local_path
+        self.meta_path = local_path + '.meta.json'
+
+    def load(self):
+        if not os.path.exists(self.local_path):
+            return {}
+        try:
+            with open(self.meta_path, 'r', encoding='utf-8') as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return {}
+
+    def save(self, meta):
+        atomic_write(self.meta_path, json.dumps(meta).encode('utf-8'))
+
+    def clear(self):
+        if os.path.exists(self.meta_path):
+            os.remove(self.meta_path)
+
+
+def meta_from_response(key, response):
+    last_modified = response.get('LastModified')
+    return {
+        'Key': key,
+        'ETag': response.get('ETag'),
+        'VersionId': response.get('VersionId'),
+        'LastModified': last_modified.isoformat() if last_modified else None,
+    }
+
+
+def compact_path_for(local_json_path):
+    return os.path.splitext(local_json_path)[0] + '.pcs'
+
+
+def cached_snapshot_path(local_json_path):
+    # 上次成功下載 / 存檔留下的本地檔, 優先使用壓縮快照
+    compact_path = compact_path_for(local_json_path)
+    if os.path.exists(compact_path):
+        return compact_path
+    if os.path.exists(local_json_path):
+        return local_json_path
+    return None
+
+
+def is_missing(error):
+    response = getattr(error, 'response', {}) or {}
+    status = response.get('ResponseMetadata', {}).get('HTTPStatusCode')
+    code = str(response.get('Error', {}).get('Code', ''))
+    return status == 404 or code in ('404', 'NoSuchKey', 'NotFound')
+
+
+def is_not_modified(error):
+    response = getattr(error, 'response', {}) or {}
+    status = response.get('ResponseMetadata', {}).get('HTTPStatusCode')
+    code = str(response.get('Error', {}).get('Code', ''))
+    return status == 304 or code in ('304', 'NotModified')
+
+
+def is_precondition_failed(error):
+    # 條件式寫入失敗: 物件已被其他人修改 (412), 或同時有另一個條件式寫入 (409)
+    response = getattr(error, 'response', {}) or {}
+    status = response.get('ResponseMetadata', {}).get('HTTPStatusCode')
+    code = str(response.get('Error', {}).get('Code', ''))
+    return status in (409, 412) or code in ('PreconditionFailed', 'ConditionalRequestConflict')
+
+
+def is_connection_error(error):
+    # 連不到 S3 (離線 / 逾時), 與 S3 回傳的錯誤 (權限 / 不存在) 區分
+    from botocore.exceptions import ConnectionError as BotoConnectionError, HTTPClientError
+    return isinstance(error, (BotoConnectionError, HTTPClientError, ConnectionError, TimeoutError))
+
+
+def conditional_download(s3_client, bucket, key, local_path, callback=None):
+    # 以 IfNoneMatch 發出條件式 GET, 物件沒變動 (304) 時不傳輸也不覆寫本地檔
+    # 回傳 True 表示本地檔已更新; callback(bytes_amount) 每讀一段呼叫一次
+    cache = DownloadCache(local_path)
+    meta = cache.load()
+
+    request = {'Bucket': bucket, 'Key': key}
+    if meta.get('ETag'):
+        request['IfNoneMatch'] = meta['ETag']
+
+    # botocore 延後到真的要連線時才 import, 啟動時不付這個成本
+    from botocore.exceptions import ClientError
+    try:
+        response = s3_client.get_object(**request)
+    except ClientError as e:
+        if is_not_modified(e):
+            return False
+        raise
+
+    # 先寫到暫存檔再 rename, 下載中斷不會留下半個檔案
+    tmp_path = local_path + '.download'
+    body = response['Body']
+    if callback is not None and hasattr(callback, 'set_total'):
+        callback.set_total(response.get('ContentLength', 0))
+    try:
+        with open(tmp_path, 'wb') as file:
+            for chunk in iter(lambda: body.read(CHUNK_SIZE), b''):
+                file.write(chunk)
+                if callback is not None:
+                    callback(len(chunk))
+            file.flush()
+            os.fsync(file.fileno())
+    finally:
+        body.close()
+    os.replace(tmp_path, local_path)
+
+    cache.save(meta_from_response(key, response))
+    return True
+
+
+def download_permissions(transfer, local_json_path, callback=None):
+    # 優先下載壓縮快照, S3 上還沒有快照時退回 JSON
+    # 回傳 (是否有更新, 本地檔路徑)
+    from botocore.exceptions import ClientError
+    layout = transfer.layout
+    compact_path = compact_path_for(local_json_path)
+    try:
+        return transfer.conditional_download(layout.compact, compact_path, callback), compact_path
+    except ClientError as e:
+        if not is_missing(e):
+            raise
+    return transfer.conditional_download(layout.permissions, local_json_path, callback), local_json_path
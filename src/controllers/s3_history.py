@@ -0,0 +1,139 @@
+import os
+import json
+import logging
+import time
+import random
+import hashlib
+from collections import OrderedDict
+from datetime import datetime, timezone
+from .s3_cache import is_missing, is_precondition_failed, atomic_write, DEFAULT_LAYOUT
+
+log = logging.getLogger(__name__)
+
+
+HISTORY_PREFIX = DEFAULT_LAYOUT.history_prefix
+HISTORY_INDEX_KEY = DEFAULT_LAYOUT.history_index
+SNAPSHOT_PREFIX = DEFAULT_LAYOUT.snapshot_prefix
+CACHE_ENTRIES = 10
+INDEX_LIMIT = 1000  # 索引只保留最近的版本, 更舊的快照仍留在 S3 但不再列出
+INDEX_RETRIES = 5  # 索引被其他人同時更新時, 重新讀取後再寫入的次數
+
+
+def version_id_of(snapshot):
+    # 以壓縮快照內容的 hash 定址, 內容相同的版本只存一份
+    return hashlib.sha256(snapshot).hexdigest()
+
+
+def snapshot_key_for(version_id, prefix=SNAPSHOT_PREFIX):
+    return f"{prefix}{version_id}.pcs"
+
+
+def load_index(transfer):
+    # 索引只列出版本資訊 (時間 / 變更數 / 快照 key), S3 上沒有索引時視為空的
+    return load_index_and_etag(transfer)[0]
+
+
+def load_index_and_etag(transfer):
+    # 回傳 (索引, ETag); 索引不存在時 ETag 為 None
+    from botocore.exceptions import ClientError
+    try:
+        data, etag = transfer.get_bytes_and_etag(transfer.layout.history_index)
+        return json.loads(data), etag
+    except ClientError as e:
+        if not is_missing(e):
+            raise
+    return {'versions': []}, None
+
+
+def record_version(transfer, snapshot, change_count=0, patch_key=None):
+    # 在 snapshot 已上傳到 layout.compact 之後呼叫: 以 copy_object 在 S3 端複製, 不需要再上傳
+    # 索引以條件式 PUT 寫回 (讀取時的 ETag), 兩個人同時存檔時後寫的一方重新讀取再加入, 不會蓋掉對方的版本
+    from botocore.exceptions import ClientError
+    layout = transfer.layout
+    version_id = version_id_of(snapshot)
+    key = snapshot_key_for(version_id, layout.snapshot_prefix)
+    version = {
+        'id': version_id,
+        'key': key,
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'size': len(snapshot),
+        'changes': change_count,
+        'patch': patch_key,
+    }
+    copied = False
+    for attempt in range(INDEX_RETRIES):
+        index, etag = load_index_and_etag(transfer)
+        versions = index.setdefault('versions', [])
+        if not copied and not any(entry['id'] == version_id for entry in versions):
+            transfer.copy(layout.compact, key)
+            copied = True
+        versions.append(version)
+        del versions[:-INDEX_LIMIT]
+        data = json.dumps(index, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+        try:
+            if etag is None:
+                transfer.put_bytes(layout.history_index, data, 'application/json', if_none_match='*')
+            else:
+                transfer.put_bytes(layout.history_index, data, 'application/json', if_match=etag)
+            return version
+        except ClientError as e:
+            if not is_precondition_failed(e):
+                raise
+        log.info("History index changed while recording %s, retrying (%d/%d)", version_id[:12], attempt + 1, INDEX_RETRIES)
+        time.sleep(random.uniform(0.05, 0.2) * (attempt + 1))
+    raise RuntimeError(f"History index kept changing; version {version_id[:12]} was not recorded")
+
+
+class HistoryCache:
+    # 最近查看過的版本存在本地資料夾, 超過 max_entries 時刪除最久沒用到的
+    def __init__(self, directory, max_entries=CACHE_ENTRIES):
+        self.directory = directory
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        if os.path.isdir(directory):
+            files = [name for name in os.listdir(directory) if name.endswith('.pcs')]
+            files.sort(key=lambda name: os.path.getmtime(os.path.join(directory, name)))
+            for name in files:
+                self._entries[name[:-len('.pcs')]] = None
+
+    def path_for(self, version_id):
+        return os.path.join(self.directory, f"{version_id}.pcs")
+
+    def get(self, version_id):
+        if version_id not in self._entries:
+            return None
+        path = self.path_for(version_id)
+        try:
+            with open(path, 'rb') as file:
+                data = file.read()
+        except OSError:
+            del self._entries[version_id]
+            return None
+        self._entries.move_to_end(version_id)
+        os.utime(path)
+        return data
+
+    def put(self, version_id, data):
+        os.makedirs(self.directory, exist_ok=True)
+        atomic_write(self.path_for(version_id), data)
+        self._entries[version_id] = None
+        self._entries.move_to_end(version_id)
+        while len(self._entries) > self.max_entries:
+            old_id, _ = self._entries.popitem(last=False)
+            try:
+                os.remove(self.path_for(old_id))
+            except OSError:
+                pass
+
+
+def load_version(transfer, version, cache=None):
+    # 先查本地快取; 下載後以 hash 驗證內容
+    data = cache.get(version['id']) if cache is not None else None
+    if data is not None:
+        return data
+    data = transfer.get_bytes(version['key'])
+    if version_id_of(data) != version['id']:
+        raise ValueError(f"History snapshot {version['key']} does not match its id")
+    if cache is not None:
+        cache.put(version['id'], data)
+    return data
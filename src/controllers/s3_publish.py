@@ -0,0 +1,137 @@
+import os
+import json
+import logging
+import time
+import hashlib
+from datetime import datetime, timezone
+from .s3_cache import (DownloadCache, meta_from_response, compact_path_for, download_permissions,
+                       is_missing, is_precondition_failed, atomic_write, DEFAULT_LAYOUT)
+from .s3_history import record_version
+from ..models.snapshot_format import encode_compact, read_snapshot
+from .. import tracing
+
+log = logging.getLogger(__name__)
+
+
+BACKUP_KEY = DEFAULT_LAYOUT.backup
+PATCH_PREFIX = DEFAULT_LAYOUT.patch_prefix
+
+
+EXPORT_CHUNK_SIZE = 2000
+EXPORT_INTERVAL = 10 * 60  # permissions.json (僅供外部匯出) 最多每 10 分鐘重新產生一次
+
+
+class RemoteChangedError(Exception):
+    # 條件式上傳失敗: 取得基準版本之後, S3 上的快照又被其他人更新
+    pass
+
+
+def compact_json(permissions):
+    # 與 json.dumps 結果相同, 但 Permissions 分段編碼:
+    # 整份內容一次 json.dumps 會在 C 裡佔住 GIL 數百毫秒, 存檔時 GUI thread 會卡住
+    encode = json.JSONEncoder(separators=(',', ':'), ensure_ascii=False).encode
+    parts = []
+    for key, value in permissions.items():
+        if key == 'Permissions' and isinstance(value, dict):
+            items = list(value.items())
+            chunks = [encode(dict(items[start:start + EXPORT_CHUNK_SIZE]))[1:-1]
+                      for start in range(0, len(items), EXPORT_CHUNK_SIZE)]
+            parts.append(encode(key) + ':{' + ','.join(chunks) + '}')
+        else:
+            parts.append(encode(key) + ':' + encode(value))
+    return ('{' + ','.join(parts) + '}').encode('utf-8')
+
+
+def patch_key_for(patch_bytes, prefix=PATCH_PREFIX):
+    stamp = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S%fZ')
+    digest = hashlib.sha256(patch_bytes).hexdigest()[:12]
+    return f"{prefix}{stamp}-{digest}.json"
+
+
+def head_remote(transfer, key):
+    # 還沒有壓縮快照時以 JSON 為準; 回傳 (key, HEAD 回應)
+    from botocore.exceptions import ClientError
+    layout = transfer.layout
+    try:
+        return key, transfer.head(key)
+    except ClientError as e:
+        if key != layout.compact or not is_missing(e):
+            raise
+    return layout.permissions, transfer.head(layout.permissions)
+
+
+def fetch_remote_if_changed(transfer, base_meta, local_json_path, callback=None):
+    # 樂觀並行控制: 以 HEAD 比對 S3 目前的 ETag 與編輯基準版本的 ETag
+    # 相同回傳 None; 不同時下載 S3 版本, 回傳 (內容, 本地檔路徑)
+    key, response = head_remote(transfer, base_meta.get('Key') or transfer.layout.compact)
+    if base_meta.get('ETag') and response.get('ETag') == base_meta['ETag']:
+        return None
+    _, path = download_permissions(transfer, local_json_path, callback)
+    return read_snapshot(path), path
+
+
+def export_due(local_path, interval=EXPORT_INTERVAL):
+    # 本地的 JSON 只在匯出時寫入, 修改時間即上次匯出的時間
+    try:
+        return time.time() - os.path.getmtime(local_path) >= interval
+    except OSError:
+        return True
+
+
+def put_snapshot(transfer, snapshot, base_meta, callback=None):
+    # 以編輯基準的 ETag 條件式寫入壓縮快照, 這是存檔的 commit point:
+    # 基準之後有人存檔時 S3 回傳 412, 不會蓋掉對方的版本
+    # 基準是 JSON (S3 上還沒有快照) 時, 只在快照仍不存在時建立
+    from botocore.exceptions import ClientError
+    layout = transfer.layout
+    if base_meta.get('Key', layout.compact) == layout.compact and base_meta.get('ETag'):
+        condition = {'if_match': base_meta['ETag']}
+    else:
+        condition = {'if_none_match': '*'}
+    try:
+        response = transfer.put_bytes(layout.compact, snapshot, 'application/octet-stream', **condition)
+    except ClientError as e:
+        if not is_precondition_failed(e):
+            raise
+        raise RemoteChangedError(f"{layout.compact} was changed on S3 by another save") from e
+    if callback is not None:
+        callback(len(snapshot))
+    return response
+
+
+def publish_changes(transfer, permissions, change_set, local_path, base_meta, callback=None, export_json=None):
+    # permissions 為已套用 change_set 的完整內容, base_meta 為編輯基準版本 (S3 上目前的版本)
+    # 1. 條件式上傳壓縮快照 (程式本身讀取用); S3 已被更新時丟出 RemoteChangedError, 不會留下其他物件
+    # 2. 上傳只含變更的 JSON Patch
+    # 3. export_json (None 為距離上次匯出超過 EXPORT_INTERVAL, 或基準還是 JSON 時):
+    #    舊的 JSON 以 copy_object 在 S3 端備份, 再上傳新的 JSON (僅供外部匯出)
+    if export_json is None:
+        export_json = base_meta.get('Key') != transfer.layout.compact or export_due(local_path)
+    with tracing.span('save.serialize', changes=len(change_set), export=export_json):
+        patch_bytes = json.dumps(change_set.to_patch(), ensure_ascii=False).encode('utf-8')
+        snapshot = encode_compact(permissions)
+        export = compact_json(permissions) if export_json else b''
+    if callback is not None and hasattr(callback, 'set_total'):
+        callback.set_total(len(patch_bytes) + len(snapshot) + len(export))
+
+    layout = transfer.layout
+    # PutObject 的回應已有新的 ETag, 直接寫入下載快取, 不需要再 HEAD
+    response = put_snapshot(transfer, snapshot, base_meta, callback)
+    patch_key = patch_key_for(patch_bytes, layout.patch_prefix)
+    transfer.upload_bytes(patch_key, patch_bytes, 'application/json-patch+json', callback)
+    if export_json:
+        transfer.copy(layout.permissions, layout.backup)
+        transfer.upload_bytes(layout.permissions, export, 'application/json', callback)
+    try:
+        record_version(transfer, snapshot, len(change_set), patch_key)
+    except Exception as e:
+        # 歷史紀錄失敗不影響這次存檔
+        tracing.count('history.record_failed')
+        log.warning("Failed to record history version: %s", e)
+
+    compact_path = compact_path_for(local_path)
+    atomic_write(compact_path, snapshot)
+    if export_json:
+        atomic_write(local_path, export)
+    DownloadCache(compact_path).save(meta_from_response(layout.compact, response))
+    return patch_key
@@ -0,0 +1,220 @@
+import io
+import time
+import threading
+from .s3_cache import conditional_download, DEFAULT_LAYOUT
+from .. import tracing
+
+
+MB = 1024 * 1024
+
+
+def default_transfer_config():
+    # S3 multipart 最小分段為 5 MB; permissions 檔通常小於門檻, 走單一 PUT
+    from boto3.s3.transfer import TransferConfig
+    return TransferConfig(
+        multipart_threshold=5 * MB,
+        multipart_chunksize=5 * MB,
+        max_concurrency=8,
+        use_threads=True,
+    )
+
+
+def create_s3_client(aws_config, max_pool_connections=None):
+    # boto3 的 import 與 client 建立很慢, 只在背景 thread 第一次需要時呼叫
+    import boto3
+    session = boto3.Session(**aws_config.credentials)
+    if max_pool_connections is None:
+        return session.client('s3')
+    from botocore.config import Config
+    return session.client('s3', config=Config(max_pool_connections=max_pool_connections))
+
+
+class TransferStats:
+    # 記錄傳輸量、耗時與 botocore 的重試次數, 方便寫進 log
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.seconds = 0.0
+        self.requests = 0
+        self.retries = 0
+
+    def record(self, sent=0, received=0, seconds=0.0):
+        with self._lock:
+            self.bytes_sent += sent
+            self.bytes_received += received
+            self.seconds += seconds
+
+    def record_call(self, retries):
+        with self._lock:
+            self.requests += 1
+            self.retries += retries
+
+    @property
+    def bytes_per_second(self):
+        if self.seconds <= 0:
+            return 0.0
+        return (self.bytes_sent + self.bytes_received) / self.seconds
+
+    def as_dict(self):
+        return {
+            'bytes_sent': self.bytes_sent,
+            'bytes_received': self.bytes_received,
+            'seconds': round(self.seconds, 4),
+            'bytes_per_second': round(self.bytes_per_second, 1),
+            'requests': self.requests,
+            'retries': self.retries,
+        }
+
+    def __str__(self):
+        return (f"sent={self.bytes_sent}B received={self.bytes_received}B "
+                f"in {self.seconds:.3f}s ({self.bytes_per_second / 1024:.1f} KB/s), "
+                f"requests={self.requests} retries={self.retries}")
+
+
+class ByteCounter:
+    # 統計傳輸的 bytes 並轉發給呼叫端的 callback; set_total 也要轉發,
+    # 否則進度條拿不到 ContentLength, 會把第一段當成總量
+    def __init__(self, callback=None):
+        self.callback = callback
+        self.bytes = 0
+
+    def set_total(self, total_bytes):
+        if self.callback is not None and hasattr(self.callback, 'set_total'):
+            self.callback.set_total(total_bytes)
+
+    def __call__(self, bytes_amount):
+        self.bytes += bytes_amount
+        if self.callback is not None:
+            self.callback(bytes_amount)
+
+
+class S3Transfer:
+    # S3 傳輸層: 記憶體內上傳 (BytesIO, 不寫暫存檔)、進度回報、統計
+    # layout: 權限集合在 bucket 中的 key (S3Layout)
+    # track_calls=False: client 由 S3ClientPool 共用, 請求 / 重試次數由 pool 統計,
+    # 否則每個 transfer 的 handler 都會收到其他環境的請求, 且 handler 會一直留在 client 上
+    def __init__(self, s3_client, bucket, config=None, layout=None, track_calls=True):
+        self.client = s3_client
+        self.bucket = bucket
+        self.config = config if config is not None else default_transfer_config()
+        self.layout = layout if layout is not None else DEFAULT_LAYOUT
+        self.stats = TransferStats()
+
+        events = getattr(getattr(s3_client, 'meta', None), 'events', None)
+        if events is not None and track_calls:
+            events.register('after-call.s3', self._on_after_call)
+
+    def _on_after_call(self, parsed=None, **kwargs):
+        metadata = (parsed or {}).get('ResponseMetadata', {})
+        self.stats.record_call(metadata.get('RetryAttempts', 0))
+
+    def reset_stats(self):
+        self.stats = TransferStats()
+        return self.stats
+
+    def upload_bytes(self, key, data, content_type=None, callback=None):
+        extra_args = {'ContentType': content_type} if content_type else None
+        start = time.perf_counter()
+        with tracing.span('s3.upload', key=key, bytes=len(data)):
+            self.client.upload_fileobj(
+                io.BytesIO(data),
+                self.bucket,
+                key,
+                ExtraArgs=extra_args,
+                Callback=callback,
+                Config=self.config
+            )
+        self.stats.record(sent=len(data), seconds=time.perf_counter() - start)
+        tracing.count('s3.bytes_sent', len(data))
+
+    def put_bytes(self, key, data, content_type=None, if_match=None, if_none_match=None):
+        # 單一 PutObject, 可帶條件: if_match=ETag 只覆寫該版本, if_none_match='*' 只在不存在時建立
+        # 條件不成立時 S3 回傳 412 (is_precondition_failed)
+        kwargs = {}
+        if content_type:
+            kwargs['ContentType'] = content_type
+        if if_match:
+            kwargs['IfMatch'] = if_match
+        if if_none_match:
+            kwargs['IfNoneMatch'] = if_none_match
+        start = time.perf_counter()
+        with tracing.span('s3.put', key=key, bytes=len(data)):
+            response = self.client.put_object(Bucket=self.bucket, Key=key, Body=data, **kwargs)
+        self.stats.record(sent=len(data), seconds=time.perf_counter() - start)
+        tracing.count('s3.bytes_sent', len(data))
+        return response
+
+    def get_bytes(self, key):
+        # 小物件 (索引 / 歷史快照) 直接讀進記憶體
+        return self.get_bytes_and_etag(key)[0]
+
+    def get_bytes_and_etag(self, key):
+        start = time.perf_counter()
+        with tracing.span('s3.get', key=key) as span:
+            response = self.client.get_object(Bucket=self.bucket, Key=key)
+            body = response['Body']
+            try:
+                data = body.read()
+            finally:
+                body.close()
+            span.set(bytes=len(data))
+        self.stats.record(received=len(data), seconds=time.perf_counter() - start)
+        tracing.count('s3.bytes_received', len(data))
+        return data, response.get('ETag')
+
+    def head(self, key):
+        with tracing.span('s3.head', key=key):
+            return self.client.head_object(Bucket=self.bucket, Key=key)
+
+    def copy(self, source_key, key):
+        with tracing.span('s3.copy', key=key):
+            return self.client.copy_object(
+                Bucket=self.bucket,
+                Key=key,
+                CopySource={'Bucket': self.bucket, 'Key': source_key}
+            )
+
+    def conditional_download(self, key, local_path, callback=None):
+        start = time.perf_counter()
+        count = ByteCounter(callback)
+        with tracing.span('s3.download', key=key) as span:
+            changed = conditional_download(self.client, self.bucket, key, local_path, callback=count)
+            span.set(bytes=count.bytes, changed=changed)
+        self.stats.record(received=count.bytes, seconds=time.perf_counter() - start)
+        tracing.count('s3.bytes_received', count.bytes)
+        return changed
+
+
+class S3ClientPool:
+    # 工作區內的環境共用 S3 client (連線池): 相同認證只建立一個 client, bucket / key 由各 S3Transfer 決定
+    # boto3 client 可跨 thread 使用; 第一次 client() 時才 import boto3, 可在 worker thread 呼叫
+    MAX_POOL_CONNECTIONS = 32  # 多個環境同時上傳時 (每個 TransferConfig 最多 8 條)
+
+    def __init__(self, client_factory=None):
+        self.client_factory = client_factory
+        self.stats = TransferStats()
+        self._clients = {}
+        self._lock = threading.Lock()
+
+    def _on_after_call(self, parsed=None, **kwargs):
+        metadata = (parsed or {}).get('ResponseMetadata', {})
+        self.stats.record_call(metadata.get('RetryAttempts', 0))
+
+    def client(self, aws_config):
+        key = tuple(sorted(aws_config.credentials.items()))
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                if self.client_factory is not None:
+                    client = self.client_factory(aws_config)
+                else:
+                    client = create_s3_client(aws_config, self.MAX_POOL_CONNECTIONS)
+                events = getattr(getattr(client, 'meta', None), 'events', None)
+                if events is not None:
+                    events.register('after-call.s3', self._on_after_call)
+                self._clients[key] = client
+            return client
+
+    def transfer(self, aws_config, bucket=None, layout=None):
+        return S3Transfer(self.client(aws_config), bucket or aws_config.bucket, layout=layout, track_calls=False)
@@ -1,16 +1,59 @@
 import sys
 import shutil
+import logging
 import os
 import atexit
+import argparse
 
 
 
-def main():
-    app = QApplication(sys.argv)
+def apply_theme(app):
+    # qt_material 載入較慢, 視窗顯示後才套用主題
+    from qt_material import apply_stylesheet
     apply_stylesheet(app, theme='dark_teal.xml')
+    startup_profiler.mark("Theme applied")
+
+
+def parse_arguments(argv):
+    # 程式自己的選項只在這裡解析一次; 其餘參數 (例如 Qt 的 -style) 原樣交給 QApplication
+    parser = argparse.ArgumentParser(description="Permission Control System", allow_abbrev=False)
+    parser.add_argument('--profile-startup', action='store_true',
+                        help="print module import times and the startup timeline")
+    parser.add_argument('--trace', metavar='FILE', help="write tracing spans to FILE (JSONL) and show the HUD")
+    parser.add_argument('--perf-hud', action='store_true', help="show the performance HUD")
+    parser.add_argument('--poll-interval', type=float, metavar='SECONDS',
+                        help="enable live refresh, checking S3 every SECONDS (at least 1)")
+    parser.add_argument('--workspace', metavar='FILE', help="open every environment in FILE as a tab")
+    args, qt_args = parser.parse_known_args(argv[1:])
+    if args.poll_interval is not None:
+        args.poll_interval = max(1.0, args.poll_interval)
+    return args, argv[:1] + qt_args
 
-    window = MainWindow()
+
+def load_workspace(path):
+    # --workspace FILE: 每個環境一個分頁
+    if path is None:
+        return None
+    from src.permissions.workspace import Workspace, load_environments
+    try:
+        return Workspace(load_environments(path))
+    except (OSError, ValueError) as e:
+        sys.exit(f"Invalid --workspace file {path!r}: {e}")
+
+
+def main(args, qt_args):
+    poll_interval = args.poll_interval
+    workspace = load_workspace(args.workspace)
+    app = QApplication(qt_args)
+    startup_profiler.mark("QApplication created")
+
+    if workspace is not None:
+        window = WorkspaceWindow(workspace, poll_interval=poll_interval)
+    else:
+        window = MainWindow(poll_interval=poll_interval)
     window.show()
+    startup_profiler.mark("Window shown")
+    QTimer.singleShot(0, lambda: apply_theme(app))
 
     sys.exit(app.exec())
 
@@ -35,9 +78,18 @@ def cleanup_temp():
 
 # 你的主程式代碼...
 if __name__ == '__main__':
+    args, qt_args = parse_arguments(sys.argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    # --profile-startup: 輸出各模組 import 時間與啟動時間軸
+    from src import startup_profiler
+    startup_profiler.start_if_requested(args.profile_startup)
+    # --trace FILE / --perf-hud: 各階段耗時的 span, 結束時寫入 counter 與 histogram
+    from src import tracing
+    tracing.start_if_requested(args.trace, args.perf_hud)
+    atexit.register(tracing.disable)
     from PyQt6.QtWidgets import QApplication
-    from qt_material import apply_stylesheet
-    from src.ui import MainWindow
+    from PyQt6.QtCore import QTimer
+    from src.ui import MainWindow, WorkspaceWindow
     # 註冊程式退出時的清理函數
     atexit.register(cleanup_temp)
-    main()
\ No newline at end of file
+    main(args, qt_args)
\ No newline at end of file
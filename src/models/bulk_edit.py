@@ -0,0 +1,64 @@
+from itertools import compress
+from .search_index import SearchIndex
+from .edit_history import EditCommand
+
+
+class BulkEdit:
+    # 對多列套用同一個變更: 加入 / 移除角色 (bitmask) 與設定 DefaultValue
+    # 角色變更先在少量的角色組合上計算對照表, 每列只需查表一次
+    def __init__(self, add_roles=(), remove_roles=(), default_value=None):
+        self.add_roles = list(add_roles)
+        self.remove_roles = list(remove_roles)
+        self.default_value = default_value
+
+    def is_empty(self):
+        return not self.add_roles and not self.remove_roles and self.default_value is None
+
+    def apply(self, store, rows):
+        # 回傳 EditCommand (編輯前後的值), 可直接放進 EditHistory
+        command = EditCommand(store, rows, self.describe())
+        rows = command.rows
+
+        registry = store.registry
+        add_mask = registry.mask_of(self.add_roles)
+        # 移除只查表: 不存在的角色本來就不在任何列上, 不應因此註冊新角色
+        remove_mask = 0
+        for role in self.remove_roles:
+            remove_mask |= registry.bit(role)
+        if add_mask or remove_mask:
+            set_ids = store.role_set_ids
+            mapping = {}
+            for row in rows:
+                set_id = set_ids[row]
+                new_id = mapping.get(set_id)
+                if new_id is None:
+                    mask = (store.set_masks[set_id] | add_mask) & ~remove_mask
+                    new_id = mapping[set_id] = store.intern_mask(mask)
+                set_ids[row] = new_id
+
+        if self.default_value is not None:
+            value = 1 if self.default_value else 0
+            defaults = store.defaults
+            for row in rows:
+                defaults[row] = value
+        return command.commit(store)
+
+    def describe(self):
+        parts = []
+        if self.add_roles:
+            parts.append("add " + ", ".join(self.add_roles))
+        if self.remove_roles:
+            parts.append("remove " + ", ".join(self.remove_roles))
+        if self.default_value is not None:
+            parts.append(f"DefaultValue={self.default_value}")
+        return "; ".join(parts) or "no change"
+
+
+def rows_matching(index, name_text='', role_text=''):
+    # 與搜尋框相同的條件: 名稱子字串 AND 角色
+    visible = SearchIndex.combine(index.match_name(name_text), index.match_roles(role_text))
+    return list(compress(range(len(visible)), visible))
+
+
+def rows_with_prefix(index, prefix):
+    return sorted(index.match_prefix(prefix))
@@ -0,0 +1,87 @@
+def escape_pointer(token):
+    # RFC 6901 JSON Pointer 跳脫
+    return token.replace('~', '~0').replace('/', '~1')
+
+
+def unescape_pointer(token):
+    return token.replace('~1', '/').replace('~0', '~')
+
+
+class ChangeSet:
+    # 只記錄被編輯過的權限, 存檔時轉成 JSON Patch (RFC 6902)
+    def __init__(self):
+        self.changes = {}
+
+    def __len__(self):
+        return len(self.changes)
+
+    def __bool__(self):
+        return bool(self.changes)
+
+    def record(self, name, before, after):
+        if name in self.changes:
+            before = self.changes[name][0]
+        if before == after:
+            self.changes.pop(name, None)
+        else:
+            self.changes[name] = (before, after)
+
+    @classmethod
+    def from_rows(cls, store, rows, base_permissions):
+        change_set = cls()
+        for row in rows:
+            name = store.name(row)
+            after = {
+                'AllowedRoles': store.roles(row),
+                'DefaultValue': store.default_value(row)
+            }
+            change_set.record(name, base_permissions.get(name), after)
+        return change_set
+
+    @classmethod
+    def between(cls, old_permissions, new_permissions):
+        # 兩個完整版本之間的差異 (新增 / 修改 / 刪除)
+        change_set = cls()
+        old_entries = old_permissions.get('Permissions', {})
+        new_entries = new_permissions.get('Permissions', {})
+        changes = change_set.changes
+        for name, after in new_entries.items():
+            before = old_entries.get(name)
+            if before != after:
+                changes[name] = (before, after)
+        for name in old_entries.keys() - new_entries.keys():
+            changes[name] = (old_entries[name], None)
+        return change_set
+
+    def to_patch(self):
+        patch = []
+        for name, (before, after) in self.changes.items():
+            path = '/Permissions/' + escape_pointer(name)
+            if after is None:
+                patch.append({'op': 'remove', 'path': path})
+            elif before is None:
+                patch.append({'op': 'add', 'path': path, 'value': after})
+            else:
+                patch.append({'op': 'replace', 'path': path, 'value': after})
+        return patch
+
+    def apply(self, permissions):
+        # 直接修改傳入的 dict, 只動到有變更的項目
+        entries = permissions.setdefault('Permissions', {})
+        for name, (before, after) in self.changes.items():
+            if after is None:
+                entries.pop(name, None)
+            else:
+                entries[name] = after
+        return permissions
+
+
+def apply_patch(permissions, patch):
+    entries = permissions.setdefault('Permissions', {})
+    for operation in patch:
+        name = unescape_pointer(operation['path'][len('/Permissions/'):])
+        if operation['op'] == 'remove':
+            entries.pop(name, None)
+        else:
+            entries[name] = operation['value']
+    return permissions
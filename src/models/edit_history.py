@@ -0,0 +1,84 @@
+from array import array
+
+
+def _capture(store, rows):
+    set_ids = store.role_set_ids
+    defaults = store.defaults
+    return array('I', (set_ids[row] for row in rows)), bytes(defaults[row] for row in rows)
+
+
+class EditCommand:
+    # 一筆可 undo / redo 的編輯 (單列或批次)
+    # 只記錄受影響列編輯前後的組合 id 與預設值; 角色組合由 store intern 後共用,
+    # 所以 undo / redo 的時間與記憶體都只和變更的列數成正比
+    # added: 這次編輯加在最後的列 [(name, default_value, roles)], undo 時刪除
+    def __init__(self, store, rows, description=''):
+        self.rows = array('I', sorted(set(rows)))
+        self.before_ids, self.before_defaults = _capture(store, self.rows)
+        self.after_ids = self.before_ids
+        self.after_defaults = self.before_defaults
+        self.first_added = len(store)
+        self.added = []
+        self.description = description
+
+    def commit(self, store, added=()):
+        # 編輯套用後記錄新的值
+        self.after_ids, self.after_defaults = _capture(store, self.rows)
+        self.added = list(added)
+        return self
+
+    def __len__(self):
+        return len(self.rows) + len(self.added)
+
+    def added_rows(self):
+        return range(self.first_added, self.first_added + len(self.added))
+
+    def _restore(self, store, set_ids, defaults):
+        store_ids = store.role_set_ids
+        store_defaults = store.defaults
+        for row, set_id, default in zip(self.rows, set_ids, defaults):
+            store_ids[row] = set_id
+            store_defaults[row] = default
+        return self.rows
+
+    def undo(self, store):
+        # 只還原既有列的值; 新增的列由呼叫端 (table model) 刪除
+        return self._restore(store, self.before_ids, self.before_defaults)
+
+    def redo(self, store):
+        return self._restore(store, self.after_ids, self.after_defaults)
+
+
+class EditHistory:
+    # undo / redo 堆疊; 新的編輯會清除 redo
+    def __init__(self, limit=200):
+        self.limit = limit
+        self.undo_stack = []
+        self.redo_stack = []
+
+    def push(self, command):
+        self.undo_stack.append(command)
+        if self.limit and len(self.undo_stack) > self.limit:
+            del self.undo_stack[0]
+        self.redo_stack.clear()
+        return command
+
+    def can_undo(self):
+        return bool(self.undo_stack)
+
+    def can_redo(self):
+        return bool(self.redo_stack)
+
+    def pop_undo(self):
+        command = self.undo_stack.pop()
+        self.redo_stack.append(command)
+        return command
+
+    def pop_redo(self):
+        command = self.redo_stack.pop()
+        self.undo_stack.append(command)
+        return command
+
+    def clear(self):
+        self.undo_stack.clear()
+        self.redo_stack.clear()
@@ -0,0 +1,49 @@
+import gc
+import threading
+from contextlib import contextmanager
+from .permission_store import PermissionStore
+from .search_index import SearchIndex
+from .. import tracing
+
+
+class ModelVersion:
+    # 一個版本的完整內容: 基準內容 (dict) + 欄式資料 + 搜尋索引
+    # 在 worker thread 建立, 交給 GUI thread 後整個替換; permissions 建立後不再修改
+    # tables: 工作區共用的 SharedTables, None 時使用各自的 RoleRegistry
+    __slots__ = ('permissions', 'path', 'meta', 'store', 'search_index')
+
+    def __init__(self, permissions, path=None, meta=None, tables=None):
+        self.permissions = permissions
+        self.path = path
+        self.meta = meta if meta is not None else {}
+        with tracing.span('version.build', rows=len(permissions.get('Permissions', {}))):
+            if tables is not None:
+                self.store = tables.store_from_dict(permissions)
+            else:
+                self.store = PermissionStore.from_dict(permissions)
+            self.search_index = SearchIndex(self.store)
+
+
+_gc_lock = threading.Lock()
+_gc_pauses = 0
+_gc_was_enabled = False
+
+
+@contextmanager
+def paused_gc():
+    # worker 建立版本 (解析 / 合併 / 建索引) 時暫停自動 GC:
+    # 大量配置會觸發完整 GC, 走訪數十萬個物件期間佔住 GIL, GUI thread 停頓數百毫秒
+    # 這些資料沒有循環參照, 由參照計數釋放; 多個 worker 同時暫停時, 最後一個結束才恢復
+    global _gc_pauses, _gc_was_enabled
+    with _gc_lock:
+        if _gc_pauses == 0:
+            _gc_was_enabled = gc.isenabled()
+            gc.disable()
+        _gc_pauses += 1
+    try:
+        yield
+    finally:
+        with _gc_lock:
+            _gc_pauses -= 1
+            if _gc_pauses == 0 and _gc_was_enabled:
+                gc.enable()
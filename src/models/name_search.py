@@ -0,0 +1,253 @@
+import re
+from array import array
+from collections import namedtuple
+from itertools import compress
+from .search_index import find_rows
+
+CONTAINS = 'contains'
+FUZZY = 'fuzzy'
+REGEX = 'regex'
+MODES = (CONTAINS, FUZZY, REGEX)
+
+# 名稱切成 token: 大寫縮寫 / 單字 (含 camelCase) / 數字
+# 例如 "Battery1Parameter_Bank 1 CRC" -> battery, 1, parameter, bank, 1, crc
+TOKEN_PATTERN = re.compile(r'[A-Z]+(?![a-z])|[A-Z]?[a-z]+|[0-9]+')
+
+# 背景搜尋的結果: mask 每列一個 byte; rank 為 {列: 名次}, 符合的列太多時為 None (維持原本順序)
+SearchResult = namedtuple('SearchResult', ['query', 'source', 'version', 'mask', 'rank', 'count'])
+
+
+class SearchQueryError(ValueError):
+    pass
+
+
+def tokenize(text):
+    return [token.lower() for token in TOKEN_PATTERN.findall(text)]
+
+
+def _merge_spans(spans):
+    merged = []
+    for start, end in sorted(spans):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+class SearchQuery:
+    # 一次查詢的條件; regex 在建立時編譯, 語法錯誤以 SearchQueryError 回報
+    # CONTAINS: 不分大小寫的子字串 (SearchIndex, GUI thread)
+    # FUZZY: 每個 token 都要出現 (子字串, 找不到時允許不連續的子序列), 例如 "bat1 crc"
+    # REGEX: re.search, 不分大小寫
+    __slots__ = ('mode', 'text', 'terms', 'pattern')
+
+    def __init__(self, mode, text):
+        if mode not in MODES:
+            raise SearchQueryError(f"Unknown search mode: {mode}")
+        self.mode = mode
+        self.text = text
+        self.pattern = None
+        if mode == REGEX:
+            self.terms = ()
+            try:
+                self.pattern = re.compile(text, re.IGNORECASE)
+            except re.error as e:
+                raise SearchQueryError(f"Invalid regex: {e}")
+        elif mode == FUZZY:
+            self.terms = tuple(dict.fromkeys(tokenize(text)))
+        else:
+            self.terms = (text.lower(),) if text else ()
+
+    def __eq__(self, other):
+        return isinstance(other, SearchQuery) and self.mode == other.mode and self.text == other.text
+
+    def __hash__(self):
+        return hash((self.mode, self.text))
+
+    def is_empty(self):
+        if self.mode == REGEX:
+            return not self.text
+        return not self.terms
+
+    def in_background(self):
+        # 子字串查詢直接用 SearchIndex, 其他模式交給 SearchWorker
+        return self.mode != CONTAINS and not self.is_empty()
+
+    def spans(self, name):
+        # 名稱中要標示的範圍 [(start, end)], 只對畫面上的列呼叫
+        if self.is_empty():
+            return []
+        if self.mode == REGEX:
+            return _merge_spans(match.span() for match in self.pattern.finditer(name) if match.end() > match.start())
+        lower = name.lower()
+        spans = []
+        for term in self.terms:
+            span = self._term_span(name, lower, term)
+            if span:
+                spans.extend(span)
+        return _merge_spans(spans)
+
+    def _term_span(self, name, lower, term):
+        if self.mode == CONTAINS:
+            spans = []
+            position = lower.find(term)
+            while position != -1:
+                spans.append((position, position + len(term)))
+                position = lower.find(term, position + len(term))
+            return spans
+        # 優先標示 token 開頭的命中, 其次任意位置, 最後是子序列的每個字元
+        for match in TOKEN_PATTERN.finditer(name):
+            if match.group().lower().startswith(term):
+                return [(match.start(), match.start() + len(term))]
+        position = lower.find(term)
+        if position != -1:
+            return [(position, position + len(term))]
+        spans = []
+        position = 0
+        for char in term:
+            position = lower.find(char, position)
+            if position == -1:
+                return []
+            spans.append((position, position + 1))
+            position += 1
+        return spans
+
+
+class NameSearch:
+    # 模糊 / regex 搜尋, 在 SearchWorker 的 thread 中執行
+    # 名稱以 sync() 取得 GUI thread 的複本, 串流載入時只補上新的列; 比對用的小寫名稱與
+    # 串接字串 (同 SearchIndex) 預先建好, 每個 term 交給 str.find, 只有排序時才切 token
+    # 符合的列超過 RANK_LIMIT 時不評分排序 (評分要切 token), proxy 依列號顯示;
+    # 有名次時 proxy 只把顯示的列號依名次排好
+    RANK_LIMIT = 1000
+    CHUNK_SIZE = 8192  # 每處理這麼多列檢查一次查詢是否已過期
+
+    def __init__(self):
+        self.names = []
+        self.lower_names = []
+        self._offsets = array('I')
+        self._next_offset = 0
+        self._haystack = None
+
+    def __len__(self):
+        return len(self.names)
+
+    def sync(self, names):
+        # 與上次的名稱比較, 只有尾端增減時增量更新, 否則重建
+        common = min(len(self.names), len(names))
+        if self.names[:common] != names[:common]:
+            self.__init__()
+            common = 0
+        if common < len(self.names):
+            self._truncate(common)
+        if len(names) > common:
+            self._extend(names[common:])
+
+    def _extend(self, names):
+        offset = self._next_offset
+        lower_names = [name.lower() for name in names]
+        for name in lower_names:
+            self._offsets.append(offset)
+            offset += len(name) + 1
+        self._next_offset = offset
+        self.names.extend(names)
+        self.lower_names.extend(lower_names)
+        self._haystack = None
+
+    def _truncate(self, length):
+        self._next_offset = self._offsets[length] if length < len(self._offsets) else self._next_offset
+        del self._offsets[length:]
+        del self.names[length:]
+        del self.lower_names[length:]
+        self._haystack = None
+
+    def _text(self):
+        if self._haystack is None:
+            self._haystack = '\n'.join(self.lower_names)
+        return self._haystack
+
+    def _scan(self, search, names, is_stale):
+        # 逐列呼叫 search (regex), 分段檢查是否過期; 過期時回傳 None
+        result = bytearray()
+        for start in range(0, len(names), self.CHUNK_SIZE):
+            if is_stale():
+                return None
+            result += bytes(map(bool, map(search, names[start:start + self.CHUNK_SIZE])))
+        return result
+
+    def search(self, query, is_stale=lambda: False):
+        # 回傳 (mask, rank, 符合的列數); 查詢過期時回傳 None
+        if query.mode == REGEX:
+            mask = self._scan(query.pattern.search, self.names, is_stale)
+        else:
+            mask = self._match_terms(query.terms, is_stale)
+        if mask is None:
+            return None
+        count = int.from_bytes(mask, 'little').bit_count()
+        rank = None
+        if 0 < count <= self.RANK_LIMIT:
+            rows = list(compress(range(len(mask)), mask))
+            if query.mode == REGEX:
+                rank = self._rank_regex(query.pattern, rows)
+            else:
+                rank = self._rank_terms(query.terms, rows)
+        return mask, rank, count
+
+    def _match_terms(self, terms, is_stale):
+        # 每個 term 先找子字串 (str.find), 完全找不到時才以子序列比對; 各 term 的結果做 AND
+        value = -1
+        length = len(self.names)
+        for term in terms:
+            if is_stale():
+                return None
+            found = find_rows(self._text(), self._offsets, self.lower_names, term)
+            if not any(found):
+                pattern = re.compile('.*?'.join(map(re.escape, term)))
+                found = self._scan(pattern.search, self.lower_names, is_stale)
+                if found is None:
+                    return None
+            value &= int.from_bytes(found, 'little')
+            if not value:
+                break
+        if value < 0:
+            return bytearray(b'\x01') * length
+        return bytearray(value.to_bytes(length, 'little'))
+
+    def _rank_terms(self, terms, rows):
+        # 分數: 完整 token 3, token 開頭 2, 子字串 1, 子序列 0.5;
+        # term 依輸入順序出現再加 1, 名稱越短越前面
+        names = self.names
+        lower_names = self.lower_names
+        scored = []
+        for row in rows:
+            lower = lower_names[row]
+            tokens = tokenize(names[row])
+            score = 0.0
+            last = -1
+            ordered = True
+            for term in terms:
+                if term in tokens:
+                    score += 3
+                elif any(token.startswith(term) for token in tokens):
+                    score += 2
+                elif term in lower:
+                    score += 1
+                else:
+                    score += 0.5
+                position = lower.find(term)
+                if position < last:
+                    ordered = False
+                last = position
+            if ordered:
+                score += 1
+            scored.append((-score, len(lower), row))
+        scored.sort()
+        return {row: position for position, (_, _, row) in enumerate(scored)}
+
+    def _rank_regex(self, pattern, rows):
+        # 命中位置越前面、名稱越短越前面
+        names = self.names
+        scored = sorted((pattern.search(names[row]).start(), len(names[row]), row) for row in rows)
+        return {row: position for position, (_, _, row) in enumerate(scored)}
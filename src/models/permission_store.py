@@ -0,0 +1,126 @@
+from array import array
+from .role_registry import RoleRegistry
+
+
+class PermissionStore:
+    # 以欄為主 (column-oriented) 儲存權限資料:
+    # names / defaults / role_set_ids 為平行陣列,
+    # 角色組合以 bitmask 表示並 intern, 相同組合只存一份
+    # strings: 多個 store 共用的名稱表 (SharedTables), 相同名稱共用同一個 str 物件
+    def __init__(self, registry=None, strings=None):
+        self.registry = registry if registry is not None else RoleRegistry()
+        self.strings = strings
+        self.names = []
+        self.defaults = bytearray()
+        self.role_set_ids = array('I')
+        self.index_of = {}
+
+        self.set_masks = []
+        self._set_id_of_mask = {}
+        self._role_texts = []
+
+    @classmethod
+    def from_dict(cls, permissions, registry=None, strings=None):
+        store = cls(registry, strings)
+        mask_of = store.registry.mask_of
+        for name, value in permissions.get('Permissions', {}).items():
+            store.append_mask(name, value.get('DefaultValue', False), mask_of(value.get('AllowedRoles', [])))
+        return store
+
+    def copy(self):
+        # 複本與原本共用 RoleRegistry, 之後各自修改互不影響
+        store = PermissionStore(self.registry, self.strings)
+        store.names = list(self.names)
+        store.defaults = bytearray(self.defaults)
+        store.role_set_ids = array('I', self.role_set_ids)
+        store.index_of = dict(self.index_of)
+        store.set_masks = list(self.set_masks)
+        store._set_id_of_mask = dict(self._set_id_of_mask)
+        store._role_texts = list(self._role_texts)
+        return store
+
+    def __len__(self):
+        return len(self.names)
+
+    def intern_mask(self, mask):
+        set_id = self._set_id_of_mask.get(mask)
+        if set_id is None:
+            set_id = len(self.set_masks)
+            self.set_masks.append(mask)
+            self._role_texts.append(None)  # 顯示時才產生
+            self._set_id_of_mask[mask] = set_id
+        return set_id
+
+    def append_mask(self, name, default_value, mask):
+        if self.strings is not None:
+            name = self.strings.setdefault(name, name)
+        row = len(self.names)
+        self.names.append(name)
+        self.defaults.append(1 if default_value else 0)
+        self.role_set_ids.append(self.intern_mask(mask))
+        self.index_of[name] = row
+        return row
+
+    def append(self, name, default_value, roles):
+        return self.append_mask(name, default_value, self.registry.mask_of(roles))
+
+    def extend(self, rows):
+        # rows: [(name, default_value, roles)]; 相同的角色組合只轉換一次 bitmask
+        masks = {}
+        mask_of = self.registry.mask_of
+        append_mask = self.append_mask
+        for name, default_value, roles in rows:
+            key = tuple(roles)
+            mask = masks.get(key)
+            if mask is None:
+                mask = masks[key] = mask_of(roles)
+            append_mask(name, default_value, mask)
+
+    def set_row_mask(self, row, default_value, mask):
+        self.defaults[row] = 1 if default_value else 0
+        self.role_set_ids[row] = self.intern_mask(mask)
+
+    def set_row(self, row, default_value, roles):
+        self.set_row_mask(row, default_value, self.registry.mask_of(roles))
+
+    def delete_range(self, first, last):
+        # 刪除 first..last 的列, 之後的列往前移
+        for name in self.names[first:last + 1]:
+            del self.index_of[name]
+        del self.names[first:last + 1]
+        del self.defaults[first:last + 1]
+        del self.role_set_ids[first:last + 1]
+        index_of = self.index_of
+        for row in range(first, len(self.names)):
+            index_of[self.names[row]] = row
+
+    def name(self, row):
+        return self.names[row]
+
+    def default_value(self, row):
+        return bool(self.defaults[row])
+
+    def mask(self, row):
+        return self.set_masks[self.role_set_ids[row]]
+
+    def roles(self, row):
+        return list(self.registry.roles_of(self.mask(row)))
+
+    def roles_text(self, row):
+        # 顯示字串依角色組合快取, 不會每列各存一份
+        set_id = self.role_set_ids[row]
+        text = self._role_texts[set_id]
+        if text is None:
+            text = self._role_texts[set_id] = ', '.join(self.registry.roles_of(self.set_masks[set_id]))
+        return text
+
+    def to_dict(self):
+        roles_of = self.registry.roles_of
+        set_masks = self.set_masks
+        return {
+            name: {
+                'AllowedRoles': list(roles_of(set_masks[set_id])),
+                'DefaultValue': bool(default)
+            }
+            for name, default, set_id in zip(self.names, self.defaults, self.role_set_ids)
+        }
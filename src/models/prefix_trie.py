@@ -0,0 +1,199 @@
+from array import array
+from collections import Counter
+
+SEPARATOR = '_'
+
+
+class TrieNode:
+    # 名稱前綴群組, 例如 ControllerParameter_ 或 Burning_API_
+    # 子節點在第一次展開 (expand) 時才建立, 之前只保留子樹中的列 (pending)
+    __slots__ = ('label', 'parent', 'depth', 'position', 'pending', 'children', 'child_list',
+                 'leaf_rows', 'set_counts', 'default_count', 'total', 'fetched', '_roles_text')
+
+    def __init__(self, label, parent, depth, position, rows, set_counts, default_count):
+        self.label = label
+        self.parent = parent
+        self.depth = depth
+        self.position = position
+        self.pending = rows
+        self.children = None
+        self.child_list = []
+        self.leaf_rows = array('I')
+        # 聚合統計: 子樹中每個角色組合 id 的列數, 以及 DefaultValue=True 的列數
+        self.set_counts = set_counts
+        self.default_count = default_count
+        self.total = len(rows)
+        self.fetched = 0
+        self._roles_text = None
+
+    @property
+    def expanded(self):
+        return self.children is not None
+
+    def child_count(self):
+        return len(self.child_list) + len(self.leaf_rows)
+
+    def prefix(self):
+        labels = []
+        node = self
+        while node.parent is not None:
+            labels.append(node.label)
+            node = node.parent
+        return ''.join(label + SEPARATOR for label in reversed(labels))
+
+    def role_counts(self, store):
+        # 在少量的角色組合上累加, 不需要逐列掃描
+        counts = {}
+        roles_of = store.registry.roles_of
+        for set_id, count in self.set_counts.items():
+            for role in roles_of(store.set_masks[set_id]):
+                counts[role] = counts.get(role, 0) + count
+        return counts
+
+    def roles_text(self, store):
+        # 全部列都有的角色直接列出, 部分列才有的角色附上列數
+        if self._roles_text is None:
+            counts = self.role_counts(store)
+            parts = []
+            for role in store.registry.roles:
+                count = counts.get(role)
+                if count is None:
+                    continue
+                parts.append(role if count == self.total else f"{role} ({count}/{self.total})")
+            self._roles_text = ', '.join(parts)
+        return self._roles_text
+
+    def count_row(self, set_id, default, sign):
+        set_counts = self.set_counts
+        count = set_counts.get(set_id, 0) + sign
+        if count:
+            set_counts[set_id] = count
+        else:
+            del set_counts[set_id]
+        self.default_count += default * sign
+        self._roles_text = None
+
+
+class PrefixTrie:
+    # 以 '_' 分段的名稱前綴樹, 建立在 PermissionStore 的列上
+    # 節點的統計在建立時計算一次, 之後隨列的變更增量更新
+    def __init__(self, store):
+        self.store = store
+        # 統計時採用的組合 id / 預設值, 用來找出編輯過的列
+        self.set_ids = array('I', store.role_set_ids)
+        self.defaults = bytearray(store.defaults)
+        self.root = self._make_node('', None, 0, 0, array('I', range(len(store))))
+
+    def _make_node(self, label, parent, depth, position, rows):
+        set_counts = Counter(map(self.set_ids.__getitem__, rows))
+        default_count = sum(map(self.defaults.__getitem__, rows))
+        return TrieNode(label, parent, depth, position, rows, dict(set_counts), default_count)
+
+    def _segments(self, row):
+        return self.store.names[row].split(SEPARATOR)[:-1]
+
+    def expand(self, node):
+        # 把 pending 的列依下一段名稱分到子節點, 子節點本身維持未展開
+        if node.expanded:
+            return node
+        groups = {}
+        leaf_rows = node.leaf_rows
+        names = self.store.names
+        depth = node.depth
+        for row in node.pending:
+            segments = names[row].split(SEPARATOR)
+            if len(segments) - 1 > depth:
+                group = groups.get(segments[depth])
+                if group is None:
+                    group = groups[segments[depth]] = array('I')
+                group.append(row)
+            else:
+                leaf_rows.append(row)
+        node.children = {}
+        for label, rows in groups.items():
+            child = self._make_node(label, node, depth + 1, len(node.child_list), rows)
+            node.children[label] = child
+            node.child_list.append(child)
+        node.pending = None
+        return node
+
+    def path(self, row):
+        # 從 root 到包含此列、目前已建立的最深節點
+        nodes = [self.root]
+        node = self.root
+        for segment in self._segments(row):
+            if not node.expanded:
+                break
+            node = node.children.get(segment)
+            if node is None:
+                break
+            nodes.append(node)
+        return nodes
+
+    def add_rows(self, rows, before_insert=None):
+        # 串流載入新增的列; before_insert(node, position) 在節點的子項目增加前呼叫
+        touched = set()
+        store = self.store
+        for row in rows:
+            set_id = store.role_set_ids[row]
+            default = store.defaults[row]
+            self.set_ids.append(set_id)
+            self.defaults.append(default)
+
+            node = self.root
+            segments = self._segments(row)
+            while True:
+                node.total += 1
+                node.count_row(set_id, default, 1)
+                touched.add(node)
+                if not node.expanded:
+                    node.pending.append(row)
+                    break
+                if len(segments) <= node.depth:
+                    if before_insert is not None:
+                        before_insert(node, node.child_count())
+                    node.leaf_rows.append(row)
+                    break
+                label = segments[node.depth]
+                child = node.children.get(label)
+                if child is None:
+                    if before_insert is not None:
+                        before_insert(node, len(node.child_list))
+                    child = self._make_node(label, node, node.depth + 1, len(node.child_list), array('I', [row]))
+                    node.children[label] = child
+                    node.child_list.append(child)
+                    break
+                node = child
+        return touched
+
+    def refresh_rows(self, first, last):
+        # 編輯後比對記錄的組合 id / 預設值, 只更新真正變更的列所在的路徑
+        store = self.store
+        last += 1
+        if store.role_set_ids[first:last] == self.set_ids[first:last] and \
+                store.defaults[first:last] == self.defaults[first:last]:
+            return set()
+        touched = set()
+        for row in range(first, last):
+            old_set_id = self.set_ids[row]
+            new_set_id = store.role_set_ids[row]
+            old_default = self.defaults[row]
+            new_default = store.defaults[row]
+            if old_set_id == new_set_id and old_default == new_default:
+                continue
+            for node in self.path(row):
+                node.count_row(old_set_id, old_default, -1)
+                node.count_row(new_set_id, new_default, 1)
+                touched.add(node)
+            self.set_ids[row] = new_set_id
+            self.defaults[row] = new_default
+        return touched
+
+    def rows_of(self, node):
+        # 子樹中所有的列 (群組的批次編輯範圍)
+        if not node.expanded:
+            return list(node.pending)
+        rows = list(node.leaf_rows)
+        for child in node.child_list:
+            rows.extend(self.rows_of(child))
+        return rows
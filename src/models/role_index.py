@@ -0,0 +1,133 @@
+import csv
+from array import array
+
+
+class RoleIndex:
+    # role -> 權限的反向索引: 每個角色一個 bytearray (每列一個 byte, 1 = 有此角色)
+    # 格式與 SearchIndex 的查詢結果相同, 可直接 combine(); 編輯後只更新變動的列
+    def __init__(self, store):
+        self.store = store
+        self.bits = {}
+        # 每列最後一次索引時的組合 id, 增量更新時與 store 比較
+        self._set_ids = array('I')
+        self._lower_roles = {}
+        self._deltas = {}
+        self.extend()
+
+    def __len__(self):
+        return len(self._set_ids)
+
+    def _bits_for(self, role):
+        bits = self.bits.get(role)
+        if bits is None:
+            bits = self.bits[role] = bytearray(len(self._set_ids))
+            self._lower_roles[role.lower()] = role
+        return bits
+
+    def extend(self):
+        # 串流載入 / 新增列: 依角色組合 id 查表, 每個角色一次轉換所有新列
+        start = len(self._set_ids)
+        new_ids = self.store.role_set_ids[start:]
+        if not new_ids:
+            return
+        set_masks = self.store.set_masks
+        registry = self.store.registry
+        for bits in self.bits.values():
+            bits.extend(bytes(len(new_ids)))
+        self._set_ids.extend(new_ids)
+        small = len(set_masks) <= 256
+        id_bytes = bytes(new_ids.tolist()) if small else None
+        for role in registry.roles:
+            bit = registry.bit(role)
+            table = [1 if mask & bit else 0 for mask in set_masks]
+            if not any(table):
+                continue
+            if small:
+                values = id_bytes.translate(bytes(table).ljust(256, b'\x00'))
+            else:
+                values = bytes(map(table.__getitem__, new_ids))
+            self._bits_for(role)[start:] = values
+        self._deltas.clear()
+
+    def truncate(self, length):
+        for bits in self.bits.values():
+            del bits[length:]
+        del self._set_ids[length:]
+
+    def update_rows(self, rows):
+        # 只處理組合 id 改變的列; (舊組合, 新組合) 的角色差異快取後重複使用
+        store_ids = self.store.role_set_ids
+        indexed_ids = self._set_ids
+        for row in rows:
+            old_id = indexed_ids[row]
+            new_id = store_ids[row]
+            if old_id == new_id:
+                continue
+            for bits, value in self._delta(old_id, new_id):
+                bits[row] = value
+            indexed_ids[row] = new_id
+
+    def _delta(self, old_id, new_id):
+        delta = self._deltas.get((old_id, new_id))
+        if delta is None:
+            store = self.store
+            new_mask = store.set_masks[new_id]
+            changed = store.set_masks[old_id] ^ new_mask
+            registry = store.registry
+            delta = [(self._bits_for(role), 1 if new_mask & registry.bit(role) else 0)
+                     for role in registry.roles_of(changed)]
+            self._deltas[(old_id, new_id)] = delta
+        return delta
+
+    def role_named(self, text):
+        # 不分大小寫的完全比對, 找不到時回傳 None
+        text = text.strip()
+        if text in self.bits:
+            return text
+        return self._lower_roles.get(text.lower())
+
+    def mask(self, role):
+        bits = self.bits.get(role)
+        return bytearray(bits) if bits is not None else bytearray(len(self))
+
+    def match(self, text):
+        # 以逗號 / 空白分隔多個角色, 符合任一角色的列 (OR); 未知的角色沒有結果
+        value = 0
+        for token in text.replace(',', ' ').split():
+            role = self.role_named(token)
+            if role is not None:
+                value |= int.from_bytes(self.bits[role], 'little')
+        return bytearray(value.to_bytes(len(self), 'little'))
+
+    def rows(self, role):
+        # 依序取出有此角色的列, 以 bytearray.find (C 實作) 跳過不符合的列
+        bits = self.bits.get(role)
+        if bits is None:
+            return []
+        rows = []
+        find = bits.find
+        row = find(1)
+        while row != -1:
+            rows.append(row)
+            row = find(1, row + 1)
+        return rows
+
+    def count(self, role):
+        bits = self.bits.get(role)
+        return bits.count(1) if bits is not None else 0
+
+    def counts(self):
+        return {role: self.count(role) for role in self.store.registry.roles}
+
+
+def write_access_matrix(store, file):
+    # 權限 x 角色的存取矩陣 (CSV): 每個角色一欄, 1 = 允許
+    # 每個角色組合的欄位值只計算一次
+    roles = list(store.registry.roles)
+    bits = [store.registry.bit(role) for role in roles]
+    cells = [['1' if mask & bit else '0' for bit in bits] for mask in store.set_masks]
+    writer = csv.writer(file, lineterminator='\n')
+    writer.writerow(['Permission Name', 'Default Value'] + roles)
+    for name, default, set_id in zip(store.names, store.defaults, store.role_set_ids):
+        writer.writerow([name, 'True' if default else 'False'] + cells[set_id])
+    return len(store.names)
@@ -0,0 +1,57 @@
+import threading
+
+DEFAULT_ROLES = [
+    "AM", "Battery", "CSD_PR", "CSD_T", "Charger",
+    "Derailleur", "Engineering", "FAE", "FW", "HW",
+    "ME", "Motor", "PM", "Production_Line", "Q",
+    "SW", "Sales"
+]
+
+
+class RoleRegistry:
+    # 角色 <-> bit 的對照表, 角色組合以整數 bitmask 表示
+    # 工作區中多個集合共用同一個 registry, 可能在不同 worker thread 註冊新角色
+    def __init__(self, roles=DEFAULT_ROLES):
+        self.roles = []
+        self.bit_of = {}
+        self._roles_cache = {}
+        self._lock = threading.Lock()
+        for role in roles:
+            self.register(role)
+
+    def __len__(self):
+        return len(self.roles)
+
+    def __contains__(self, role):
+        return role in self.bit_of
+
+    def register(self, role):
+        bit = self.bit_of.get(role)
+        if bit is None:
+            with self._lock:
+                bit = self.bit_of.get(role)
+                if bit is None:
+                    bit = 1 << len(self.roles)
+                    self.roles.append(role)
+                    self.bit_of[role] = bit
+        return bit
+
+    def bit(self, role):
+        return self.bit_of.get(role, 0)
+
+    def mask_of(self, roles):
+        # 檔案中出現未知角色時自動註冊, 不會遺失資料
+        mask = 0
+        for role in roles:
+            mask |= self.register(role)
+        return mask
+
+    def roles_of(self, mask):
+        roles = self._roles_cache.get(mask)
+        if roles is None:
+            roles = tuple(role for role, bit in zip(self.roles, self._bits()) if mask & bit)
+            self._roles_cache[mask] = roles
+        return roles
+
+    def _bits(self):
+        return (1 << i for i in range(len(self.roles)))
@@ -0,0 +1,189 @@
+from bisect import bisect_left, bisect_right
+from array import array
+from itertools import repeat, compress
+from operator import contains
+from .role_index import RoleIndex
+
+NAME_CACHE_SIZE = 16  # 最近的名稱查詢結果 (倒退鍵 / 再輸入時直接使用)
+PROBE_HITS = 64  # 命中這麼多次後估計總命中數, 太多就改為逐列比對
+
+
+def find_rows(haystack, offsets, lower_names, text):
+    # haystack: 各列小寫名稱以 '\n' 串接, offsets: 每列在 haystack 中的起點
+    result = bytearray(len(lower_names))
+    if '\n' in text:
+        return result
+    find = haystack.find
+    # 命中數多時逐列比對反而較快; 依目前的命中密度估計總數, 盡早切換
+    limit = len(offsets) // 16
+    hits = 0
+    position = find(text)
+    while position != -1:
+        hits += 1
+        if hits > limit or (hits % PROBE_HITS == 0 and hits * len(haystack) > limit * position):
+            return bytearray(map(contains, lower_names, repeat(text)))
+        row = bisect_right(offsets, position) - 1
+        result[row] = 1
+        # 同一列只需命中一次, 直接跳到下一列
+        next_row = row + 1
+        position = find(text, offsets[next_row]) if next_row < len(offsets) else -1
+    return result
+
+
+def rows_of(mask):
+    # mask 中為 1 的列; 命中少時用 find 跳過連續的 0
+    hits = mask.count(1)
+    if hits * 64 >= len(mask):
+        return list(compress(range(len(mask)), mask))
+    rows = []
+    find = mask.find
+    row = find(1)
+    while row != -1:
+        rows.append(row)
+        row = find(1, row + 1)
+    return rows
+
+
+class SearchIndex:
+    # 載入時建立一次的搜尋索引, 查詢結果以 bytearray (每列一個 byte, 1 = 符合) 表示,
+    # 多個條件可以用 combine() 做 AND
+    def __init__(self, store):
+        self.store = store
+        self.lower_names = []
+
+        # 所有名稱串成一個字串, 子字串搜尋交給 str.find (C 實作)
+        self._haystack = ''
+        self._offsets = array('I')
+        self._next_offset = 0
+        # 名稱有增減時遞增; 背景搜尋的結果以此判斷是否過期
+        self.version = 0
+
+        # 名稱查詢的快取 {小寫文字: (mask, 符合的列 或 None)}, version 改變時清空
+        self._name_cache = {}
+        self._name_cache_version = 0
+
+        # 前綴索引 (查詢時才建立)
+        self._sorted_names = None
+        self._sorted_keys = None
+
+        # 角色查詢由 role -> 權限的反向索引負責
+        self.role_index = RoleIndex(store)
+
+        self.extend()
+
+    def __len__(self):
+        return len(self.lower_names)
+
+    def extend(self):
+        # 串流載入時 store 會分批變長, 只替新加入的列建立索引
+        start = len(self.lower_names)
+        names = [name.lower() for name in self.store.names[start:]]
+        if not names:
+            return
+        offset = self._next_offset
+        for name in names:
+            self._offsets.append(offset)
+            offset += len(name) + 1
+        self._next_offset = offset
+        self.lower_names.extend(names)
+        self.version += 1
+        self._haystack = None
+        self._sorted_names = None
+        self.role_index.extend()
+
+    def truncate(self, length):
+        # 刪除最後的列 (undo 新增的列) 時只截斷索引, 不需重建
+        if length >= len(self.lower_names):
+            return
+        self._next_offset = self._offsets[length]
+        del self._offsets[length:]
+        del self.lower_names[length:]
+        self.version += 1
+        self._haystack = None
+        self._sorted_names = None
+        self.role_index.truncate(length)
+
+    def _text(self):
+        if self._haystack is None:
+            self._haystack = '\n'.join(self.lower_names)
+        return self._haystack
+
+    def all_rows(self):
+        return bytearray(b'\x01') * len(self)
+
+    def no_rows(self):
+        return bytearray(len(self))
+
+    def match_name(self, text):
+        text = text.lower()
+        if not text:
+            return self.all_rows()
+        if self._name_cache_version != self.version:
+            self._name_cache.clear()
+            self._name_cache_version = self.version
+        entry = self._name_cache.pop(text, None)
+        if entry is None:
+            entry = self._match_name(text)
+            if len(self._name_cache) >= NAME_CACHE_SIZE:
+                del self._name_cache[next(iter(self._name_cache))]
+        self._name_cache[text] = entry
+        return bytearray(entry[0])
+
+    def _match_name(self, text):
+        # 逐字輸入時新的查詢包含上一次的查詢, 結果只會在上一次符合的列之中:
+        # 上一次符合的列不多時只檢查這些列, 否則搜尋整個索引; 回傳 (mask, 符合的列 或 None)
+        base = None
+        for previous in self._name_cache:
+            if previous in text and (base is None or len(previous) > len(base)):
+                base = previous
+        if base is not None:
+            mask, rows = self._name_cache[base]
+            if rows is None and 4 * mask.count(1) < len(mask):
+                rows = rows_of(mask)
+                self._name_cache[base] = (mask, rows)
+            if rows is not None:
+                lower_names = self.lower_names
+                matched = list(compress(rows, map(contains, map(lower_names.__getitem__, rows), repeat(text))))
+                if len(matched) == len(rows):
+                    return mask, rows
+                rows = matched
+                result = self.no_rows()
+                for row in rows:
+                    result[row] = 1
+                return result, rows
+        return find_rows(self._text(), self._offsets, self.lower_names, text), None
+
+    def match_prefix(self, text):
+        text = text.lower()
+        if self._sorted_names is None:
+            self._sorted_names = sorted(zip(self.lower_names, range(len(self.lower_names))))
+            self._sorted_keys = [name for name, _ in self._sorted_names]
+        start = bisect_left(self._sorted_keys, text)
+        rows = []
+        for name, row in self._sorted_names[start:]:
+            if not name.startswith(text):
+                break
+            rows.append(row)
+        return rows
+
+    def match_roles(self, text):
+        # 角色名稱完全比對 (不分大小寫), 例如 "Q" 不會符合 "CSD_PR"
+        if not text.strip():
+            return self.all_rows()
+        return self.role_index.match(text)
+
+    def update_row(self, row):
+        # 編輯後角色組合改變, 只更新該列
+        self.update_rows((row,))
+
+    def update_rows(self, rows):
+        self.role_index.update_rows(rows)
+
+    @staticmethod
+    def combine(*results):
+        # 以大整數做位元 AND, 每列 0/1 的 byte 逐一相交
+        length = len(results[0])
+        value = int.from_bytes(results[0], 'little')
+        for result in results[1:]:
+            value &= int.from_bytes(result, 'little')
+        return bytearray(value.to_bytes(length, 'little'))
@@ -0,0 +1,17 @@
+from .role_registry import RoleRegistry
+from .permission_store import PermissionStore
+
+
+class SharedTables:
+    # 工作區內各權限集合 (環境) 共用的對照表:
+    # 同一個角色在每個集合都是同一個 bit, 不同集合的角色組合 bitmask 可以直接比較;
+    # 相同的權限名稱只保留一個 str 物件, 跨集合比對名稱時大多只需比較參照
+    def __init__(self, registry=None):
+        self.registry = registry if registry is not None else RoleRegistry()
+        self.strings = {}
+
+    def new_store(self):
+        return PermissionStore(self.registry, self.strings)
+
+    def store_from_dict(self, permissions):
+        return PermissionStore.from_dict(permissions, self.registry, self.strings)
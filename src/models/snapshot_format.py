@@ -0,0 +1,126 @@
+import gzip
+import json
+from array import array
+from .role_registry import RoleRegistry
+from .permission_store import PermissionStore
+
+
+# 壓縮快照格式:
+#   MAGIC (4 bytes) + VERSION (1 byte) + gzip(JSON body)
+#   body = 角色字典 + 去重後的角色組合 bitmask + 名稱 / 組合 id / 預設值的平行陣列
+MAGIC = b'PCSN'
+VERSION = 1
+GZIP_MAGIC = b'\x1f\x8b'
+
+FORMAT_COMPACT = 'compact'
+FORMAT_JSON = 'json'
+
+
+class SnapshotFormatError(ValueError):
+    pass
+
+
+def encode_compact(permissions, compresslevel=6):
+    registry = RoleRegistry(roles=[])
+    set_ids = {}
+    masks = []
+    names = []
+    ids = []
+    defaults = []
+    for name, value in permissions.get('Permissions', {}).items():
+        mask = registry.mask_of(value.get('AllowedRoles', []))
+        set_id = set_ids.get(mask)
+        if set_id is None:
+            set_id = set_ids[mask] = len(masks)
+            masks.append(mask)
+        names.append(name)
+        ids.append(set_id)
+        defaults.append(1 if value.get('DefaultValue', False) else 0)
+
+    body = {
+        'roles': registry.roles,
+        'masks': masks,
+        'names': names,
+        'sets': ids,
+        'defaults': defaults,
+    }
+    extra = {key: value for key, value in permissions.items() if key != 'Permissions'}
+    if extra:
+        body['extra'] = extra
+
+    payload = json.dumps(body, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+    return MAGIC + bytes([VERSION]) + gzip.compress(payload, compresslevel=compresslevel, mtime=0)
+
+
+def decode_compact_body(data):
+    version = data[len(MAGIC)]
+    if version != VERSION:
+        raise SnapshotFormatError(f"Unsupported snapshot version: {version}")
+    return json.loads(gzip.decompress(data[len(MAGIC) + 1:]))
+
+
+def role_lists_of(body):
+    roles = body['roles']
+    return [[role for bit, role in enumerate(roles) if mask >> bit & 1] for mask in body['masks']]
+
+
+def compact_batches(body, batch_size):
+    # 由平行陣列直接產生每批 (name, default_value, roles), 不先建出整份 dict
+    role_lists = role_lists_of(body)
+    names, sets, defaults = body['names'], body['sets'], body['defaults']
+    for start in range(0, len(names), batch_size):
+        end = start + batch_size
+        yield [(name, bool(default), list(role_lists[set_id]))
+               for name, set_id, default in zip(names[start:end], sets[start:end], defaults[start:end])]
+
+
+def decode_compact(data):
+    body = decode_compact_body(data)
+    role_lists = role_lists_of(body)
+    entries = {
+        name: {'AllowedRoles': list(role_lists[set_id]), 'DefaultValue': bool(default)}
+        for name, set_id, default in zip(body['names'], body['sets'], body['defaults'])
+    }
+    permissions = dict(body.get('extra', {}))
+    permissions['Permissions'] = entries
+    return permissions
+
+
+def decode_store(data, registry=None):
+    # 壓縮快照直接解成 PermissionStore, 不經過逐筆的 dict
+    if not data.startswith(MAGIC):
+        return PermissionStore.from_dict(decode_snapshot(data), registry)
+    body = decode_compact_body(data)
+
+    store = PermissionStore(registry)
+    roles = body['roles']
+    set_ids = [store.intern_mask(store.registry.mask_of(role for bit, role in enumerate(roles) if mask >> bit & 1))
+               for mask in body['masks']]
+    store.names = body['names']
+    store.defaults = bytearray(body['defaults'])
+    store.role_set_ids = array('I', map(set_ids.__getitem__, body['sets']))
+    store.index_of = {name: row for row, name in enumerate(store.names)}
+    return store
+
+
+def detect_format(data):
+    if data.startswith(MAGIC):
+        return FORMAT_COMPACT
+    return FORMAT_JSON
+
+
+def decode_snapshot(data):
+    # 自動判斷格式: 壓縮快照 / gzip 包裝的 JSON / 一般 JSON
+    if data.startswith(MAGIC):
+        return decode_compact(data)
+    if data.startswith(GZIP_MAGIC):
+        return decode_snapshot(gzip.decompress(data))
+    try:
+        return json.loads(data.decode('utf-8-sig'))
+    except (UnicodeDecodeError, ValueError) as e:
+        raise SnapshotFormatError(f"Invalid JSON format: {str(e)}")
+
+
+def read_snapshot(path):
+    with open(path, 'rb') as file:
+        return decode_snapshot(file.read())
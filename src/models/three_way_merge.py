@@ -0,0 +1,108 @@
+from .change_set import ChangeSet
+
+RESOLVE_LOCAL = 'local'
+RESOLVE_REMOTE = 'remote'
+ENTRY_FIELD = 'Entry'
+
+
+class MergeConflict:
+    # 同一個權限在本地與 S3 上有互相矛盾的變更
+    def __init__(self, name, base, local, remote, fields, merged=None):
+        self.name = name
+        self.base = base
+        self.local = local
+        self.remote = remote
+        self.fields = fields
+        self.merged = merged
+
+    def value_for(self, resolution):
+        if self.merged is None:
+            return self.local if resolution == RESOLVE_LOCAL else self.remote
+        # 只有衝突欄位依選擇取值, 其餘欄位 (含角色) 保留合併結果
+        if resolution != RESOLVE_LOCAL:
+            return self.merged
+        value = dict(self.merged)
+        for field in self.fields:
+            value[field] = self.local[field]
+        return value
+
+
+class MergeResult:
+    # permissions: 合併後的完整內容 (以 S3 版本為基礎)
+    # change_set: 相對於 S3 版本的變更, 存檔時上傳這一份
+    def __init__(self, remote):
+        self.remote = remote
+        self.permissions = dict(remote)
+        self.permissions['Permissions'] = dict(remote.get('Permissions', {}))
+        self.change_set = ChangeSet()
+        self.conflicts = []
+        self.auto_merged = []
+
+    def set_entry(self, name, value):
+        entries = self.permissions['Permissions']
+        remote_value = self.remote.get('Permissions', {}).get(name)
+        self.change_set.record(name, remote_value, value)
+        if value is None:
+            entries.pop(name, None)
+        else:
+            entries[name] = value
+
+    def resolve(self, resolutions):
+        # resolutions: {name: RESOLVE_LOCAL / RESOLVE_REMOTE}, 未指定的保留 S3 版本
+        for conflict in self.conflicts:
+            self.set_entry(conflict.name, conflict.value_for(resolutions.get(conflict.name, RESOLVE_REMOTE)))
+        self.conflicts = []
+        return self
+
+
+def merge_roles(base_roles, local_roles, remote_roles):
+    # 以集合做三方合併: S3 版本加上本地新增的角色, 扣掉本地移除的角色
+    base_roles = set(base_roles)
+    local_set = set(local_roles)
+    added = local_set - base_roles
+    removed = base_roles - local_set
+    merged = [role for role in remote_roles if role not in removed]
+    merged.extend(role for role in local_roles if role in added and role not in merged)
+    return merged
+
+
+def merge_entry(base, local, remote):
+    # 回傳 (合併結果, 衝突欄位); 衝突欄位為空表示可以自動合併
+    if remote == base or remote == local:
+        return local, []
+    if local == base:
+        return remote, []
+    if base is None or local is None or remote is None:
+        # 兩邊都新增但內容不同, 或一邊刪除一邊修改
+        return None, [ENTRY_FIELD]
+
+    merged = dict(remote)
+    fields = []
+    for field, value in local.items():
+        if field == 'AllowedRoles' or value == base.get(field):
+            continue
+        if remote.get(field, base.get(field)) != base.get(field) and remote.get(field) != value:
+            fields.append(field)
+        else:
+            merged[field] = value
+    # AllowedRoles 的增減不會互相矛盾, 一定可以合併
+    merged['AllowedRoles'] = merge_roles(
+        base.get('AllowedRoles', []), local.get('AllowedRoles', []), remote.get('AllowedRoles', []))
+    return merged, fields
+
+
+def merge_changes(change_set, remote_permissions):
+    # change_set: 本地變更, 每項的 before 即編輯開始時的基準; remote: 目前 S3 上的版本
+    # 只看本地有變更的權限; 其他權限直接採用 S3 版本
+    result = MergeResult(remote_permissions)
+    remote_entries = remote_permissions.get('Permissions', {})
+    for name, (base, local) in change_set.changes.items():
+        remote = remote_entries.get(name)
+        merged, fields = merge_entry(base, local, remote)
+        if fields:
+            result.conflicts.append(MergeConflict(name, base, local, remote, fields, merged))
+            continue
+        if remote != base:
+            result.auto_merged.append(name)
+        result.set_entry(name, merged)
+    return result
@@ -0,0 +1,202 @@
+from collections import Counter
+from .role_registry import DEFAULT_ROLES
+
+ERROR = 'Error'
+WARNING = 'Warning'
+
+NEW_ROLE_MESSAGE = "new role(s) not in the current version: "
+
+# 名稱不可為空、不可有前後空白或控制字元
+MAX_NAME_LENGTH = 256
+
+
+class ValidationIssue:
+    # new_roles: 基準版本中沒有的角色 (警告); 存檔前由使用者確認 (GUI 詢問 / CLI --allow-new-role)
+    def __init__(self, name, field, message, severity=ERROR, new_roles=()):
+        self.name = name
+        self.field = field
+        self.message = message
+        self.severity = severity
+        self.new_roles = new_roles
+
+    def __str__(self):
+        return f"{self.severity}: {self.name!r} {self.field}: {self.message}"
+
+
+class ValidationError(ValueError):
+    # 上傳前驗證失敗; issues 為所有錯誤
+    def __init__(self, issues):
+        self.issues = issues
+        lines = [str(issue) for issue in issues[:10]]
+        if len(issues) > 10:
+            lines.append(f"... and {len(issues) - 10} more")
+        super().__init__(f"{len(issues)} validation error(s):\n" + "\n".join(lines))
+
+
+def errors_of(issues):
+    return [issue for issue in issues if issue.severity == ERROR]
+
+
+def new_roles_of(issues):
+    return sorted({role for issue in issues for role in issue.new_roles})
+
+
+def new_role_issue(name, roles):
+    return ValidationIssue(name, 'AllowedRoles', NEW_ROLE_MESSAGE + ", ".join(roles), WARNING, tuple(roles))
+
+
+class PermissionSchema:
+    # 權限檔的結構定義: 每個權限的欄位與型別, 以及允許的角色
+    FIELDS = {'AllowedRoles': list, 'DefaultValue': bool}
+
+    def __init__(self, roles=DEFAULT_ROLES, max_name_length=MAX_NAME_LENGTH):
+        self.roles = set(roles)
+        self.max_name_length = max_name_length
+
+    def add_roles_from(self, permissions):
+        # 已在基準版本中使用的角色視為已知, 新出現的角色以警告回報 (可能是打錯字)
+        for entry in permissions.get('Permissions', {}).values():
+            if isinstance(entry, dict) and isinstance(entry.get('AllowedRoles'), list):
+                self.roles.update(role for role in entry['AllowedRoles'] if isinstance(role, str))
+        return self
+
+    def check_name(self, name):
+        if not isinstance(name, str):
+            return "name is not a string"
+        if len(name) > self.max_name_length:
+            return f"name is longer than {self.max_name_length} characters"
+        if not name or name.strip() != name or not name.isprintable():
+            return "name is empty or has leading/trailing spaces or control characters"
+        return None
+
+    def check_entry(self, name, entry):
+        # 單一權限 (dict) 的結構檢查, 存檔時只對變更的權限執行
+        issues = []
+        message = self.check_name(name)
+        if message:
+            issues.append(ValidationIssue(name, 'Name', message))
+        if not isinstance(entry, dict):
+            issues.append(ValidationIssue(name, 'Entry', f"expected an object, got {type(entry).__name__}"))
+            return issues
+        for field, field_type in self.FIELDS.items():
+            if field not in entry:
+                issues.append(ValidationIssue(name, field, "missing"))
+            elif not isinstance(entry[field], field_type):
+                issues.append(ValidationIssue(name, field, f"expected {field_type.__name__}, "
+                                                            f"got {type(entry[field]).__name__}"))
+        for field in entry.keys() - self.FIELDS.keys():
+            issues.append(ValidationIssue(name, field, "unknown field", WARNING))
+        roles = entry.get('AllowedRoles')
+        if isinstance(roles, list):
+            if not all(isinstance(role, str) for role in roles):
+                issues.append(ValidationIssue(name, 'AllowedRoles', "roles must be strings"))
+            else:
+                unknown = [role for role in roles if role not in self.roles]
+                if unknown:
+                    issues.append(new_role_issue(name, unknown))
+                if len(set(roles)) != len(roles):
+                    issues.append(ValidationIssue(name, 'AllowedRoles', "duplicate roles"))
+                if not roles:
+                    issues.append(ValidationIssue(name, 'AllowedRoles', "no role can access this permission", WARNING))
+        return issues
+
+
+def validate_change_set(change_set, schema):
+    # 只檢查變更後的內容 (刪除不需檢查)
+    issues = []
+    for name, (before, after) in change_set.changes.items():
+        if after is not None:
+            issues.extend(schema.check_entry(name, after))
+    return issues
+
+
+class Validator:
+    # 在欄式資料 (PermissionStore) 上驗證:
+    # 角色檢查以角色組合為單位預先計算 (組合數很少), 每列只需查表
+    def __init__(self, store, schema=None):
+        self.store = store
+        self.schema = schema if schema is not None else PermissionSchema(store.registry.roles)
+        self._allowed_mask = None
+        self._registry_size = -1
+        self._set_issues = {}
+
+    def _set_issues_for(self, set_id):
+        # (欄位, 訊息, 嚴重度, 新角色) 的清單, 依組合 id 快取
+        registry = self.store.registry
+        if len(registry) != self._registry_size:
+            self._registry_size = len(registry)
+            self._allowed_mask = registry.mask_of(role for role in registry.roles if role in self.schema.roles)
+            self._set_issues.clear()
+        issues = self._set_issues.get(set_id)
+        if issues is None:
+            mask = self.store.set_masks[set_id]
+            issues = []
+            unknown = mask & ~self._allowed_mask
+            if unknown:
+                roles = tuple(registry.roles_of(unknown))
+                issues.append(('AllowedRoles', NEW_ROLE_MESSAGE + ", ".join(roles), WARNING, roles))
+            if not mask:
+                issues.append(('AllowedRoles', "no role can access this permission", WARNING, ()))
+            self._set_issues[set_id] = issues
+        return issues
+
+    def check_rows(self, rows):
+        # 增量驗證: 只檢查指定的列 (編輯中的 dirty rows); 回傳 {row: [ValidationIssue]}
+        store = self.store
+        result = {}
+        for row in rows:
+            name = store.name(row)
+            issues = [ValidationIssue(name, *issue) for issue in self._set_issues_for(store.role_set_ids[row])]
+            message = self.schema.check_name(name)
+            if message:
+                issues.append(ValidationIssue(name, 'Name', message))
+            if store.index_of.get(name) != row:
+                issues.append(ValidationIssue(name, 'Name', "duplicate permission name"))
+            if issues:
+                result[row] = issues
+        return result
+
+    def full_pass(self):
+        # 上傳前的完整驗證: 每項檢查都是對整個欄位的一次運算, 只在有問題時才逐列處理
+        store = self.store
+        names = store.names
+        result = {}
+
+        def add(row, issue):
+            result.setdefault(row, []).append(issue)
+
+        # 角色: 先找出有問題的組合, 再以組合 id 篩選列
+        bad_sets = {set_id for set_id in range(len(store.set_masks)) if self._set_issues_for(set_id)}
+        if bad_sets:
+            for row, set_id in enumerate(store.role_set_ids):
+                if set_id in bad_sets:
+                    for issue in self._set_issues_for(set_id):
+                        add(row, ValidationIssue(names[row], *issue))
+
+        # 名稱: 以整欄串接後的字串方法 (C 實作) 檢查, 發現問題才逐列找出
+        if names and (not all(names) or not ''.join(names).isprintable()
+                      or any(map(str.__ne__, names, map(str.strip, names)))
+                      or max(map(len, names)) > self.schema.max_name_length):
+            check_name = self.schema.check_name
+            for row, name in enumerate(names):
+                message = check_name(name)
+                if message:
+                    add(row, ValidationIssue(name, 'Name', message))
+
+        # 重複名稱: index_of 的數量與列數不同時才計算
+        if len(store.index_of) != len(names):
+            duplicates = {name for name, count in Counter(names).items() if count > 1}
+            for row, name in enumerate(names):
+                if name in duplicates:
+                    add(row, ValidationIssue(name, 'Name', "duplicate permission name"))
+
+        # 欄位內容: DefaultValue 只能是 0/1, 組合 id 必須存在
+        if store.defaults.translate(bytes(256), b'\x00\x01'):
+            for row, value in enumerate(store.defaults):
+                if value > 1:
+                    add(row, ValidationIssue(names[row], 'DefaultValue', f"invalid value {value}"))
+        if len(store.role_set_ids) and max(store.role_set_ids) >= len(store.set_masks):
+            for row, set_id in enumerate(store.role_set_ids):
+                if set_id >= len(store.set_masks):
+                    add(row, ValidationIssue(names[row], 'AllowedRoles', "corrupt role set"))
+        return result
@@ -0,0 +1,84 @@
+from array import array
+
+ADDED = 'Added'
+REMOVED = 'Removed'
+CHANGED = 'Changed'
+
+
+class VersionDiff:
+    # 兩個版本 (PermissionStore) 之間每個權限的差異
+    # entries: [(kind, old_row, new_row)], 不存在的一邊為 -1
+    def __init__(self, old_store, new_store):
+        self.old_store = old_store
+        self.new_store = new_store
+        self.entries = []
+
+    def __len__(self):
+        return len(self.entries)
+
+    def name(self, index):
+        kind, old_row, new_row = self.entries[index]
+        return self.new_store.name(new_row) if new_row >= 0 else self.old_store.name(old_row)
+
+    def role_delta(self, index):
+        # (新增的角色, 移除的角色)
+        kind, old_row, new_row = self.entries[index]
+        old_roles = self.old_store.roles(old_row) if old_row >= 0 else []
+        new_roles = self.new_store.roles(new_row) if new_row >= 0 else []
+        added = [role for role in new_roles if role not in old_roles]
+        removed = [role for role in old_roles if role not in new_roles]
+        return added, removed
+
+    def counts(self):
+        counts = {ADDED: 0, REMOVED: 0, CHANGED: 0}
+        for kind, _, _ in self.entries:
+            counts[kind] += 1
+        return counts
+
+
+def _set_keys(store):
+    # 每個角色組合 id 對應的角色集合; 兩個 store 的 RoleRegistry 可以不同
+    roles_of = store.registry.roles_of
+    return [frozenset(roles_of(mask)) for mask in store.set_masks]
+
+
+def diff_stores(old_store, new_store):
+    # 在欄式資料上比較: 先把新版本的組合 id 換成舊版本的 id, 再比較整個陣列
+    diff = VersionDiff(old_store, new_store)
+    entries = diff.entries
+    missing = len(old_store.set_masks)
+    if old_store.registry is new_store.registry:
+        # 共用 RoleRegistry (同一個工作區): bitmask 可直接對照
+        old_id_of_mask = {mask: set_id for set_id, mask in enumerate(old_store.set_masks)}
+        translate = [old_id_of_mask.get(mask, missing) for mask in new_store.set_masks]
+    else:
+        old_id_of_key = {key: set_id for set_id, key in enumerate(_set_keys(old_store))}
+        translate = [old_id_of_key.get(key, missing) for key in _set_keys(new_store)]
+    old_ids = old_store.role_set_ids
+    old_defaults = old_store.defaults
+
+    if old_store.names == new_store.names:
+        # 名稱順序相同 (最常見): 相同內容的版本只需要兩次陣列比較
+        new_ids = array('I', map(translate.__getitem__, new_store.role_set_ids))
+        if new_ids == old_ids and new_store.defaults == old_defaults:
+            return diff
+        for row, (old_id, new_id, old_default, new_default) in enumerate(
+                zip(old_ids, new_ids, old_defaults, new_store.defaults)):
+            if old_id != new_id or old_default != new_default:
+                entries.append((CHANGED, row, row))
+        return diff
+
+    new_index = new_store.index_of
+    new_ids = new_store.role_set_ids
+    new_defaults = new_store.defaults
+    for old_row, name in enumerate(old_store.names):
+        new_row = new_index.get(name)
+        if new_row is None:
+            entries.append((REMOVED, old_row, -1))
+        elif old_ids[old_row] != translate[new_ids[new_row]] or old_defaults[old_row] != new_defaults[new_row]:
+            entries.append((CHANGED, old_row, new_row))
+    old_index = old_store.index_of
+    for new_row, name in enumerate(new_store.names):
+        if name not in old_index:
+            entries.append((ADDED, -1, new_row))
+    return diff
@@ -0,0 +1,2 @@
+from .permission_set import PermissionSet, SaveResult, save_change_set, DEFAULT_JSON_PATH
+from .workspace import Workspace, Environment, load_environments, promotion_entries
@@ -0,0 +1,315 @@
+import sys
+import json
+import logging
+import argparse
+from ..models.three_way_merge import RESOLVE_LOCAL, RESOLVE_REMOTE
+from ..models.role_index import write_access_matrix
+from ..models.validation import ValidationError, errors_of, new_roles_of
+from .permission_set import PermissionSet
+from .workspace import Workspace, load_environments
+from .. import tracing
+
+EXIT_OK = 0
+EXIT_ERROR = 1
+EXIT_CONFLICT = 3
+
+CONFLICT_CHOICES = {'mine': RESOLVE_LOCAL, 'theirs': RESOLVE_REMOTE}
+
+
+def parse_bool(text):
+    value = text.strip().lower()
+    if value in ('true', '1', 'yes', 'on'):
+        return True
+    if value in ('false', '0', 'no', 'off'):
+        return False
+    raise argparse.ArgumentTypeError(f"expected true/false, got {text!r}")
+
+
+def add_selectors(parser):
+    group = parser.add_argument_group("selectors (combined as a union)")
+    group.add_argument('--name', action='append', default=[], help="exact permission name")
+    group.add_argument('--prefix', action='append', default=[], help="permission name prefix")
+    group.add_argument('--match', default='', help="substring of the permission name")
+    group.add_argument('--with-role', action='append', default=[], help="permissions that already have this role")
+    group.add_argument('--all', action='store_true', help="every permission")
+
+
+def add_save_options(parser):
+    parser.add_argument('--dry-run', action='store_true', help="print the JSON Patch instead of uploading")
+    parser.add_argument('--export-json', action='store_true', default=None,
+                        help="also rewrite permissions.json now (default: at most every 10 minutes)")
+    parser.add_argument('--on-conflict', choices=sorted(CONFLICT_CHOICES),
+                        help="resolve merge conflicts automatically instead of failing")
+    parser.add_argument('--allow-new-role', action='append', default=[], metavar='ROLE',
+                        help="add a role that permissions.json does not use yet (repeatable)")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog='permctl',
+        description="Query and edit permissions.json on S3 without the GUI.")
+    parser.add_argument('--cache', help="local cache path (default: the GUI cache)")
+    parser.add_argument('--offline', action='store_true', help="read the local cache only (queries)")
+    parser.add_argument('--json', action='store_true', help="machine-readable output")
+    parser.add_argument('--trace', metavar='FILE', help="append timing spans (JSON Lines) to FILE")
+    parser.add_argument('--workspace', metavar='FILE', help="workspace file listing the environments (JSON)")
+    parser.add_argument('--env', help="environment of the workspace to use (default: the first one)")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    who_can = commands.add_parser('who-can', help="roles allowed for a permission")
+    who_can.add_argument('names', nargs='+')
+
+    listing = commands.add_parser('list', help="list permissions (all when no selector is given)")
+    add_selectors(listing)
+
+    commands.add_parser('validate', help="check the current permissions (exit code 1 on errors)")
+
+    access = commands.add_parser('access', help="permissions a role can access")
+    access.add_argument('roles', nargs='+')
+
+    matrix = commands.add_parser('matrix', help="export the permission x role access matrix (CSV)")
+    matrix.add_argument('--output', help="CSV file (default: stdout)")
+    matrix.add_argument('--summary', action='store_true', help="only print the permission count per role")
+
+    for command, help_text in (('grant', "add roles to"), ('revoke', "remove roles from")):
+        edit = commands.add_parser(command, help=f"{help_text} the selected permissions")
+        edit.add_argument('--role', action='append', required=True, help="role (repeatable)")
+        add_selectors(edit)
+        add_save_options(edit)
+
+    set_default = commands.add_parser('set-default', help="set DefaultValue of the selected permissions")
+    set_default.add_argument('value', type=parse_bool)
+    add_selectors(set_default)
+    add_save_options(set_default)
+
+    apply = commands.add_parser('apply', help="apply a batch of edits (JSON Lines) in one upload")
+    apply.add_argument('file', help="JSON Lines file, '-' for stdin")
+    add_save_options(apply)
+
+    promote = commands.add_parser('promote', help="copy changed / added permissions between workspace environments in one upload")
+    promote.add_argument('--from', dest='source', required=True, help="source environment")
+    promote.add_argument('--to', dest='target', required=True, help="target environment")
+    add_selectors(promote)
+    add_save_options(promote)
+    return parser
+
+
+def select_rows(permission_set, names=(), prefixes=(), match='', with_roles=(), all_rows=False):
+    if all_rows:
+        return list(range(len(permission_set)))
+    return permission_set.select(names, prefixes, match, with_roles)
+
+
+def has_selector(args):
+    return bool(args.all or args.name or args.prefix or args.match or args.with_role)
+
+
+def run_edit(permission_set, operation, roles=(), value=None, rows=()):
+    if operation == 'grant':
+        return permission_set.grant(roles, rows)
+    if operation == 'revoke':
+        return permission_set.revoke(roles, rows)
+    if operation == 'set-default':
+        return permission_set.set_default(value, rows)
+    raise ValueError(f"Unknown operation: {operation}")
+
+
+def read_batch(path):
+    # 每行一個編輯: {"op": "grant", "roles": ["FW"], "prefixes": ["Motor_"], "names": [...], "match": "", "with_roles": [...]}
+    file = sys.stdin if path == '-' else open(path, 'r', encoding='utf-8')
+    try:
+        return [json.loads(line) for line in file if line.strip()]
+    finally:
+        if file is not sys.stdin:
+            file.close()
+
+
+def apply_batch(permission_set, operations):
+    for number, operation in enumerate(operations, 1):
+        rows = select_rows(
+            permission_set,
+            operation.get('names', ()),
+            operation.get('prefixes', ()),
+            operation.get('match', ''),
+            operation.get('with_roles', ()),
+            operation.get('all', False))
+        if not rows:
+            print( f"line {number}: no permission selected", file=sys.stderr)
+        value = operation.get('value')
+        if operation.get('op') == 'set-default':
+            value = batch_bool(number, value)
+        run_edit(permission_set, operation.get('op'), operation.get('roles', ()), value, rows)
+
+
+def batch_bool(number, value):
+    # JSON 的 true/false, 或與命令列相同的文字 ("yes", "0", ...)
+    if isinstance(value, bool):
+        return value
+    if not isinstance(value, str):
+        raise ValueError(f"line {number}: set-default needs a true/false 'value'")
+    try:
+        return parse_bool(value)
+    except argparse.ArgumentTypeError as e:
+        raise ValueError(f"line {number}: {e}")
+
+
+def entry_dict(permission_set, row):
+    name, default_value, roles = permission_set.entry(row)
+    return {'name': name, 'DefaultValue': default_value, 'AllowedRoles': roles}
+
+
+def print_entries(permission_set, rows, as_json):
+    if as_json:
+        print( json.dumps([entry_dict(permission_set, row) for row in rows], ensure_ascii=False))
+        return
+    for row in rows:
+        name, default_value, roles = permission_set.entry(row)
+        print( f"{name}\t{default_value}\t{', '.join(roles)}")
+
+
+def save(permission_set, args):
+    # 這次執行的所有編輯合成一個 ChangeSet, 只存檔一次
+    change_set = permission_set.change_set()
+    issues = [issue for row_issues in permission_set.validate().values() for issue in row_issues]
+    errors = errors_of(issues)
+    if errors:
+        raise ValidationError(errors)
+    # 新角色 (可能是打錯字) 要以 --allow-new-role 明確加入
+    new_roles = [role for role in new_roles_of(issues) if role not in args.allow_new_role]
+    if new_roles and args.dry_run:
+        print( f"new role(s): {', '.join(new_roles)} (saving needs --allow-new-role)", file=sys.stderr)
+    elif new_roles:
+        raise ValueError(f"new role(s) not in permissions.json: {', '.join(new_roles)}; "
+                         "add them with " + " ".join(f"--allow-new-role {role}" for role in new_roles))
+    if args.dry_run:
+        print( json.dumps(change_set.to_patch(), ensure_ascii=False, indent=None if args.json else 2))
+        return EXIT_OK
+    if not change_set:
+        print( "No changes to save.")
+        return EXIT_OK
+    result = permission_set.save(CONFLICT_CHOICES.get(args.on_conflict), export_json=args.export_json)
+    if result.conflicts:
+        for conflict in result.conflicts:
+            print( f"conflict: {conflict.name} ({', '.join(conflict.fields)})", file=sys.stderr)
+        print( "permissions.json changed on S3; rerun with --on-conflict mine|theirs", file=sys.stderr)
+        return EXIT_CONFLICT
+    if args.json:
+        print( json.dumps({'changes': result.change_count, 'patch': result.patch_key, 'merged': result.merged}))
+    else:
+        print( f"Saved {result.change_count} change(s)" + (f" ({result.patch_key})" if result.patch_key else ""))
+    return EXIT_OK
+
+
+def run(args, permission_set):
+    permission_set.load(offline=args.offline)
+
+    if args.command == 'who-can':
+        if args.json:
+            result = {name: permission_set.who_can(name) for name in args.names}
+            print( json.dumps(result, ensure_ascii=False))
+        else:
+            for name in args.names:
+                print( f"{name}\t{', '.join(permission_set.who_can(name))}")
+        return EXIT_OK
+
+    if args.command == 'validate':
+        issues = [issue for row_issues in permission_set.validate().values() for issue in row_issues]
+        if args.json:
+            print( json.dumps([vars(issue) for issue in issues], ensure_ascii=False))
+        else:
+            for issue in issues:
+                print( str(issue))
+            print( f"{len(permission_set)} permission(s) checked, {len(issues)} issue(s)", file=sys.stderr)
+        return EXIT_ERROR if errors_of(issues) else EXIT_OK
+
+    if args.command == 'access':
+        rows = permission_set.select(roles=args.roles)
+        print_entries(permission_set, rows, args.json)
+        return EXIT_OK
+
+    if args.command == 'matrix':
+        if args.summary:
+            counts = permission_set.role_counts()
+            if args.json:
+                print( json.dumps(counts, ensure_ascii=False))
+            else:
+                for role, count in counts.items():
+                    print( f"{role}\t{count}")
+        elif args.output:
+            with open(args.output, 'w', encoding='utf-8', newline='') as file:
+                write_access_matrix(permission_set.store, file)
+        else:
+            write_access_matrix(permission_set.store, sys.stdout)
+        return EXIT_OK
+
+    if args.command == 'list':
+        if has_selector(args):
+            rows = select_rows(permission_set, args.name, args.prefix, args.match, args.with_role, args.all)
+        else:
+            rows = range(len(permission_set))
+        print_entries(permission_set, rows, args.json)
+        return EXIT_OK
+
+    if args.offline and not args.dry_run:
+        raise ValueError("--offline can only be used with queries or --dry-run")
+    if args.command == 'apply':
+        apply_batch(permission_set, read_batch(args.file))
+    else:
+        if not has_selector(args):
+            raise ValueError("select permissions with --name/--prefix/--match/--with-role or --all")
+        rows = select_rows(permission_set, args.name, args.prefix, args.match, args.with_role, args.all)
+        run_edit(permission_set, args.command, getattr(args, 'role', None) or (), getattr(args, 'value', None), rows)
+        print( f"{args.command}: {len(rows)} permission(s) selected", file=sys.stderr)
+    return save(permission_set, args)
+
+
+def run_promote(args, workspace):
+    # 兩個環境都載入後, 只把來源與目標不同的列 (可用 selector 限定來源的權限) 套用到目標, 存檔一次
+    if args.offline and not args.dry_run:
+        raise ValueError("--offline can only be used with queries or --dry-run")
+    source_set = workspace.permission_set(args.source)
+    target_set = workspace.permission_set(args.target)
+    source_set.load(offline=args.offline)
+    target_set.load(offline=args.offline)
+    names = None
+    if has_selector(args):
+        rows = select_rows(source_set, args.name, args.prefix, args.match, args.with_role, args.all)
+        names = [source_set.store.name(row) for row in rows]
+    entries = workspace.stage_promotion(args.source, args.target, names)
+    print( f"promote {args.source} -> {args.target}: {len(entries)} permission(s) differ", file=sys.stderr)
+    return save(target_set, args)
+
+
+def open_workspace(args, workspace):
+    if workspace is None and args.workspace:
+        workspace = Workspace(load_environments(args.workspace))
+    if workspace is None and (args.env or args.command == 'promote'):
+        raise ValueError("--env and promote need --workspace")
+    return workspace
+
+
+def main(argv=None, transfer=None, workspace=None):
+    args = build_parser().parse_args(argv)
+    # 載入 / 存檔的 log 寫到 stderr, stdout 只留查詢結果
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    if args.trace:
+        tracing.enable(args.trace)
+    try:
+        with tracing.span('permctl', command=args.command):
+            workspace = open_workspace(args, workspace)
+            if args.command == 'promote':
+                return run_promote(args, workspace)
+            if workspace is not None:
+                permission_set = workspace.permission_set(args.env or workspace.names()[0])
+            else:
+                permission_set = PermissionSet(transfer=transfer, local_json_path=args.cache)
+            return run(args, permission_set)
+    except (KeyError, ValueError, OSError) as e:
+        print( f"permctl: {e.args[0] if isinstance(e, KeyError) else e}", file=sys.stderr)
+        return EXIT_ERROR
+    except Exception as e:
+        print( f"permctl: {type(e).__name__}: {e}", file=sys.stderr)
+        return EXIT_ERROR
+    finally:
+        if args.trace:
+            tracing.disable()
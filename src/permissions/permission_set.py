@@ -0,0 +1,293 @@
+import os
+import logging
+import threading
+from ..models.change_set import ChangeSet
+from ..models.permission_store import PermissionStore
+from ..models.search_index import SearchIndex
+from ..models.bulk_edit import BulkEdit, rows_matching, rows_with_prefix
+from ..models.snapshot_format import read_snapshot
+from ..models.three_way_merge import merge_changes
+from ..models.validation import (PermissionSchema, Validator, ValidationError,
+                                 validate_change_set, errors_of)
+from ..controllers.s3_cache import download_permissions, cached_snapshot_path, compact_path_for, DownloadCache
+from ..controllers.s3_publish import publish_changes, fetch_remote_if_changed, RemoteChangedError
+from ..controllers.s3_transfer import S3Transfer, create_s3_client
+from .. import tracing
+
+log = logging.getLogger(__name__)
+
+DEFAULT_JSON_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                 'models', 'json', 'permissions.json')
+SAVE_ATTEMPTS = 3  # 上傳時 S3 又被其他人更新 (412), 重新下載合併後再上傳的次數
+
+
+class SaveResult:
+    # save_change_set 的結果; 有衝突 (conflicts) 時尚未上傳, 由呼叫端決定後再存一次
+    def __init__(self):
+        self.permissions = None
+        self.saved_path = None
+        self.remote_path = None
+        self.merged = False
+        self.merge_result = None
+        self.patch_key = None
+        self.change_count = 0
+
+    @property
+    def conflicts(self):
+        return self.merge_result.conflicts if self.merge_result is not None else []
+
+
+def save_change_set(transfer, change_set, base_permissions, base_meta, local_json_path, callback=None,
+                    export_json=None):
+    # 存檔流程 (GUI 的 SaveWorker 與 CLI 共用):
+    # S3 上的版本已不是編輯的基準版本時, 與本地變更做三方合併後才上傳
+    # 基準是 S3 上的快照時第一次直接條件式上傳 (不先 HEAD), 被拒絕 (412) 才下載合併;
+    # 基準是 JSON (還沒有快照) 時條件式上傳保護不到 JSON, 先 HEAD 比對
+    snapshot_base = base_meta.get('ETag') and base_meta.get('Key') == transfer.layout.compact
+    with tracing.span('save', changes=len(change_set)) as span:
+        for attempt in range(SAVE_ATTEMPTS):
+            check_remote = attempt > 0 or not snapshot_base
+            try:
+                result = _save_change_set(transfer, change_set, base_permissions, base_meta, local_json_path, callback,
+                                          check_remote, export_json)
+                break
+            except RemoteChangedError:
+                # 檢查與上傳之間有人存檔: 同一份本地變更再與新的 S3 版本合併一次
+                if attempt + 1 == SAVE_ATTEMPTS:
+                    raise
+                tracing.count('save.remote_changed')
+                log.info("permissions changed on S3 during save, merging again (%d/%d)", attempt + 1, SAVE_ATTEMPTS)
+        span.set(merged=result.merged, conflicts=len(result.conflicts), attempts=attempt + 1)
+    return result
+
+
+def _save_change_set(transfer, change_set, base_permissions, base_meta, local_json_path, callback,
+                     check_remote=True, export_json=None):
+    result = SaveResult()
+    remote = None
+    if check_remote:
+        with tracing.span('save.fetch_remote'):
+            remote = fetch_remote_if_changed(transfer, base_meta, local_json_path)
+    if remote is None:
+        # 在基準版本的複本上套用變更, 上傳失敗時基準版本不受影響
+        permissions = dict(base_permissions)
+        permissions['Permissions'] = dict(base_permissions.get('Permissions', {}))
+        change_set.apply(permissions)
+    else:
+        remote_permissions, result.remote_path = remote
+        with tracing.span('save.merge'):
+            merge_result = merge_changes(change_set, remote_permissions)
+        log.info("permissions changed on S3: %d change(s) merged, %d conflict(s)",
+                 len(merge_result.auto_merged), len(merge_result.conflicts))
+        result.merge_result = merge_result
+        if merge_result.conflicts:
+            return result
+        permissions, change_set = merge_result.permissions, merge_result.change_set
+        base_permissions = remote_permissions
+        base_meta = DownloadCache(result.remote_path).load()
+        result.merged = True
+
+    # 上傳前檢查實際要發布的變更; 基準版本中已使用的角色視為已知
+    if change_set:
+        with tracing.span('save.validate'):
+            errors = errors_of(validate_change_set(change_set, PermissionSchema().add_roles_from(base_permissions)))
+        if errors:
+            raise ValidationError(errors)
+
+    if change_set:
+        result.patch_key = publish_changes(transfer, permissions, change_set, local_json_path, base_meta, callback,
+                                           export_json)
+        log.info("Published %d change(s) to %s", len(change_set), result.patch_key)
+        result.saved_path = compact_path_for(local_json_path)
+    else:
+        # 本地變更與 S3 上的版本相同, 不需要上傳
+        result.saved_path = result.remote_path
+    result.permissions = permissions
+    result.change_count = len(change_set)
+    return result
+
+
+class PermissionSet:
+    # 不依賴 PyQt6 的權限操作: 載入 / 查詢 / 批次編輯 / 存檔
+    # 編輯只改本地的 PermissionStore, save() 把所有編輯合成一個 ChangeSet 一次上傳
+    # 工作區 (Workspace) 中: transfer_factory 由共用的 S3ClientPool 建立 transfer, tables 為共用的 SharedTables
+    def __init__(self, transfer=None, local_json_path=None, aws_config=None, tables=None, transfer_factory=None):
+        self.local_json_path = local_json_path or DEFAULT_JSON_PATH
+        self.loaded_path = self.local_json_path
+        self.transfer = transfer
+        self.transfer_factory = transfer_factory
+        self.aws_config = aws_config
+        self.tables = tables
+        self._transfer_lock = threading.Lock()
+
+        self.permissions = {'Permissions': {}}
+        self.base_meta = {}
+        self.store = tables.new_store() if tables is not None else PermissionStore()
+        self.search_index = SearchIndex(self.store)
+        self.validator = Validator(self.store)
+        self.dirty_rows = set()
+
+    def get_transfer(self):
+        # 只有需要連線時才 import boto3 並建立 client
+        with self._transfer_lock:
+            if self.transfer is None and self.transfer_factory is not None:
+                self.transfer = self.transfer_factory()
+            if self.transfer is None:
+                if self.aws_config is None:
+                    from ..models.aws_config import AWSConfig
+                    self.aws_config = AWSConfig()
+                self.transfer = S3Transfer(create_s3_client(self.aws_config), self.aws_config.bucket)
+            return self.transfer
+
+    # region Load
+    def load(self, offline=False, callback=None):
+        # 條件式 GET: S3 沒變動時直接使用本地快取; offline 時只讀本地快取
+        os.makedirs(os.path.dirname(self.local_json_path), exist_ok=True)
+        if offline:
+            path = cached_snapshot_path(self.local_json_path)
+            if path is None:
+                raise FileNotFoundError(f"No local cache at {self.local_json_path}")
+            changed = False
+        else:
+            changed, path = download_permissions(self.get_transfer(), self.local_json_path, callback)
+        self.adopt(read_snapshot(path), path)
+        return changed
+
+    def adopt(self, permissions, path):
+        # 以 permissions 作為新的基準版本, 清除本地編輯
+        self.permissions = permissions
+        self.loaded_path = path
+        self.base_meta = DownloadCache(path).load()
+        if self.tables is not None:
+            self.store = self.tables.store_from_dict(permissions)
+        else:
+            self.store = PermissionStore.from_dict(permissions)
+        self.search_index = SearchIndex(self.store)
+        if self.tables is not None:
+            # 共用的 registry 含有其他環境的角色, 已知角色只取這個集合的基準版本
+            schema = PermissionSchema().add_roles_from(permissions)
+        else:
+            schema = PermissionSchema(self.store.registry.roles)
+        self.validator = Validator(self.store, schema)
+        self.dirty_rows.clear()
+    #========================================================================#
+
+    # region Query
+    def __len__(self):
+        return len(self.store)
+
+    def row_of(self, name):
+        row = self.store.index_of.get(name)
+        if row is None:
+            raise KeyError(f"Unknown permission: {name}")
+        return row
+
+    def entry(self, row):
+        store = self.store
+        return store.name(row), store.default_value(row), list(store.roles(row))
+
+    def who_can(self, name):
+        return list(self.store.roles(self.row_of(name)))
+
+    def rows_with_role(self, role):
+        # 由反向索引取出, 成本與結果數量成正比; 角色名稱不分大小寫完全比對
+        role_index = self.search_index.role_index
+        role = role_index.role_named(role)
+        return role_index.rows(role) if role is not None else []
+
+    def role_counts(self):
+        return self.search_index.role_index.counts()
+
+    def select(self, names=(), prefixes=(), match='', roles=()):
+        # 各條件的聯集; match 為名稱子字串 (與搜尋框相同), roles 為完全相同的角色
+        rows = {self.row_of(name) for name in names}
+        for prefix in prefixes:
+            rows.update(rows_with_prefix(self.search_index, prefix))
+        if match:
+            rows.update(rows_matching(self.search_index, match))
+        for role in roles:
+            rows.update(self.rows_with_role(role))
+        return sorted(rows)
+    #========================================================================#
+
+    # region Edit
+    def edit(self, rows, add_roles=(), remove_roles=(), default_value=None):
+        bulk = BulkEdit(add_roles, remove_roles, default_value)
+        if bulk.is_empty() or not rows:
+            return 0
+        bulk.apply(self.store, rows)
+        self.search_index.update_rows(rows)
+        self.dirty_rows.update(rows)
+        return len(rows)
+
+    def apply_entries(self, entries):
+        # entries: [(name, default_value, roles)]; 已存在的列更新, 不存在的加在最後 (例如由其他環境複製)
+        store = self.store
+        updated, added = [], []
+        for name, default_value, roles in entries:
+            row = store.index_of.get(name)
+            if row is None:
+                added.append(store.append(name, default_value, roles))
+            else:
+                store.set_row(row, default_value, roles)
+                updated.append(row)
+        if updated:
+            self.search_index.update_rows(updated)
+        if added:
+            self.search_index.extend()
+        self.dirty_rows.update(updated)
+        self.dirty_rows.update(added)
+        return len(updated), len(added)
+
+    def grant(self, roles, rows):
+        return self.edit(rows, add_roles=roles)
+
+    def revoke(self, roles, rows):
+        return self.edit(rows, remove_roles=roles)
+
+    def set_default(self, value, rows):
+        return self.edit(rows, default_value=value)
+
+    def validate(self, full=True):
+        # full=False 只檢查編輯過的列; 回傳 {row: [ValidationIssue]}
+        if full:
+            return self.validator.full_pass()
+        return self.validator.check_rows(sorted(self.dirty_rows))
+
+    def change_set(self):
+        # 與基準版本相同的列 (例如加入已有的角色) 不會出現在 ChangeSet
+        return ChangeSet.from_rows(self.store, sorted(self.dirty_rows), self.permissions['Permissions'])
+    #========================================================================#
+
+    # region Save
+    def save(self, on_conflict=None, callback=None, export_json=None):
+        # on_conflict: None 時回傳含衝突的 SaveResult 不上傳; RESOLVE_LOCAL / RESOLVE_REMOTE 時全部套用後再存
+        # export_json: True / False 強制 / 略過 permissions.json 匯出, None 時定期匯出
+        change_set = self.change_set()
+        if not change_set:
+            self.dirty_rows.clear()
+            return None
+        errors = errors_of(issue for issues in self.validate().values() for issue in issues)
+        if errors:
+            raise ValidationError(errors)
+        transfer = self.get_transfer()
+        base_permissions, base_meta = self.permissions, self.base_meta
+        while True:
+            result = save_change_set(transfer, change_set, base_permissions, base_meta, self.local_json_path, callback,
+                                     export_json)
+            if not result.conflicts:
+                break
+            if on_conflict is None:
+                return result
+            merge_result = result.merge_result
+            merge_result.resolve({conflict.name: on_conflict for conflict in merge_result.conflicts})
+            if not merge_result.change_set:
+                # 全部採用 S3 版本, 不需要上傳
+                result.permissions, result.saved_path = merge_result.permissions, result.remote_path
+                break
+            # S3 版本成為新的基準, 只上傳相對於它的變更
+            change_set, base_permissions = merge_result.change_set, merge_result.remote
+            base_meta = DownloadCache(result.remote_path).load()
+        self.adopt(result.permissions, result.saved_path)
+        return result
+    #========================================================================#
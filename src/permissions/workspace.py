@@ -0,0 +1,119 @@
+import os
+import json
+import threading
+from ..models.shared_tables import SharedTables
+from ..models.version_diff import diff_stores, CHANGED, ADDED
+from ..controllers.s3_cache import S3Layout, DEFAULT_LAYOUT
+from ..controllers.s3_transfer import S3ClientPool
+from .permission_set import PermissionSet, DEFAULT_JSON_PATH
+
+DEFAULT_CACHE_DIR = os.path.dirname(DEFAULT_JSON_PATH)
+
+
+def default_cache_path(name):
+    # 每個環境有自己的本地快取 / 日誌 / 歷史版本資料夾
+    return os.path.join(DEFAULT_CACHE_DIR, name, 'permissions.json')
+
+
+class Environment:
+    # 工作區中的一個權限集合: bucket 為 None 時使用 AWSConfig 的 bucket
+    def __init__(self, name, bucket=None, prefix=DEFAULT_LAYOUT.prefix, local_json_path=None):
+        if not name:
+            raise ValueError("Environment name must not be empty")
+        self.name = name
+        self.bucket = bucket
+        self.layout = S3Layout(prefix)
+        self.local_json_path = local_json_path or default_cache_path(name)
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data.get('name', ''), data.get('bucket'), data.get('prefix', DEFAULT_LAYOUT.prefix), data.get('cache'))
+
+
+def load_environments(path):
+    # 工作區檔案: {"environments": [{"name": "prod", "bucket": "...", "prefix": "InHouseTool/", "cache": "..."}]}
+    with open(path, 'r', encoding='utf-8') as file:
+        data = json.load(file)
+    environments = [Environment.from_dict(item) for item in data.get('environments', [])]
+    names = [environment.name for environment in environments]
+    if not environments:
+        raise ValueError(f"No environments in {path}")
+    if len(set(names)) != len(names):
+        raise ValueError(f"Duplicate environment names in {path}")
+    return environments
+
+
+def promotion_entries(source_store, target_store, names=None):
+    # 來源與目標不同的列 [(name, default_value, roles)]; 只複製修改與新增, 目標多出的權限不刪除
+    # names: 只取這些權限 (None 為全部)
+    diff = diff_stores(target_store, source_store)
+    names = set(names) if names is not None else None
+    entries = []
+    for kind, _, source_row in diff.entries:
+        if kind not in (CHANGED, ADDED):
+            continue
+        name = source_store.name(source_row)
+        if names is not None and name not in names:
+            continue
+        entries.append((name, source_store.default_value(source_row), source_store.roles(source_row)))
+    return entries
+
+
+class Workspace:
+    # 同時開啟多個權限集合 (環境): 共用一個 S3 client (S3ClientPool) 與角色 / 名稱對照表 (SharedTables)
+    # 各環境的 PermissionSet 在第一次使用時建立
+    def __init__(self, environments, aws_config=None, pool=None, tables=None):
+        self.environments = {environment.name: environment for environment in environments}
+        self.aws_config = aws_config
+        self.pool = pool if pool is not None else S3ClientPool()
+        self.tables = tables if tables is not None else SharedTables()
+        self._sets = {}
+        self._lock = threading.Lock()
+
+    def names(self):
+        return list(self.environments)
+
+    def environment(self, name):
+        environment = self.environments.get(name)
+        if environment is None:
+            raise KeyError(f"Unknown environment: {name}")
+        return environment
+
+    def get_aws_config(self):
+        with self._lock:
+            if self.aws_config is None:
+                from ..models.aws_config import AWSConfig
+                self.aws_config = AWSConfig()
+            return self.aws_config
+
+    def transfer(self, name):
+        environment = self.environment(name)
+        return self.pool.transfer(self.get_aws_config(), environment.bucket, environment.layout)
+
+    def transfer_factory(self, name):
+        # 給 PermissionSet / MainWindow 延後建立 transfer (第一次連線時才 import boto3)
+        self.environment(name)
+        return lambda: self.transfer(name)
+
+    def permission_set(self, name):
+        permission_set = self._sets.get(name)
+        if permission_set is None:
+            environment = self.environment(name)
+            permission_set = PermissionSet(local_json_path=environment.local_json_path, tables=self.tables,
+                                           transfer_factory=self.transfer_factory(name))
+            self._sets[name] = permission_set
+        return permission_set
+
+    def stage_promotion(self, source, target, names=None):
+        # 把來源環境的差異套用到目標環境的 PermissionSet (尚未存檔), 兩個環境都要先載入
+        if source == target:
+            raise ValueError("Source and target environments must differ")
+        target_set = self.permission_set(target)
+        entries = promotion_entries(self.permission_set(source).store, target_set.store, names)
+        target_set.apply_entries(entries)
+        return entries
+
+    def promote(self, source, target, names=None, on_conflict=None):
+        # 所有變更合成一個 ChangeSet 只上傳一次; 回傳 (entries, SaveResult), 沒有差異時 SaveResult 為 None
+        entries = self.stage_promotion(source, target, names)
+        return entries, self.permission_set(target).save(on_conflict)
@@ -0,0 +1,101 @@
+import sys
+import time
+import builtins
+import threading
+
+
+class StartupProfiler:
+    # --profile-startup: 攔截 __import__ 統計每個模組的 import 時間,
+    # 並記錄啟動過程中的幾個時間點
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.imports = {}
+        self.marks = []
+        self._local = threading.local()
+        self._original_import = None
+
+    def install(self):
+        self._original_import = builtins.__import__
+        builtins.__import__ = self._import
+        return self
+
+    def uninstall(self):
+        # 保留 _original_import, 其他 thread 可能還在 _import 裡
+        if builtins.__import__ == self._import:
+            builtins.__import__ = self._original_import
+
+    def _import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        if level == 0 and name in sys.modules and not fromlist:
+            return self._original_import(name, globals, locals, fromlist, level)
+
+        # 每個 thread 各自的巢狀 import 堆疊, 用來扣掉子模組的時間
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        stack.append(0.0)
+        start = time.perf_counter()
+        try:
+            return self._original_import(name, globals, locals, fromlist, level)
+        finally:
+            elapsed = time.perf_counter() - start
+            children = stack.pop()
+            if stack:
+                stack[-1] += elapsed
+            key = self._module_name(name, globals, level)
+            record = self.imports.setdefault(key, [0.0, 0.0])
+            record[0] += elapsed
+            record[1] += elapsed - children
+
+    @staticmethod
+    def _module_name(name, globals, level):
+        # 相對 import 轉成完整模組名稱
+        if level == 0:
+            return name
+        package = (globals or {}).get('__package__') or ''
+        if level > 1:
+            package = package.rsplit('.', level - 1)[0]
+        return f"{package}.{name}" if name else package
+
+    def mark(self, label):
+        self.marks.append((label, time.perf_counter() - self.start))
+
+    def report(self, limit=25, file=None):
+        file = file or sys.stdout
+        total = sum(own for _, own in self.imports.values())
+        print(f"Startup import time: {total * 1000:.1f} ms in {len(self.imports)} modules", file=file)
+        print(f"{'self ms':>10}{'cumulative ms':>15}  module", file=file)
+        ranked = sorted(self.imports.items(), key=lambda item: item[1][1], reverse=True)
+        for name, (cumulative, own) in ranked[:limit]:
+            print(f"{own * 1000:>10.1f}{cumulative * 1000:>15.1f}  {name}", file=file)
+        print("Startup timeline:", file=file)
+        for label, seconds in self.marks:
+            print(f"{seconds * 1000:>10.1f} ms  {label}", file=file)
+        file.flush()
+
+
+_profiler = None
+
+
+def start_if_requested(requested):
+    # requested: main.py 解析的 --profile-startup
+    global _profiler
+    if not requested:
+        return None
+    _profiler = StartupProfiler().install()
+    return _profiler
+
+
+def mark(label):
+    if _profiler is not None:
+        _profiler.mark(label)
+
+
+def finish():
+    # 視窗顯示 + 背景 client 建立完成後輸出報表
+    global _profiler
+    if _profiler is None:
+        return
+    profiler = _profiler
+    _profiler = None
+    profiler.uninstall()
+    profiler.report()
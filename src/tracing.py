@@ -0,0 +1,206 @@
+import os
+import json
+import time
+import bisect
+import threading
+
+# 直方圖的桶 (毫秒, 上界); 超過最後一個上界的值放在最後一格
+BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000)
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.last = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(BUCKETS_MS, value)] += 1
+        self.count += 1
+        self.total += value
+        self.last = value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, fraction):
+        # 以桶的上界估計, 最後一格回傳最大值
+        if not self.count:
+            return 0.0
+        target = fraction * self.count
+        seen = 0
+        for position, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return BUCKETS_MS[position] if position < len(BUCKETS_MS) else self.max
+        return self.max
+
+    def to_dict(self):
+        return {'buckets_ms': list(BUCKETS_MS), 'counts': list(self.counts), 'count': self.count,
+                'sum_ms': round(self.total, 3), 'max_ms': round(self.max, 3)}
+
+
+class Span:
+    # with tracing.span(...) as span: 結束時記錄耗時; span.set() 可在執行中補上屬性
+    __slots__ = ('tracer', 'name', 'attrs', 'start', 'wall', 'id', 'parent')
+
+    def __init__(self, tracer, name, attrs):
+        self.tracer = tracer
+        self.name = name
+        self.attrs = attrs
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        self.tracer._enter(self)
+        self.wall = time.time()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        duration = (time.perf_counter() - self.start) * 1000
+        if exc_type is not None:
+            self.attrs['error'] = exc_type.__name__
+        self.tracer._exit(self, duration)
+        return False
+
+
+class NullSpan:
+    # 未啟用時共用的空 span, 不記錄任何東西
+    __slots__ = ()
+
+    def set(self, **attrs):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        return False
+
+
+NULL_SPAN = NullSpan()
+
+
+class Tracer:
+    # span (耗時) / counter (累計值) / histogram (span 耗時與 observe 的值)
+    # path 不為 None 時每個 span 寫一行 JSON (JSONL), 結束時再寫入 counter 與 histogram
+    def __init__(self, path=None):
+        self.path = path
+        self.counters = {}
+        self.histograms = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._next_id = 0
+        self._file = open(path, 'a', encoding='utf-8') if path else None
+
+    def _enter(self, span):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        span.parent = stack[-1] if stack else None
+        with self._lock:
+            self._next_id += 1
+            span.id = self._next_id
+        stack.append(span.id)
+
+    def _exit(self, span, duration):
+        self._local.stack.pop()
+        with self._lock:
+            self._histogram(span.name).observe(duration)
+            if self._file is not None:
+                record = {'type': 'span', 'name': span.name, 'id': span.id, 'parent': span.parent,
+                          'ts': round(span.wall, 6), 'dur_ms': round(duration, 3),
+                          'thread': threading.current_thread().name}
+                if span.attrs:
+                    record['attrs'] = span.attrs
+                self._file.write(json.dumps(record, ensure_ascii=False, default=str) + '\n')
+
+    def _histogram(self, name):
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = Histogram()
+        return histogram
+
+    def count(self, name, value=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe(self, name, value):
+        with self._lock:
+            self._histogram(name).observe(value)
+
+    def snapshot(self):
+        # HUD 用: {name: (最近一次, p95, 次數)} 與 counter 的複本
+        with self._lock:
+            timings = {name: (histogram.last, histogram.percentile(0.95), histogram.count)
+                       for name, histogram in self.histograms.items()}
+            return timings, dict(self.counters)
+
+    def close(self):
+        with self._lock:
+            if self._file is None:
+                return
+            now = round(time.time(), 6)
+            for name, value in sorted(self.counters.items()):
+                self._file.write(json.dumps({'type': 'counter', 'name': name, 'ts': now, 'value': value}) + '\n')
+            for name, histogram in sorted(self.histograms.items()):
+                record = {'type': 'histogram', 'name': name, 'ts': now}
+                record.update(histogram.to_dict())
+                self._file.write(json.dumps(record) + '\n')
+            self._file.close()
+            self._file = None
+
+
+_tracer = None
+
+
+def enable(path=None):
+    global _tracer
+    disable()
+    _tracer = Tracer(path)
+    return _tracer
+
+
+def disable():
+    global _tracer
+    tracer = _tracer
+    _tracer = None
+    if tracer is not None:
+        tracer.close()
+
+
+def tracer():
+    return _tracer
+
+
+def enabled():
+    return _tracer is not None
+
+
+# 未啟用時以下函式只檢查一次全域變數, 呼叫端不需要另外判斷
+def span(name, **attrs):
+    if _tracer is None:
+        return NULL_SPAN
+    return Span(_tracer, name, attrs)
+
+
+def count(name, value=1):
+    if _tracer is not None:
+        _tracer.count(name, value)
+
+
+def observe(name, value):
+    if _tracer is not None:
+        _tracer.observe(name, value)
+
+
+def start_if_requested(path=None, hud=False):
+    # path: --trace FILE, 記錄 span 並輸出 JSONL, 同時顯示 HUD
+    # hud: --perf-hud, 只顯示 HUD; 環境變數 PERMISSION_CONTROL_TRACE 與 --trace 相同
+    path = path or os.environ.get('PERMISSION_CONTROL_TRACE') or None
+    if path is None and not hud:
+        return None
+    return enable(path)
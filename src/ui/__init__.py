@@ -1,4 +1,5 @@
 from .main_window import MainWindow
+from .workspace_window import WorkspaceWindow
 from .edit_dialog import EditPermissionDialog
 from .circle_progress_dialog import UploadProgressCallback
 from .circle_progress_dialog import CircleProgressDialog
@@ -77,6 +77,7 @@ class BlurProgressDialog(QDialog):
 
     def showEvent(self, event):
         super().showEvent(event)
+        self.reset_progress()
 
         if self.parent():
             # 獲取父視窗的位置和大小
@@ -93,6 +94,18 @@ class BlurProgressDialog(QDialog):
         self.title = title
         self.label.setText(self.title)
 
+    def set_progress(self, done, total):
+        # 已知總量時改為確定進度條
+        if total <= 0:
+            self.reset_progress()
+            return
+        self.progress_bar.setMaximum(1000)
+        self.progress_bar.setValue(int(min(done / total, 1.0) * 1000))
+
+    def reset_progress(self):
+        self.progress_bar.setMaximum(0)
+        self.progress_bar.setValue(0)
+
 
 
 def creat_progress_dialog(parent_window, title = "Uploading..."):
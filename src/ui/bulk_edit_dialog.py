@@ -0,0 +1,97 @@
+from PyQt6.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QLabel,
+    QComboBox, QPushButton, QLineEdit
+)
+
+
+class BulkEditDialog(QDialog):
+    SCOPE_SELECTED = "Selected rows"
+    SCOPE_FILTERED = "All filtered rows"
+    SCOPE_PREFIX = "Name prefix"
+
+    ROLE_KEEP = "Keep roles"
+    ROLE_ADD = "Add role"
+    ROLE_REMOVE = "Remove role"
+
+    DEFAULT_KEEP = "Unchanged"
+
+    def __init__(self, available_roles, selected_count=0, filtered_count=0, prefix="", parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Bulk Edit")
+        self.setModal(True)
+        self.setMinimumWidth(400)
+
+        self.available_roles = list(available_roles)
+        self.setup_ui(selected_count, filtered_count, prefix)
+
+    def setup_ui(self, selected_count, filtered_count, prefix):
+        layout = QVBoxLayout(self)
+
+        # 套用範圍
+        scope_layout = QHBoxLayout()
+        scope_layout.addWidget(QLabel("Apply to:"))
+        self.scope_combo = QComboBox()
+        self.scope_combo.addItem(f"{self.SCOPE_SELECTED} ({selected_count})", self.SCOPE_SELECTED)
+        self.scope_combo.addItem(f"{self.SCOPE_FILTERED} ({filtered_count})", self.SCOPE_FILTERED)
+        self.scope_combo.addItem(self.SCOPE_PREFIX, self.SCOPE_PREFIX)
+        self.scope_combo.setStyleSheet("color : white; ")
+        if selected_count == 0:
+            self.scope_combo.setCurrentIndex(1)
+        scope_layout.addWidget(self.scope_combo)
+        layout.addLayout(scope_layout)
+
+        # 名稱前綴, 例如 ControllerParameter_
+        prefix_layout = QHBoxLayout()
+        prefix_layout.addWidget(QLabel("Prefix:"))
+        self.prefix_input = QLineEdit(prefix)
+        self.prefix_input.setPlaceholderText("e.g. ControllerParameter_")
+        self.prefix_input.setStyleSheet("color: white;")
+        prefix_layout.addWidget(self.prefix_input)
+        layout.addLayout(prefix_layout)
+
+        # 角色變更
+        role_layout = QHBoxLayout()
+        role_layout.addWidget(QLabel("Roles:"))
+        self.role_action_combo = QComboBox()
+        self.role_action_combo.addItems([self.ROLE_KEEP, self.ROLE_ADD, self.ROLE_REMOVE])
+        self.role_action_combo.setStyleSheet("color : white; ")
+        self.role_combo = QComboBox()
+        self.role_combo.addItems(self.available_roles)
+        self.role_combo.setEditable(True)  # 可輸入新角色
+        self.role_combo.setStyleSheet("color : white; ")
+        role_layout.addWidget(self.role_action_combo)
+        role_layout.addWidget(self.role_combo)
+        layout.addLayout(role_layout)
+
+        # Default Value
+        default_layout = QHBoxLayout()
+        default_layout.addWidget(QLabel("Default Value:"))
+        self.default_combo = QComboBox()
+        self.default_combo.addItems([self.DEFAULT_KEEP, "True", "False"])
+        self.default_combo.setStyleSheet("color : white; ")
+        default_layout.addWidget(self.default_combo)
+        layout.addLayout(default_layout)
+
+        # 確認和取消按鈕
+        buttons_layout = QHBoxLayout()
+        self.ok_button = QPushButton("Apply")
+        self.cancel_button = QPushButton("Cancel")
+        buttons_layout.addWidget(self.ok_button)
+        buttons_layout.addWidget(self.cancel_button)
+
+        self.ok_button.clicked.connect(self.accept)
+        self.cancel_button.clicked.connect(self.reject)
+
+        layout.addLayout(buttons_layout)
+
+    def get_values(self):
+        role_action = self.role_action_combo.currentText()
+        role = self.role_combo.currentText().strip()
+        default_text = self.default_combo.currentText()
+        return {
+            'scope': self.scope_combo.currentData(),
+            'prefix': self.prefix_input.text(),
+            'add_roles': [role] if role_action == self.ROLE_ADD and role else [],
+            'remove_roles': [role] if role_action == self.ROLE_REMOVE and role else [],
+            'default_value': None if default_text == self.DEFAULT_KEEP else default_text == "True",
+        }
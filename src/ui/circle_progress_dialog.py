@@ -1,21 +1,36 @@
+import threading
 from PyQt6.QtWidgets import QDialog, QVBoxLayout, QLabel
 from PyQt6.QtGui import QPainter, QColor, QPen
 from PyQt6.QtCore import Qt, QRectF
 
 
 class UploadProgressCallback:
-    def __init__(self, progress_dialog):
+    # boto3 的 Callback(bytes_amount); multipart 時會從多個 thread 呼叫
+    # 有 on_progress 時以 (已傳輸, 總量) 回報, 跨 thread 請傳入 pyqtSignal.emit
+    def __init__(self, progress_dialog=None, total_bytes=0, on_progress=None):
         self._progress_dialog = progress_dialog
-        self._total_bytes = 0
+        self._on_progress = on_progress
+        self._total_bytes = total_bytes
         self._uploaded_bytes = 0
+        self._lock = threading.Lock()
+
+    def set_total(self, total_bytes):
+        with self._lock:
+            self._total_bytes = total_bytes
+            self._uploaded_bytes = 0
 
     def __call__(self, bytes_amount):
-        if self._total_bytes == 0:
-            self._total_bytes = bytes_amount
-        else:
+        with self._lock:
+            if self._total_bytes == 0:
+                self._total_bytes = bytes_amount
+                return
             self._uploaded_bytes += bytes_amount
-            progress = min(self._uploaded_bytes / self._total_bytes, 1.0)
-            self._progress_dialog.progress = progress
+            uploaded = self._uploaded_bytes
+            total = self._total_bytes
+        if self._on_progress is not None:
+            self._on_progress(min(uploaded, total), total)
+        if self._progress_dialog is not None:
+            self._progress_dialog.progress = min(uploaded / total, 1.0)
 
 
 class CircleProgressDialog(QDialog):
@@ -4,10 +4,11 @@ from PyQt6.QtWidgets import (
     QComboBox, QListWidget, QPushButton, QLineEdit, QListWidgetItem
 )
 from PyQt6.QtCore import Qt
+from ..models.role_registry import DEFAULT_ROLES
 
 
 class EditPermissionDialog(QDialog):
-    def __init__(self, permission_name, default_value, current_roles, parent=None):
+    def __init__(self, permission_name, default_value, current_roles, available_roles=None, parent=None):
         super().__init__(parent)
         self.setWindowTitle("Edit Permission")
         self.setModal(True)
@@ -17,13 +18,8 @@ class EditPermissionDialog(QDialog):
         self.permission_name = permission_name
         self.current_roles = current_roles
 
-        # 預定義的角色列表
-        self.available_roles = [
-            "AM", "Battery", "CSD_PR", "CSD_T", "Charger",
-            "Derailleur", "Engineering", "FAE", "FW", "HW",
-            "ME", "Motor", "PM", "Production_Line", "Q",
-            "SW", "Sales"
-        ]
+        # 角色列表來自 RoleRegistry
+        self.available_roles = list(available_roles if available_roles is not None else DEFAULT_ROLES)
 
         self.setup_ui(permission_name, default_value, current_roles)
 
@@ -100,8 +96,9 @@ class EditPermissionDialog(QDialog):
     def add_role(self):
         current_item = self.available_roles_list.currentItem()
         if current_item:
-            # 創建新的 QListWidgetItem
-            new_item = QListWidgetItem( "* " + current_item.text())
+            # 新加入的角色以顏色標示
+            new_item = QListWidgetItem(current_item.text())
+            new_item.setForeground(QBrush(QColor("#26a69a")))
             self.selected_roles_list.addItem(new_item)
             self.available_roles_list.takeItem(self.available_roles_list.row(current_item))
 
@@ -0,0 +1,227 @@
+import time
+from collections import OrderedDict
+from PyQt6.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QLabel, QPushButton,
+    QTableWidget, QTableWidgetItem, QTableView, QAbstractItemView, QHeaderView
+)
+from PyQt6.QtCore import Qt, QThread, QAbstractTableModel, QModelIndex, pyqtSignal
+from ..controllers.s3_history import load_index, load_version
+from ..models.snapshot_format import decode_store
+from ..models.version_diff import diff_stores
+
+WORKING_COPY = {'id': None, 'timestamp': 'Working copy (unsaved)', 'changes': '', 'size': ''}
+
+
+class VersionDiffModel(QAbstractTableModel):
+    HEADERS = ["Permission Name", "Change", "Default", "Roles Added", "Roles Removed"]
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.diff = None
+
+    def set_diff(self, diff):
+        self.beginResetModel()
+        self.diff = diff
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid() or self.diff is None:
+            return 0
+        return len(self.diff)
+
+    def columnCount(self, parent=QModelIndex()):
+        return len(self.HEADERS)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        # 顯示文字只替畫面上的列產生
+        if not index.isValid() or role != Qt.ItemDataRole.DisplayRole:
+            return None
+        diff = self.diff
+        row = index.row()
+        column = index.column()
+        kind, old_row, new_row = diff.entries[row]
+        if column == 0:
+            return diff.name(row)
+        if column == 1:
+            return kind
+        if column == 2:
+            old = str(diff.old_store.default_value(old_row)) if old_row >= 0 else '-'
+            new = str(diff.new_store.default_value(new_row)) if new_row >= 0 else '-'
+            return old if old == new else f"{old} -> {new}"
+        added, removed = diff.role_delta(row)
+        return ', '.join(added if column == 3 else removed)
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role != Qt.ItemDataRole.DisplayRole:
+            return None
+        if orientation == Qt.Orientation.Horizontal:
+            return self.HEADERS[section]
+        return str(section + 1)
+
+
+class HistoryWorker(QThread):
+    # 下載索引 / 版本快照並計算差異, 不佔用 GUI thread
+    index_loaded = pyqtSignal(object)
+    diff_ready = pyqtSignal(object, float)
+    version_loaded = pyqtSignal(object)
+    error = pyqtSignal(str)
+
+    STORE_CACHE_SIZE = 4
+
+    def __init__(self, main_window, cache):
+        super().__init__()
+        self.main_window = main_window
+        self.cache = cache
+        self.job = None
+        self._stores = OrderedDict()
+        self._stopped = False
+
+    def request(self, job):
+        if self._stopped or self.isRunning():
+            return False
+        self.job = job
+        self.start()
+        return True
+
+    def stop(self):
+        # 主視窗關閉時: 不再接受新的工作, 等進行中的下載 / 比較結束
+        self._stopped = True
+        self.wait()
+
+    def store_for(self, version):
+        # 最近解開的版本留在記憶體 (LRU), 重複比較時不需要再解壓
+        if version['id'] is None:
+            return version['store']
+        store = self._stores.get(version['id'])
+        if store is None:
+            transfer = self.main_window.get_transfer()
+            store = decode_store(load_version(transfer, version, self.cache))
+            self._stores[version['id']] = store
+            while len(self._stores) > self.STORE_CACHE_SIZE:
+                self._stores.popitem(last=False)
+        self._stores.move_to_end(version['id'])
+        return store
+
+    def run(self):
+        try:
+            kind, versions = self.job
+            if kind == 'index':
+                self.index_loaded.emit(load_index(self.main_window.get_transfer()))
+            elif kind == 'diff':
+                old_store = self.store_for(versions[0])
+                new_store = self.store_for(versions[1])
+                start = time.perf_counter()
+                diff = diff_stores(old_store, new_store)
+                self.diff_ready.emit(diff, (time.perf_counter() - start) * 1000)
+            elif kind == 'restore':
+                self.version_loaded.emit(self.store_for(versions[0]))
+        except Exception as e:
+            self.error.emit(str(e))
+
+
+class HistoryDialog(QDialog):
+    # 版本歷史: 選兩個版本比較每個權限的差異, 或把某個版本還原成本地編輯
+    restore_requested = pyqtSignal(object)
+
+    def __init__(self, main_window, cache):
+        super().__init__(main_window)
+        self.setWindowTitle("Permission History")
+        self.setMinimumSize(1000, 600)
+        self.main_window = main_window
+        self.versions = []
+
+        self.worker = HistoryWorker(main_window, cache)
+        self.worker.index_loaded.connect(self.on_index_loaded)
+        self.worker.diff_ready.connect(self.on_diff_ready)
+        self.worker.version_loaded.connect(self.restore_requested.emit)
+        self.worker.error.connect(self.on_error)
+        self.setup_ui()
+
+    def setup_ui(self):
+        layout = QVBoxLayout(self)
+        layout.addWidget(QLabel("Select two versions to compare, or one version to restore:"))
+
+        self.version_table = QTableWidget(0, 4)
+        self.version_table.setHorizontalHeaderLabels(["Saved At (UTC)", "Changes", "Size", "Version"])
+        self.version_table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.version_table.setSelectionMode(QAbstractItemView.SelectionMode.ExtendedSelection)
+        self.version_table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.version_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
+        self.version_table.setMaximumHeight(200)
+        layout.addWidget(self.version_table)
+
+        buttons_layout = QHBoxLayout()
+        self.refresh_button = QPushButton("Refresh")
+        self.compare_button = QPushButton("Compare")
+        self.restore_button = QPushButton("Restore")
+        buttons_layout.addWidget(self.refresh_button)
+        buttons_layout.addWidget(self.compare_button)
+        buttons_layout.addWidget(self.restore_button)
+        buttons_layout.addStretch()
+        self.status_label = QLabel("")
+        buttons_layout.addWidget(self.status_label)
+        layout.addLayout(buttons_layout)
+
+        self.diff_model = VersionDiffModel(self)
+        self.diff_view = QTableView()
+        self.diff_view.setModel(self.diff_model)
+        self.diff_view.setWordWrap(False)
+        self.diff_view.verticalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Fixed)
+        self.diff_view.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
+        layout.addWidget(self.diff_view)
+
+        self.refresh_button.clicked.connect(self.refresh)
+        self.compare_button.clicked.connect(self.compare)
+        self.restore_button.clicked.connect(self.restore)
+
+    def refresh(self):
+        if self.worker.request(('index', None)):
+            self.status_label.setText("Loading history ...")
+
+    def on_index_loaded(self, index):
+        # 最新的版本在最上面, 第一列是目前的工作內容
+        self.versions = [WORKING_COPY] + list(reversed(index.get('versions', [])))
+        self.version_table.setRowCount(len(self.versions))
+        for row, version in enumerate(self.versions):
+            values = [version['timestamp'], str(version['changes']), str(version['size']), (version['id'] or '')[:12]]
+            for column, value in enumerate(values):
+                self.version_table.setItem(row, column, QTableWidgetItem(value))
+        self.status_label.setText(f"{len(self.versions) - 1} version(s)")
+
+    def selected_versions(self):
+        rows = sorted({index.row() for index in self.version_table.selectionModel().selectedRows()})
+        versions = []
+        for row in rows:
+            version = self.versions[row]
+            if version['id'] is None:
+                # 工作內容在 GUI thread 複製一份, worker 讀取時不會被編輯影響
+                version = dict(version, store=self.main_window.table_model.store.copy())
+            versions.append(version)
+        return versions
+
+    def compare(self):
+        versions = self.selected_versions()
+        if len(versions) != 2:
+            self.status_label.setText("Select exactly two versions to compare.")
+            return
+        # 列表由新到舊, 比較時舊版本在前
+        if self.worker.request(('diff', [versions[1], versions[0]])):
+            self.status_label.setText("Comparing ...")
+
+    def on_diff_ready(self, diff, elapsed_ms):
+        self.diff_model.set_diff(diff)
+        counts = diff.counts()
+        self.status_label.setText(
+            f"{counts['Added']} added, {counts['Removed']} removed, {counts['Changed']} changed "
+            f"({elapsed_ms:.1f} ms)")
+
+    def restore(self):
+        versions = self.selected_versions()
+        if len(versions) != 1 or versions[0]['id'] is None:
+            self.status_label.setText("Select one saved version to restore.")
+            return
+        if self.worker.request(('restore', versions)):
+            self.status_label.setText("Loading version ...")
+
+    def on_error(self, error_message):
+        self.status_label.setText(f"Error: {error_message}")
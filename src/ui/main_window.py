@@ -1,21 +1,51 @@
 import sys
 import os
-import json
-import boto3
+import logging
+import threading
 from PyQt6.QtWidgets import (
     QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
-    QLineEdit, QPushButton, QTableWidget, QTableWidgetItem,
-    QHeaderView, QMessageBox, QProgressDialog
+    QLineEdit, QPushButton, QLabel, QTableView, QTreeView, QAbstractItemView,
+    QHeaderView, QMessageBox, QProgressDialog, QCompleter, QFileDialog, QComboBox
 )
-from PyQt6.QtCore import (Qt, QThread, pyqtSignal)
+from PyQt6.QtCore import (Qt, QTimer, QStringListModel, QModelIndex)
+from PyQt6.QtGui import QKeySequence
 from .edit_dialog import EditPermissionDialog
+from .bulk_edit_dialog import BulkEditDialog
+from .merge_conflict_dialog import MergeConflictDialog
+from .history_dialog import HistoryDialog
 from ..models.aws_config import AWSConfig
+from ..models.change_set import ChangeSet
+from ..models.version_diff import diff_stores, CHANGED, ADDED
+from ..controllers.s3_cache import cached_snapshot_path, DownloadCache
+from ..controllers.change_journal import ChangeJournal
+from ..controllers.s3_history import HistoryCache
+from ..controllers.s3_transfer import S3Transfer, create_s3_client
+from .. import startup_profiler
+from .. import tracing
+from ..models.permission_store import PermissionStore
+from ..models.search_index import SearchIndex
+from ..models.name_search import SearchQuery, SearchQueryError, CONTAINS, FUZZY, REGEX
+from ..models.role_index import write_access_matrix
+from ..models.validation import Validator, PermissionSchema, errors_of, new_roles_of
+from ..models.bulk_edit import BulkEdit, rows_with_prefix
+from ..models.edit_history import EditCommand, EditHistory
+from .permission_table_model import PermissionTableModel
+from .permission_filter_proxy import PermissionFilterProxyModel
+from .permission_tree_model import PermissionTreeModel
+from .permission_matrix_model import PermissionMatrixModel, RoleCheckDelegate
+from .name_highlight_delegate import NameHighlightDelegate
+from .perf_hud import PerfHud
 from .blur_progress_dialog import creat_progress_dialog
+from .workers import SaveWorker, SaveRequest, RefreshPoller, SyncWorker, LoadWorker, SearchWorker
+
+log = logging.getLogger(__name__)
 
 
 class MainWindow(QMainWindow):
+    FILTER_DEBOUNCE_MS = 150
 
-    def __init__(self):
+    def __init__(self, transfer=None, local_json_path=None, autoload=True, poll_interval=None,
+                 tables=None, transfer_factory=None):
         super().__init__()
         self.setWindowTitle("Permission Control System")
         self.setGeometry(100, 100, 1000, 600)
@@ -23,10 +53,23 @@ class MainWindow(QMainWindow):
         self.setWindowFlags( self.windowFlags() | Qt.WindowType.Window | Qt.WindowType.WindowStaysOnTopHint )
         self.setup_ui()
 
-        # AWS 設定
+        # 目前的基準版本 (最後一次載入 / 存檔的內容) 與被編輯過的列
+        self.permissions = {'Permissions': {}}
+        self.validator = None
+        self.base_meta = {}
+        self.dirty_rows = set()
+        self.edit_history = EditHistory()
+        # 載入中 (先顯示本地快取, 再檢查 S3) 不允許編輯: S3 有新版本時表格會整個換掉
+        self.loading = False
+
+        # AWS 設定: S3 client 延後到背景 thread 第一次使用時才建立
+        # 工作區中由 transfer_factory 以共用的 S3ClientPool 建立, tables 為各分頁共用的 SharedTables
         self.aws_config = AWSConfig()
-        self.session = boto3.Session(**self.aws_config.credentials)
-        self.s3_client = self.session.client('s3')
+        self.s3_client = getattr(transfer, 'client', None)
+        self.transfer = transfer
+        self.transfer_factory = transfer_factory
+        self.tables = tables
+        self._transfer_lock = threading.Lock()
 
         # Progress View
         self.progress_dialog = None
@@ -36,18 +79,49 @@ class MainWindow(QMainWindow):
 
         # download permissions.json
         self.base_dir = os.path.dirname(os.path.abspath(__file__))
-        self.local_json_path = os.path.join(self.base_dir, '..', 'models', 'json', 'permissions.json')
+        self.local_json_path = local_json_path or os.path.join(self.base_dir, '..', 'models', 'json', 'permissions.json')
+        self.loaded_path = self.local_json_path
         self.load_permissions_worker = LoadWorker(self)
+        self.load_permissions_worker.load_started.connect(self.on_load_started)
+        self.load_permissions_worker.batch_loaded.connect(self.on_batch_loaded)
         self.load_permissions_worker.finished.connect(self.on_load_complete)
         self.load_permissions_worker.error.connect(self.on_load_error)
+        self.load_permissions_worker.offline.connect(self.on_load_offline)
+        self.load_permissions_worker.progress.connect(self.load_progress_dialog.set_progress)
 
         #save
         self.save_worker = SaveWorker(self)
         self.save_worker.finished.connect(self.on_save_complete)
         self.save_worker.error.connect(self.on_save_error)
-
-
-        self.load_permissions()
+        self.save_worker.conflicts.connect(self.on_save_conflicts)
+        self.save_worker.offline.connect(self.on_save_offline)
+        self.save_worker.progress.connect(self.uploading_progress_dialog.set_progress)
+
+        # 離線模式: 存檔先寫入日誌, 連線恢復後由 SyncWorker 通知重播
+        self.journal = ChangeJournal(self.local_json_path)
+        self.journal_replayed = False
+        self.offline = False
+        self.sync_worker = SyncWorker(self)
+        self.sync_worker.online.connect(self.on_back_online)
+
+        # live refresh: 定期以 HEAD 檢查 S3, 有變動時只更新變更的列
+        self.refresh_poller = None
+        # 有未存檔的編輯時收到的 S3 版本: (比對用的基準, S3 版本, 本地路徑); 基準不變, 放棄編輯時才採用
+        self.remote_update = None
+        if poll_interval:
+            self.refresh_poller = RefreshPoller(self, poll_interval)
+            self.refresh_poller.remote_changed.connect(self.on_remote_changed)
+            self.refresh_poller.error.connect(self.on_poll_error)
+
+        # --trace / --perf-hud: 狀態列顯示各階段耗時
+        self.perf_hud = None
+        if tracing.enabled():
+            self.perf_hud = PerfHud(self)
+            self.statusBar().addPermanentWidget(self.perf_hud)
+
+
+        if autoload:
+            self.load_permissions()
 
     def setup_ui(self):
         # 創建中央視窗
@@ -65,71 +139,260 @@ class MainWindow(QMainWindow):
         self.search_input_permission.textChanged.connect(self.filter_permissions)
         search_layout.addWidget(self.search_input_permission)
 
+        # 名稱的比對方式: 子字串 / 模糊 (例如 "bat1 crc") / regex
+        self.search_mode_box = QComboBox()
+        self.search_mode_box.addItem("Contains", CONTAINS)
+        self.search_mode_box.addItem("Fuzzy", FUZZY)
+        self.search_mode_box.addItem("Regex", REGEX)
+        self.search_mode_box.currentIndexChanged.connect(lambda index: self.filter_timer.start())
+        search_layout.addWidget(self.search_mode_box)
+
         self.search_input_roles = QLineEdit()
-        self.search_input_roles.setPlaceholderText("Search Roles...")
+        self.search_input_roles.setPlaceholderText("Filter Roles (exact, e.g. FW, Q)...")
         self.search_input_roles.setStyleSheet("color: white;")
         self.search_input_roles.textChanged.connect(self.filter_roles)
+        # 角色為完全比對, 以自動完成列出已知的角色
+        self.role_completer_model = QStringListModel(self)
+        role_completer = QCompleter(self.role_completer_model, self)
+        role_completer.setCaseSensitivity(Qt.CaseSensitivity.CaseInsensitive)
+        self.search_input_roles.setCompleter(role_completer)
 
         search_layout.addWidget(self.search_input_roles)
 
+        # 切換成依名稱前綴分組的樹狀檢視
+        self.tree_view_button = QPushButton("Tree View")
+        self.tree_view_button.setCheckable(True)
+        self.tree_view_button.toggled.connect(self.set_tree_mode)
+        search_layout.addWidget(self.tree_view_button)
+
+        # 切換成權限 x 角色的勾選矩陣
+        self.matrix_view_button = QPushButton("Matrix View")
+        self.matrix_view_button.setCheckable(True)
+        self.matrix_view_button.toggled.connect(self.set_matrix_mode)
+        search_layout.addWidget(self.matrix_view_button)
+
+        # 輸入停頓後才執行過濾, 兩個搜尋框的條件以 AND 合併
+        self.search_index = None
+        self.filter_timer = QTimer(self)
+        self.filter_timer.setSingleShot(True)
+        self.filter_timer.setInterval(self.FILTER_DEBOUNCE_MS)
+        self.filter_timer.timeout.connect(self.apply_filters)
+
+        # 模糊 / regex 搜尋在背景執行, 只採用與目前條件相同且未過期的結果
+        self.name_result = None
+        self.search_worker = SearchWorker()
+        self.search_worker.result_ready.connect(self.on_search_result)
+        self.search_worker.error.connect(lambda query, message: log.warning("Search failed: %s", message))
+
         # 添加搜尋佈局到主佈局
         main_layout.addLayout(search_layout)
 
-        # 創建表格
-        self.table = QTableWidget()
-        self.table.setColumnCount(3)
-        self.table.setHorizontalHeaderLabels(["Permission Name", "Default", "Roles"])
+        # 創建表格 (model/view, 只繪製可見的列)
+        self.table_model = PermissionTableModel(parent=self)
+        self.proxy_model = PermissionFilterProxyModel(self)
+        self.proxy_model.setSourceModel(self.table_model)
+        self.table = QTableView()
+        self.table.setModel(self.proxy_model)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.table.setSelectionMode(QAbstractItemView.SelectionMode.ExtendedSelection)
+        self.table.setWordWrap(False)
+        # 固定列高, 避免 view 逐列量測高度
+        self.table.verticalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Fixed)
 
         # 設置表格列寬
         header = self.table.horizontalHeader()
-        header.setSectionResizeMode(0, QHeaderView.ResizeMode.ResizeToContents)
-        header.setSectionResizeMode(1, QHeaderView.ResizeMode.ResizeToContents)
+        # 名稱 / Default 欄寬只在換上新資料時依內容計算 (fit_columns); ResizeToContents 會在
+        # 每次過濾與每批載入後重新取樣, 每個取樣都經過 proxy 的 Python mapToSource
+        header.setSectionResizeMode(0, QHeaderView.ResizeMode.Interactive)
+        header.setSectionResizeMode(1, QHeaderView.ResizeMode.Interactive)
         header.setSectionResizeMode(2, QHeaderView.ResizeMode.Stretch)
+        header.setResizeContentsPrecision(200)  # 只取樣部分列來計算欄寬
+        # 標示名稱中符合搜尋的字元
+        self.name_delegate = NameHighlightDelegate(self.table)
+        self.table.setItemDelegateForColumn(PermissionTableModel.NAME_COLUMN, self.name_delegate)
 
         main_layout.addWidget(self.table)
 
+        # 樹狀檢視: 第一次切換時才建立 model, 群組展開時才產生子項目
+        self.tree_model = None
+        self.tree = QTreeView()
+        self.tree.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.tree.setSelectionMode(QAbstractItemView.SelectionMode.ExtendedSelection)
+        self.tree.setUniformRowHeights(True)  # 固定列高, 不需逐列量測
+        self.tree.setWordWrap(False)
+        self.tree.hide()
+        main_layout.addWidget(self.tree)
+
+        # 矩陣檢視: 第一次切換時才建立; 與表格使用相同的過濾結果
+        self.matrix_model = None
+        self.matrix_proxy = None
+        self.matrix = QTableView()
+        self.matrix.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.matrix.setSelectionMode(QAbstractItemView.SelectionMode.ExtendedSelection)
+        self.matrix.setWordWrap(False)
+        self.matrix.verticalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Fixed)
+        self.matrix.horizontalHeader().setDefaultSectionSize(72)
+        self.matrix.setItemDelegate(RoleCheckDelegate(self.matrix))
+        self.matrix_name_delegate = NameHighlightDelegate(self.matrix)
+        self.matrix.setItemDelegateForColumn(PermissionMatrixModel.NAME_COLUMN, self.matrix_name_delegate)
+        self.matrix.hide()
+        main_layout.addWidget(self.matrix)
+
         # 按鈕佈局
         button_layout = QHBoxLayout()
         self.edit_button = QPushButton("Edit")
+        self.bulk_edit_button = QPushButton("Bulk Edit")
+        self.undo_button = QPushButton("Undo")
+        self.redo_button = QPushButton("Redo")
         self.save_button = QPushButton("Save")
         self.cancel_button = QPushButton("Cancel")
+        self.history_button = QPushButton("History")
+        self.export_matrix_button = QPushButton("Export Matrix")
+        self.undo_button.setEnabled(False)
+        self.redo_button.setEnabled(False)
+        self.undo_button.setShortcut(QKeySequence(QKeySequence.StandardKey.Undo))
+        self.redo_button.setShortcut(QKeySequence(QKeySequence.StandardKey.Redo))
         self.save_button.setEnabled(False)  # 初始時禁用保存按鈕
         self.cancel_button.setEnabled(False)  # 初始時禁用保存按鈕
 
         button_layout.addWidget(self.edit_button)
+        button_layout.addWidget(self.bulk_edit_button)
+        button_layout.addWidget(self.undo_button)
+        button_layout.addWidget(self.redo_button)
         button_layout.addWidget(self.save_button)
         button_layout.addWidget(self.cancel_button)
         button_layout.addStretch()
+        self.validation_label = QLabel("")
+        self.validation_label.setStyleSheet("color: #ff6b6b;")
+        button_layout.addWidget(self.validation_label)
+        self.sync_label = QLabel("")
+        button_layout.addWidget(self.sync_label)
+        button_layout.addWidget(self.export_matrix_button)
+        button_layout.addWidget(self.history_button)
 
         # 連接按鈕信號
         self.edit_button.clicked.connect(self.enable_editing)
+        self.bulk_edit_button.clicked.connect(self.bulk_edit)
+        self.undo_button.clicked.connect(self.undo_edit)
+        self.redo_button.clicked.connect(self.redo_edit)
         self.save_button.clicked.connect(self.save_changes)
         self.cancel_button.clicked.connect(self.cancel_changes)
+        self.history_button.clicked.connect(self.show_history)
+        self.export_matrix_button.clicked.connect(self.export_access_matrix)
+        self.history_dialog = None
 
         main_layout.addLayout(button_layout)
 
+    def get_transfer(self):
+        # 可能從 worker thread 呼叫; 第一次呼叫時才 import boto3 並建立 client
+        with self._transfer_lock:
+            if self.transfer is None and self.transfer_factory is not None:
+                self.transfer = self.transfer_factory()
+                self.s3_client = self.transfer.client
+            if self.transfer is None:
+                self.s3_client = create_s3_client(self.aws_config)
+                self.transfer = S3Transfer(self.s3_client, self.aws_config.bucket)
+                startup_profiler.mark("S3 client ready")
+            return self.transfer
+
     # region Load permission Worker : doing, finished, error
     def load_permissions(self):
-        self.show_progress(self.load_progress_dialog)
+        # 有本地快取時直接顯示快取內容, 不擋住畫面
+        self.set_loading(True)
+        if cached_snapshot_path(self.local_json_path) is None or len(self.table_model.store):
+            self.show_progress(self.load_progress_dialog)
+        # S3 回傳 304 且表格已載入時, worker 不需要重新解析
+        self.load_permissions_worker.has_data = len(self.table_model.store) > 0
         self.load_permissions_worker.start()
-        print( "Load permissions worker started" )
-
-    def on_load_complete(self):
+        log.info("Load permissions worker started")
+
+    def on_load_started(self):
+        # worker 開始解析, 清空表格準備逐批加入
+        store = self.tables.new_store() if self.tables is not None else PermissionStore()
+        self.search_index = SearchIndex(store)
+        self.table_model.set_store(store)
+        self.validator = None
+        self.dirty_rows.clear()
+        self.clear_edit_history()
+        if self.proxy_model.has_filter():
+            self.set_visible_rows(bytearray())
+
+    def on_batch_loaded(self, batch):
+        # 第一批到達就可以操作表格, 搜尋只作用在已載入的列
         self.hide_progress(self.load_progress_dialog)
-        # 讀取下載的 JSON 檔案
-        print( "Complete load permissions json")
-        try:
-            with open(self.local_json_path, 'r', encoding='utf-8') as file:
-                permissions = json.load(file)
-                self.populate_table(permissions)
-        except json.JSONDecodeError as e:
-            QMessageBox.critical(self, "Load Error",
-                                 f"An error occurred while Loading: Invalid JSON format: {str(e)}")
+        with tracing.span('table.populate', rows=len(batch)):
+            self.table_model.append_rows(batch)
+            self.search_index.extend()
+        if len(self.table_model.store) == len(batch):
+            self.fit_columns()
+        if self.proxy_model.has_filter():
+            self.filter_timer.start()
+
+    def set_loading(self, loading):
+        self.loading = loading
+        self.edit_button.setEnabled(not loading)
+        self.bulk_edit_button.setEnabled(not loading)
+        if loading:
+            self.undo_button.setEnabled(False)
+            self.redo_button.setEnabled(False)
+        else:
+            self.update_history_buttons()
+
+    def editing_blocked(self):
+        if self.loading:
+            self.statusBar().showMessage("Checking S3 for a newer version; editing is available when loading finishes.", 3000)
+        return self.loading
+
+    def on_load_complete(self, changed=True):
+        self.hide_progress(self.load_progress_dialog)
+        self.set_loading(False)
+        startup_profiler.finish()
+        self.start_polling()
+        adopted = self.adopt_loaded_permissions()
+        self.update_role_completer()
+        self.reset_validator()
+        if self.offline:
+            self.offline = False
+            self.update_sync_status()
+        self.replay_journal()
+        if not adopted:
+            log.info("permissions.json not modified, skip reload")
+            return
+        log.info("Complete load permissions json")
+
+    def adopt_loaded_permissions(self):
+        # worker 解析完成的內容成為新的基準版本
+        worker = self.load_permissions_worker
+        if worker.permissions is None:
+            return False
+        self.permissions = worker.permissions
+        self.loaded_path = worker.parsed_path
+        # 基準版本的 ETag, 存檔時用來偵測其他人的變更
+        self.base_meta = DownloadCache(self.loaded_path).load()
+        self.watch_remote()
+        worker.permissions = None
+        self.apply_filters()
+        return True
 
     def on_load_error(self, error_message):
         self.hide_progress(self.load_progress_dialog)
+        self.set_loading(False)
+        startup_profiler.finish()
+        # 下載失敗時仍保留已從本地快取載入的內容
+        self.adopt_loaded_permissions()
+        self.start_polling()
         QMessageBox.critical(self, "Load Error",
                              f"An error occurred while Loading: {error_message}")
+
+    def on_load_offline(self, error_message):
+        # 連不到 S3: 使用本地快取繼續工作, 不彈出錯誤
+        self.hide_progress(self.load_progress_dialog)
+        self.set_loading(False)
+        startup_profiler.finish()
+        self.adopt_loaded_permissions()
+        self.reset_validator()
+        self.go_offline(error_message)
+        self.replay_journal()
     #========================================================================#
 
 
@@ -137,17 +400,272 @@ class MainWindow(QMainWindow):
 
     # region Save Worker : doing, finished, error
     def save_changes(self):
+        # 只收集編輯過的列, 存檔成本與編輯數量成正比
+        change_set = ChangeSet.from_rows(self.table_model.store, sorted(self.dirty_rows), self.permissions['Permissions'])
+        if not change_set:
+            QMessageBox.information(self, "Save", "There are no changes to save.")
+            self.save_button.setEnabled(False)
+            self.cancel_button.setEnabled(False)
+            return
+        # 上傳前完整驗證一次, 有錯誤時不存檔
+        if not self.validate_before_save():
+            return
+        # 先寫入日誌 (write-ahead), 上傳失敗或程式中斷都不會遺失
+        self.journal.append(change_set, self.base_meta)
+        self.sync_journal()
+
+    def start_save(self, change_set, base_permissions, base_meta, merged=False):
+        # 交給 worker 的只有不再修改的 ChangeSet 與基準版本
         self.show_progress(self.uploading_progress_dialog)
-        self.save_worker.start()
+        self.save_worker.submit(SaveRequest(change_set, base_permissions, base_meta, merged))
 
-    def on_save_complete(self):
+    def on_save_complete(self, result, version):
         self.hide_progress(self.uploading_progress_dialog)
+        if version is not None:
+            # 合併了其他人的變更, 表格改為 worker 建好的合併後版本
+            self.adopt_version(version)
+        else:
+            # 表格已是存檔的內容, 只需更新基準版本
+            self.permissions = result.permissions
+            self.loaded_path = result.saved_path
+            self.base_meta = DownloadCache(self.loaded_path).load()
+        self.watch_remote()
+        self.dirty_rows.clear()
+        self.validate_dirty_rows()
+        self.journal.clear()
+        self.update_sync_status()
         QMessageBox.information(self, "Save Successful",
                                 "Permissions updated locally and uploaded to AWS S3.")
         self.edit_button.setEnabled(True)
         self.save_button.setEnabled(False)
         self.cancel_button.setEnabled(False)
 
+    def on_save_conflicts(self, result):
+        # 只有真正的衝突需要使用者決定, 其餘變更已自動合併
+        self.hide_progress(self.uploading_progress_dialog)
+        merge_result = result.merge_result
+        dialog = MergeConflictDialog(merge_result, self)
+        if dialog.exec() != MergeConflictDialog.DialogCode.Accepted:
+            # 保留本地編輯與原本的基準版本, 下次存檔會再合併一次
+            return
+        merge_result.resolve(dialog.get_resolutions())
+        # S3 版本成為新的基準, 只上傳相對於它的變更
+        remote_meta = DownloadCache(result.remote_path).load()
+        self.start_save(merge_result.change_set, merge_result.remote, remote_meta, merged=True)
+
+    # region Offline : journal, sync
+    def go_offline(self, error_message):
+        log.warning("S3 unreachable, working offline: %s", error_message)
+        self.offline = True
+        self.update_sync_status()
+        if not self.sync_worker.isRunning():
+            self.sync_worker.start()
+
+    def on_back_online(self):
+        log.info("S3 reachable again")
+        self.offline = False
+        self.update_sync_status()
+        # 有未存檔的編輯時不重新載入 (會清掉編輯), 存檔時再與 S3 的版本合併
+        if not self.sync_journal() and not self.dirty_rows:
+            self.load_permissions()
+
+    def on_save_offline(self, error_message):
+        self.hide_progress(self.uploading_progress_dialog)
+        self.go_offline(error_message)
+        QMessageBox.information(self, "Saved Offline",
+                                "AWS S3 is unreachable. Changes are kept in the local journal "
+                                "and will be uploaded when the connection returns.")
+
+    def sync_journal(self):
+        # 重播日誌: 合併所有未同步的變更, 以第一筆的基準版本做三方合併後上傳
+        if not self.journal or self.save_worker.isRunning():
+            return False
+        change_set, base_meta = self.journal.pending()
+        if not change_set:
+            self.journal.clear()
+            return False
+        self.start_save(change_set, self.permissions, base_meta)
+        return True
+
+    def replay_journal(self):
+        # 啟動時把上次未同步的變更顯示成本地編輯; 在線上時直接同步
+        if self.journal_replayed:
+            return
+        self.journal_replayed = True
+        change_set, _ = self.journal.pending()
+        if not change_set:
+            return
+        entries = [(name, after.get('DefaultValue', False), after.get('AllowedRoles', []))
+                   for name, (before, after) in change_set.changes.items() if after is not None]
+        self.apply_entries_as_edits(entries)
+        log.info("Journal: %d unsynced change(s) restored", len(change_set))
+        self.update_sync_status()
+        if not self.offline:
+            self.sync_journal()
+
+    def update_sync_status(self):
+        pending = len(self.journal.pending()[0]) if self.journal else 0
+        parts = []
+        if self.offline:
+            parts.append("Offline")
+        if pending:
+            parts.append(f"{pending} change(s) pending sync")
+        self.sync_label.setText(" - ".join(parts))
+    #========================================================================#
+
+    # region Live refresh : poll, apply changed rows
+    def start_polling(self):
+        if self.refresh_poller is not None and not self.refresh_poller.isRunning():
+            self.watch_remote()
+            self.refresh_poller.start()
+
+    def watch_remote(self):
+        if self.refresh_poller is not None:
+            self.refresh_poller.watch(self.base_meta, self.permissions)
+
+    def on_poll_error(self, message):
+        tracing.count('refresh.poll_failed')
+        log.warning("Refresh poll failed: %s", message)
+
+    def on_remote_changed(self, update):
+        change_set, remote, path, base = update
+        if base is not self.permissions:
+            # 比對期間基準版本已變更 (存檔 / 重新載入), 下一次輪詢再比對
+            self.watch_remote()
+            return
+        if self.load_permissions_worker.isRunning() or self.save_worker.isRunning():
+            return
+        skipped = self.apply_remote_changes(change_set)
+        if not self.dirty_rows:
+            # 沒有未存檔的編輯: S3 版本直接成為新的基準
+            self.adopt_remote(remote, path)
+        else:
+            # 基準維持不變, 存檔時才與 S3 三方合併; 輪詢的 ETag 已前進, 記下 S3 版本供放棄編輯時還原
+            self.remote_update = (base, remote, path)
+        tracing.count('refresh.applied', len(change_set) - skipped)
+        log.info("Live refresh: %d change(s) applied, %d kept local edits", len(change_set) - skipped, skipped)
+
+    def adopt_remote(self, remote, path):
+        self.permissions = remote
+        self.loaded_path = path
+        self.base_meta = DownloadCache(path).load()
+        self.remote_update = None
+        self.watch_remote()
+
+    def apply_remote_changes(self, change_set):
+        # 只更新變更的列: dataChanged / rowsInserted / rowsRemoved, 保留捲動位置、選取與過濾
+        store = self.table_model.store
+        dirty_names = {store.name(row) for row in self.dirty_rows}
+        updated, added, removed = [], [], []
+        skipped = 0
+        for name, (before, after) in change_set.changes.items():
+            if name in dirty_names:
+                # 本地已編輯的列保留本地內容, 存檔時再三方合併
+                skipped += 1
+                continue
+            row = store.index_of.get(name)
+            if after is None:
+                if row is not None:
+                    removed.append(row)
+            elif row is None:
+                added.append((name, after.get('DefaultValue', False), after.get('AllowedRoles', [])))
+            else:
+                updated.append((row, after.get('DefaultValue', False), after.get('AllowedRoles', [])))
+
+        scroll_value = self.table.verticalScrollBar().value()
+        if updated:
+            self.table_model.set_rows(updated)
+            self.search_index.update_rows([row for row, _, _ in updated])
+        if removed:
+            self.table_model.remove_rows(removed)
+            # 列號改變: 重建索引, 依名稱找回編輯過的列; undo 紀錄的列號已失效
+            self.search_index = SearchIndex(store)
+            self.dirty_rows = {store.index_of[name] for name in dirty_names}
+            self.validate_dirty_rows()
+            self.clear_edit_history()
+        if added:
+            self.table_model.append_rows(added)
+            self.search_index.extend()
+            # undo 紀錄中新增的列不再位於尾端
+            if any(command.added for command in self.edit_history.undo_stack + self.edit_history.redo_stack):
+                self.clear_edit_history()
+        if self.proxy_model.has_filter():
+            self.apply_filters()
+        self.table.verticalScrollBar().setValue(scroll_value)
+        return skipped
+    #========================================================================#
+
+    # region History : compare versions, restore
+    def show_history(self):
+        if self.history_dialog is None:
+            # 最近查看的版本快取在 local_json_path 旁的 history 資料夾
+            cache = HistoryCache(os.path.join(os.path.dirname(self.local_json_path), 'history'))
+            self.history_dialog = HistoryDialog(self, cache)
+            self.history_dialog.restore_requested.connect(self.restore_version)
+        self.history_dialog.show()
+        self.history_dialog.raise_()
+        self.history_dialog.refresh()
+
+    def restore_version(self, version_store):
+        # 把舊版本的內容變成本地編輯, 確認後再按 Save 上傳
+        # 舊版本中沒有的權限保留不動
+        if self.editing_blocked():
+            return
+        diff = diff_stores(self.table_model.store, version_store)
+        entries = [(version_store.name(version_row), version_store.default_value(version_row), version_store.roles(version_row))
+                   for kind, _, version_row in diff.entries if kind in (CHANGED, ADDED)]
+        updated, added = self.apply_entries_as_edits(entries)
+        log.info("Restored version: %d changed, %d re-added permission(s)", updated, added)
+
+    def apply_entries_as_edits(self, entries):
+        # entries: [(name, default_value, roles)]; 已存在的列更新, 不存在的加在最後, 都標記為已編輯
+        store = self.table_model.store
+        updated, added = [], []
+        for name, default_value, roles in entries:
+            row = store.index_of.get(name)
+            if row is None:
+                added.append((name, default_value, roles))
+            else:
+                updated.append((row, default_value, roles))
+        if not updated and not added:
+            return 0, 0
+        rows = [row for row, _, _ in updated]
+        command = EditCommand(store, rows, f"{len(updated)} updated, {len(added)} added")
+        if updated:
+            self.table_model.set_rows(updated)
+            self.search_index.update_rows(rows)
+            self.dirty_rows.update(rows)
+        if added:
+            self.table_model.append_rows(added)
+            self.search_index.extend()
+        self.edit_history.push(command.commit(store, added))
+        self.dirty_rows.update(command.added_rows())
+        self.on_rows_edited()
+        return len(updated), len(added)
+    #========================================================================#
+
+    def export_access_matrix(self):
+        # 權限 x 角色的存取矩陣, 包含尚未存檔的編輯
+        path, _ = QFileDialog.getSaveFileName(self, "Export Access Matrix", "access_matrix.csv", "CSV Files (*.csv)")
+        if not path:
+            return
+        try:
+            with open(path, 'w', encoding='utf-8', newline='') as file:
+                count = write_access_matrix(self.table_model.store, file)
+        except OSError as e:
+            QMessageBox.critical(self, "Export Error", f"An error occurred while exporting: {str(e)}")
+            return
+        log.info("Exported access matrix of %d permission(s) to %s", count, path)
+
+    def closeEvent(self, event):
+        if self.refresh_poller is not None:
+            self.refresh_poller.stop()
+        self.sync_worker.stop()
+        self.search_worker.stop()
+        if self.history_dialog is not None:
+            self.history_dialog.worker.stop()
+        super().closeEvent(event)
+
     def on_save_error(self, error_message):
         self.hide_progress(self.uploading_progress_dialog)
         QMessageBox.critical(self, "Save Error",
@@ -155,92 +673,453 @@ class MainWindow(QMainWindow):
     #========================================================================#
 
 
-    def populate_table(self, permissions):
-        self.table.setRowCount(len(permissions['Permissions']))
-        for row, (key, value) in enumerate(permissions['Permissions'].items()):
-            # print( row )
-            # Permission Name
-            name_item = QTableWidgetItem(key)
-            name_item.setFlags(name_item.flags() & ~Qt.ItemFlag.ItemIsEditable)
-            self.table.setItem(row, 0, name_item)
-
-            # Default Value
-            default_item = QTableWidgetItem(str(value.get('DefaultValue', False)))
-            default_item.setFlags(default_item.flags() & ~Qt.ItemFlag.ItemIsEditable)
-            self.table.setItem(row, 1, default_item)
-
-            # Roles
-            roles = ', '.join(value.get('AllowedRoles', []))
-            roles_item = QTableWidgetItem(roles)
-            roles_item.setFlags(roles_item.flags() & ~Qt.ItemFlag.ItemIsEditable)
-            self.table.setItem(row, 2, roles_item)
+    def adopt_version(self, version):
+        # 版本在 worker 中建好 (欄式資料 + 索引), GUI thread 只替換參照並重設 model
+        self.permissions = version.permissions
+        if version.path is not None:
+            self.loaded_path = version.path
+            self.base_meta = version.meta
+        self.dirty_rows.clear()
+        self.clear_edit_history()
+        self.search_index = version.search_index
+        # 先換上新版本的過濾結果, 表格與 proxy 只隨 set_store 重設一次
+        self.filter_timer.stop()
+        with tracing.span('table.adopt', rows=len(version.store)):
+            self.set_visible_rows(self.visible_rows(), notify=False)
+            self.table_model.set_store(version.store)
+        self.fit_columns()
+        self.update_role_completer()
+        self.reset_validator()
+
+    def fit_columns(self):
+        self.table.resizeColumnToContents(PermissionTableModel.NAME_COLUMN)
+        self.table.resizeColumnToContents(PermissionTableModel.DEFAULT_COLUMN)
 
     def filter_permissions(self, text):
-        for row in range(self.table.rowCount()):
-            show = False
-            col = 0  # permission
-            item = self.table.item(row, col)
-            if item and text.lower() in item.text().lower():
-                show = True
-            self.table.setRowHidden(row, not show)
+        self.filter_timer.start()
 
     def filter_roles(self, text):
-        for row in range(self.table.rowCount()):
-            show = False
-            col = 2  # role
-            item = self.table.item(row, col)
-            if item and text.lower() in item.text().lower():
-                show = True
-            self.table.setRowHidden(row, not show)
+        self.filter_timer.start()
+
+    def apply_filters(self):
+        self.filter_timer.stop()
+        if self.search_index is None:
+            return
+        self.update_role_completer()
+        query, error = self.search_query()
+        self.show_search_error(error)
+        if query is None:
+            return
+        if query.in_background():
+            # 結果回來後 (on_search_result) 再套用, 期間維持目前的畫面
+            if self.current_name_result(query) is None:
+                self.search_worker.submit(self.search_index, self.search_index.version,
+                                          list(self.table_model.store.names), query)
+                return
+        else:
+            self.search_worker.cancel()
+        # proxy 可能整個 reset, 保留目前選取的列
+        current_row = self.current_source_row()
+        with tracing.span('filter', mode=query.mode) as span:
+            self.set_visible_rows(self.visible_rows(), rank=self.search_rank(query))
+            span.set(visible=self.proxy_model.rowCount())
+        self.set_highlight_query(query)
+        if current_row >= 0 and self.table.currentIndex().row() < 0:
+            index = self.proxy_model.mapFromSource(self.table_model.index(current_row, 0))
+            if index.isValid():
+                self.table.setCurrentIndex(index)
+
+    def on_search_result(self, result):
+        query, _ = self.search_query()
+        if result.query != query:
+            return  # 條件已改變, 新的查詢已送出
+        self.name_result = result
+        # 名稱在搜尋期間有增減時, apply_filters 會重新送出查詢
+        self.apply_filters()
+
+    def search_query(self):
+        # 回傳 (SearchQuery, 錯誤訊息); regex 語法錯誤時 SearchQuery 為 None
+        try:
+            return SearchQuery(self.search_mode_box.currentData(), self.search_input_permission.text()), ''
+        except SearchQueryError as e:
+            return None, str(e)
+
+    def show_search_error(self, error):
+        self.search_input_permission.setStyleSheet("color: #ff6b6b;" if error else "color: white;")
+        self.search_input_permission.setToolTip(error)
+
+    def current_name_result(self, query):
+        # 背景搜尋的結果只在條件相同、且名稱沒有增減時使用
+        result = self.name_result
+        if (result is None or result.query != query or result.source is not self.search_index
+                or result.version != self.search_index.version):
+            return None
+        return result
+
+    def search_rank(self, query):
+        result = self.current_name_result(query) if query.in_background() else None
+        return result.rank if result is not None else None
+
+    def set_highlight_query(self, query):
+        for delegate, view in ((self.name_delegate, self.table), (self.matrix_name_delegate, self.matrix)):
+            delegate.set_query(query)
+            view.viewport().update()
+
+    def set_visible_rows(self, visible, notify=True, rank=None):
+        self.proxy_model.set_visible_rows(visible, notify, rank)
+        if self.matrix_proxy is not None:
+            self.matrix_proxy.set_visible_rows(visible, notify, rank)
+
+    def visible_rows(self):
+        # 目前搜尋條件的結果 (每列一個 byte), 沒有條件時為 None
+        permission_text = self.search_input_permission.text()
+        role_text = self.search_input_roles.text()
+        if not permission_text and not role_text:
+            return None
+        return SearchIndex.combine(
+            self.name_rows(),
+            self.search_index.match_roles(role_text)
+        )
+
+    def name_rows(self):
+        query, _ = self.search_query()
+        if query is None:
+            return self.search_index.all_rows()
+        if not query.in_background():
+            return self.search_index.match_name(query.text)
+        result = self.current_name_result(query)
+        if result is None:
+            # 背景搜尋尚未完成 (例如剛換了版本): 先不過濾名稱, 稍後重新查詢
+            self.filter_timer.start()
+            return self.search_index.all_rows()
+        return result.mask
+
+    def update_role_completer(self):
+        # 角色只會增加, 數量改變時才更新
+        roles = self.table_model.store.registry.roles
+        if self.role_completer_model.rowCount() != len(roles):
+            self.role_completer_model.setStringList(roles)
+
+    def set_tree_mode(self, enabled):
+        if enabled and self.tree_model is None:
+            self.tree_model = PermissionTreeModel(self.table_model, self)
+            self.tree.setModel(self.tree_model)
+            self.tree.header().resizeSection(0, 420)
+        if enabled:
+            self.matrix_view_button.setChecked(False)
+        self.table.setVisible(not enabled and not self.is_matrix_mode())
+        self.tree.setVisible(enabled)
+        # 搜尋條件只作用在表格 / 矩陣
+        self.search_input_permission.setEnabled(not enabled)
+        self.search_mode_box.setEnabled(not enabled)
+        self.search_input_roles.setEnabled(not enabled)
+
+    def is_tree_mode(self):
+        return self.tree_view_button.isChecked()
+
+    def set_matrix_mode(self, enabled):
+        if enabled and self.matrix_model is None:
+            self.matrix_model = PermissionMatrixModel(self.table_model, self)
+            self.matrix_model.toggle_requested.connect(self.on_matrix_toggle)
+            self.matrix_proxy = PermissionFilterProxyModel(self)
+            self.matrix_proxy.setSourceModel(self.matrix_model)
+            self.matrix_proxy.set_visible_rows(self.visible_rows() if self.search_index is not None else None)
+            self.matrix.setModel(self.matrix_proxy)
+            self.matrix.horizontalHeader().resizeSection(PermissionMatrixModel.NAME_COLUMN, 360)
+            self.matrix.horizontalHeader().sectionClicked.connect(self.toggle_matrix_column)
+        if enabled:
+            self.tree_view_button.setChecked(False)
+        self.matrix.setVisible(enabled)
+        self.table.setVisible(not enabled and not self.is_tree_mode())
+
+    def is_matrix_mode(self):
+        return self.matrix_view_button.isChecked()
+
+    def current_source_row(self):
+        if self.is_tree_mode():
+            return self.tree_model.source_row(self.tree.currentIndex())
+        if self.is_matrix_mode():
+            index = self.matrix.currentIndex()
+            return self.matrix_proxy.mapToSource(index).row() if index.isValid() else -1
+        index = self.table.currentIndex()
+        if not index.isValid():
+            return -1
+        return self.proxy_model.mapToSource(index).row()
 
     def enable_editing(self):
+        if self.editing_blocked():
+            return
         # 獲取當前選中的行
-        current_row = self.table.currentRow()
+        current_row = self.current_source_row()
         if current_row < 0:
             return  # 如果沒有選中行，則返回
 
         # 獲取當前行的數據
-        permission_name = self.table.item(current_row, 0).text()
-        default_value = self.table.item(current_row, 1).text()
-        roles = self.table.item(current_row, 2).text().split(', ')
+        store = self.table_model.store
+        permission_name = store.name(current_row)
+        default_value = str(store.default_value(current_row))
+        roles = store.roles(current_row)
 
         # 創建並顯示編輯對話框
         dialog = EditPermissionDialog(
             permission_name=permission_name,
             default_value=default_value,
             current_roles=roles,
+            available_roles=store.registry.roles,
             parent=self
         )
 
-        # 如果用戶點擊確定
-        if dialog.exec() == EditPermissionDialog.DialogCode.Accepted:
+        # 如果用戶點擊確定; 對話框開啟期間表格被重新載入時, 列號已不適用
+        if dialog.exec() == EditPermissionDialog.DialogCode.Accepted and self.table_model.store is store:
             # 獲取修改後的值
             new_values = dialog.get_values()
 
-            new_roles = [r.replace("* ", "") for r in new_values['roles']]
+            new_roles = new_values['roles']
             # 更新表格
-            self.table.item(current_row, 1).setText(str(new_values['default_value']))
-            self.table.item(current_row, 2).setText(', '.join(new_roles))
-
-            # 啟用保存按鈕
-            self.save_button.setEnabled(True)
-            self.cancel_button.setEnabled(True)
+            command = EditCommand(store, [current_row], f"edit {permission_name}")
+            self.table_model.update_row(current_row, new_values['default_value'], new_roles)
+            self.edit_history.push(command.commit(store))
+            self.search_index.update_row(current_row)
+            self.dirty_rows.add(current_row)
+            self.on_rows_edited()
+
+    # region Validation : incremental on dirty rows, full pass before save
+    def reset_validator(self):
+        # 載入時出現的角色視為已知, 之後編輯加入的新角色以警告標示, 存檔前再確認
+        store = self.table_model.store
+        if self.tables is not None:
+            # 共用的 registry 含有其他環境的角色, 已知角色只取這個集合的基準版本
+            schema = PermissionSchema().add_roles_from(self.permissions)
+        else:
+            schema = PermissionSchema(store.registry.roles)
+        self.validator = Validator(store, schema)
+        self.validate_dirty_rows()
+
+    def show_issues(self, issues):
+        self.table_model.set_issues({row: "\n".join(str(issue) for issue in row_issues)
+                                     for row, row_issues in issues.items()})
+        all_issues = [issue for row_issues in issues.values() for issue in row_issues]
+        errors = len(errors_of(all_issues))
+        warnings = len(all_issues) - errors
+        parts = []
+        if errors:
+            parts.append(f"{errors} validation error(s)")
+        if warnings:
+            parts.append(f"{warnings} warning(s)")
+        self.validation_label.setText(", ".join(parts))
+
+    def validate_dirty_rows(self):
+        if self.validator is None:
+            return
+        self.show_issues(self.validator.check_rows(self.dirty_rows))
+
+    def validate_before_save(self):
+        with tracing.span('validate'):
+            issues = self.validator.full_pass() if self.validator is not None else {}
+        self.show_issues(issues)
+        all_issues = [issue for row_issues in issues.values() for issue in row_issues]
+        errors = errors_of(all_issues)
+        if not errors:
+            return self.confirm_new_roles(new_roles_of(all_issues))
+        details = "\n".join(str(issue) for issue in errors[:10])
+        if len(errors) > 10:
+            details += f"\n... and {len(errors) - 10} more"
+        QMessageBox.warning(self, "Validation Failed",
+                            f"Fix {len(errors)} validation error(s) before saving:\n\n{details}")
+        return False
+
+    def confirm_new_roles(self, roles):
+        # 新角色可能是打錯字, 由使用者確認後才加入 permissions.json
+        if not roles:
+            return True
+        answer = QMessageBox.question(self, "New Roles",
+                                      f"These roles are not used in permissions.json yet:\n\n{', '.join(roles)}\n\n"
+                                      "Add them and save?")
+        return answer == QMessageBox.StandardButton.Yes
+    #========================================================================#
 
+    def on_rows_edited(self):
+        self.validate_dirty_rows()
+        # 啟用保存按鈕
+        self.save_button.setEnabled(True)
+        self.cancel_button.setEnabled(True)
+        self.update_history_buttons()
+        # 角色變更可能影響角色過濾的結果
+        if self.proxy_model.has_filter():
+            self.filter_timer.start()
+
+    def selected_source_rows(self):
+        if self.is_tree_mode():
+            # 選取群組等於選取其下所有的權限
+            rows = set()
+            for index in self.tree.selectionModel().selectedRows():
+                rows.update(self.tree_model.rows_of(index))
+            return sorted(rows)
+        if self.is_matrix_mode():
+            return sorted(self.matrix_proxy.mapToSource(index).row()
+                          for index in self.matrix.selectionModel().selectedRows())
+        return sorted(self.proxy_model.mapToSource(index).row()
+                      for index in self.table.selectionModel().selectedRows())
+
+    def filtered_source_rows(self):
+        return self.proxy_model.visible_source_rows()
+
+    def bulk_edit(self):
+        if self.editing_blocked():
+            return
+        store = self.table_model.store
+        selected_rows = self.selected_source_rows()
+        dialog = BulkEditDialog(
+            available_roles=store.registry.roles,
+            selected_count=len(selected_rows),
+            filtered_count=self.proxy_model.rowCount(),
+            prefix=self.search_input_permission.text(),
+            parent=self
+        )
+        if dialog.exec() != BulkEditDialog.DialogCode.Accepted or self.table_model.store is not store:
+            return
+        values = dialog.get_values()
+
+        if values['scope'] == BulkEditDialog.SCOPE_SELECTED:
+            rows = selected_rows
+        elif values['scope'] == BulkEditDialog.SCOPE_FILTERED:
+            rows = self.filtered_source_rows()
+        else:
+            rows = rows_with_prefix(self.search_index, values['prefix']) if values['prefix'] else []
+
+        edit = BulkEdit(values['add_roles'], values['remove_roles'], values['default_value'])
+        if not rows or edit.is_empty():
+            QMessageBox.information(self, "Bulk Edit", "No permissions to update.")
+            return
+        self.apply_bulk_edit(edit, rows)
+
+    def apply_bulk_edit(self, edit, rows):
+        # 批次編輯 API: 一次套用、一個 dataChanged 範圍、一筆 undo
+        command = self.table_model.apply_bulk(edit, rows)
+        self.search_index.update_rows(command.rows)
+        self.dirty_rows.update(command.rows)
+        self.edit_history.push(command)
+        self.on_rows_edited()
+        log.info("Bulk edit (%s) applied to %d permission(s)", edit.describe(), len(command))
+        return command
+
+    # region Matrix : checkbox toggles go through apply_bulk_edit (undo / validation / index)
+    def on_matrix_toggle(self, row, role, checked):
+        # 勾選的格子在多列選取範圍內時, 套用到所有選取的列
+        if self.editing_blocked():
+            return
+        rows = [row]
+        if self.matrix.selectionModel().isRowSelected(self.matrix_proxy.mapFromSource(
+                self.matrix_model.index(row, 0)).row(), QModelIndex()):
+            rows = self.selected_source_rows()
+        edit = BulkEdit(add_roles=[role]) if checked else BulkEdit(remove_roles=[role])
+        self.apply_bulk_edit(edit, rows)
+
+    def toggle_matrix_column(self, column):
+        # 點選角色欄標題: 顯示中的權限全部有此角色時移除, 否則全部加入
+        role = self.matrix_model.role_of_column(column)
+        if role is None or self.editing_blocked():
+            return
+        rows = self.filtered_source_rows()
+        if not rows:
+            return
+        bits = self.search_index.role_index.bits.get(role)
+        checked = bits is None or not all(bits[row] for row in rows)
+        action = "Grant" if checked else "Revoke"
+        answer = QMessageBox.question(self, "Matrix View", f"{action} {role} for {len(rows)} shown permission(s)?")
+        if answer != QMessageBox.StandardButton.Yes:
+            return
+        edit = BulkEdit(add_roles=[role]) if checked else BulkEdit(remove_roles=[role])
+        self.apply_bulk_edit(edit, rows)
+    #========================================================================#
 
+    # region Undo / Redo : EditCommand stack, cancel reverts dirty rows to the base version
+    def undo_edit(self):
+        if not self.edit_history.can_undo() or self.editing_blocked():
+            return
+        command = self.edit_history.pop_undo()
+        with tracing.span('edit.undo', rows=len(command)):
+            self.table_model.undo_command(command)
+            self.search_index.update_rows(command.rows)
+            if command.added:
+                self.search_index.truncate(command.first_added)
+                self.dirty_rows.difference_update(command.added_rows())
+        self.on_rows_edited()
+
+    def redo_edit(self):
+        if not self.edit_history.can_redo() or self.editing_blocked():
+            return
+        command = self.edit_history.pop_redo()
+        with tracing.span('edit.redo', rows=len(command)):
+            self.table_model.redo_command(command)
+            self.search_index.update_rows(command.rows)
+            self.dirty_rows.update(command.rows)
+            if command.added:
+                self.search_index.extend()
+                self.dirty_rows.update(command.added_rows())
+        self.on_rows_edited()
+
+    def clear_edit_history(self):
+        self.edit_history.clear()
+        self.update_history_buttons()
+
+    def update_history_buttons(self):
+        self.undo_button.setEnabled(self.edit_history.can_undo())
+        self.redo_button.setEnabled(self.edit_history.can_redo())
 
     def cancel_changes(self):
-        # 讀取下載的 JSON 檔案
-        try:
-            self.table.clear()
-            with open(self.local_json_path, 'r', encoding='utf-8') as file:
-                permissions = json.load(file)
-                self.populate_table(permissions)
-        except json.JSONDecodeError as e:
-            raise Exception(f"Invalid JSON format: {str(e)}")
-
-        self.edit_button.setEnabled(False)
-        self.save_button.setEnabled(True)
+        # 只把編輯過的列還原成基準版本的內容, 時間與編輯的列數成正比, 不重新載入整個檔案
+        with tracing.span('edit.cancel', rows=len(self.dirty_rows)):
+            self.revert_to_base()
+        # 放棄本地編輯時, 尚未同步的日誌也一併捨棄
+        self.journal.clear()
+        self.update_sync_status()
+
+        self.edit_button.setEnabled(True)
+        self.save_button.setEnabled(False)
         self.cancel_button.setEnabled(False)
+        self.update_history_buttons()
+
+    def revert_to_base(self):
+        store = self.table_model.store
+        # 編輯期間收到的 S3 版本 (基準未被存檔 / 重新載入取代時) 比基準新: 編輯過的列還原成 S3 的內容,
+        # 其餘的列在收到時已經更新
+        update = self.remote_update
+        if update is not None and update[0] is not self.permissions:
+            update = None
+        base = (update[1] if update is not None else self.permissions).get('Permissions', {})
+        # 相同的角色組合只轉換一次 bitmask
+        masks = {}
+        updated, removed = [], []
+        for row in sorted(self.dirty_rows):
+            entry = base.get(store.name(row))
+            if entry is None:
+                # 基準版本中沒有的列 (還原歷史版本 / 重播日誌時新增)
+                removed.append(row)
+                continue
+            roles = tuple(entry.get('AllowedRoles', []))
+            mask = masks.get(roles)
+            if mask is None:
+                mask = masks[roles] = store.registry.mask_of(roles)
+            updated.append((row, entry.get('DefaultValue', False), mask))
+        if updated:
+            self.table_model.set_row_masks(updated)
+            self.search_index.update_rows([row for row, _, _ in updated])
+        if removed:
+            length = len(store)
+            self.table_model.remove_rows(removed)
+            if removed[0] == len(store) and removed[-1] == length - 1:
+                self.search_index.truncate(len(store))
+            else:
+                self.search_index = SearchIndex(store)
+        self.dirty_rows.clear()
+        self.clear_edit_history()
+        self.validate_dirty_rows()
+        if update is not None:
+            self.adopt_remote(update[1], update[2])
+        if removed or self.proxy_model.has_filter():
+            self.apply_filters()
+    #========================================================================#
 
 
     def resizeEvent(self, event):
@@ -249,7 +1128,7 @@ class MainWindow(QMainWindow):
         if self.progress_dialog:
             self.progress_dialog.resize(self.size())  # 同步更新子視窗大小
             self.progress_dialog.blur_container.resize(self.size())
-            print(f"Parent resized: {self.size()}")
+            log.debug("Parent resized: %s", self.size())
 
     # 显示对话框时
     def show_progress(self, dialog):
@@ -263,77 +1142,3 @@ class MainWindow(QMainWindow):
             dialog.hide()
             if self.progress_dialog == dialog:
                 self.progress_dialog = None
-
-
-class SaveWorker(QThread):
-    finished = pyqtSignal()
-    error = pyqtSignal(str)
-
-    def __init__(self, main_window):
-        super().__init__()
-        self.main_window = main_window
-
-    def run(self):
-        try:
-            # 讀取原始 JSON 文件
-            with open(self.main_window.local_json_path, 'r', encoding='utf-8') as file:
-                permissions = json.load(file)
-
-            self.main_window.s3_client.upload_file(
-                self.main_window.local_json_path,
-                self.main_window.aws_config.bucket,
-                'InHouseTool/backup/permissions.json'
-            )
-
-            # 更新 permissions
-            for row in range(self.main_window.table.rowCount()):
-                permission_name = self.main_window.table.item(row, 0).text()
-                default_value = self.main_window.table.item(row, 1).text() == 'True'
-                roles = self.main_window.table.item(row, 2).text().split(', ') if self.main_window.table.item(row, 2).text() else []
-                roles = [r.replace("* ", "") for r in roles]
-                permissions['Permissions'][permission_name] = {
-                    'AllowedRoles': roles,
-                    'DefaultValue': default_value
-                }
-
-            # 本地保存
-            with open(self.main_window.local_json_path, 'w', encoding='utf-8') as file:
-                json.dump(permissions, file, indent=4, ensure_ascii=False)
-
-            self.main_window.s3_client.upload_file(
-                self.main_window.local_json_path,
-                self.main_window.aws_config.bucket,
-                'InHouseTool/permissions.json'
-            )
-
-            self.finished.emit()
-        except Exception as e:
-            self.error.emit(str(e))
-
-class LoadWorker(QThread):
-    finished = pyqtSignal()
-    error = pyqtSignal(str)
-
-    def __init__(self, main_window):
-        super().__init__()
-        self.main_window = main_window
-
-    def run(self):
-        try:
-            # 確保目標資料夾存在
-            os.makedirs(os.path.dirname(self.main_window.local_json_path), exist_ok=True)
-
-            # 從 S3 下載檔案
-            try:
-                self.main_window.s3_client.download_file(
-                    self.main_window.aws_config.bucket,
-                    'InHouseTool/permissions.json',
-                    self.main_window.local_json_path )
-                print( f"Save Permission done {self.main_window.local_json_path}")
-            except Exception as e:
-                raise Exception(f"Failed to download from S3: {str(e)}")
-
-            self.finished.emit()
-
-        except Exception as e:
-            self.error.emit(str(e))
\ No newline at end of file
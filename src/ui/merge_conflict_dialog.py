@@ -0,0 +1,82 @@
+from PyQt6.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QLabel, QComboBox,
+    QPushButton, QTableWidget, QTableWidgetItem, QHeaderView
+)
+from ..models.three_way_merge import RESOLVE_LOCAL, RESOLVE_REMOTE
+
+
+def describe_entry(entry):
+    if entry is None:
+        return "(deleted)"
+    roles = ', '.join(entry.get('AllowedRoles', []))
+    return f"Default={entry.get('DefaultValue')}  Roles: {roles}"
+
+
+class MergeConflictDialog(QDialog):
+    # 只列出真正的衝突, 每一列選擇保留本地或採用 S3 上的版本
+    HEADERS = ["Permission Name", "Conflict", "Base", "Mine", "Theirs (S3)", "Keep"]
+    CHOICES = [("Mine", RESOLVE_LOCAL), ("Theirs", RESOLVE_REMOTE)]
+
+    def __init__(self, merge_result, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Resolve Save Conflicts")
+        self.setModal(True)
+        self.setMinimumSize(900, 400)
+
+        self.merge_result = merge_result
+        self.choice_combos = {}
+        self.setup_ui()
+
+    def setup_ui(self):
+        layout = QVBoxLayout(self)
+        conflicts = self.merge_result.conflicts
+        auto_count = len(self.merge_result.change_set)
+        layout.addWidget(QLabel(
+            f"permissions.json was changed on S3 by someone else. "
+            f"{auto_count} change(s) merged automatically, {len(conflicts)} conflict(s) need a decision."))
+
+        self.table = QTableWidget(len(conflicts), len(self.HEADERS))
+        self.table.setHorizontalHeaderLabels(self.HEADERS)
+        for row, conflict in enumerate(conflicts):
+            values = [conflict.name, ', '.join(conflict.fields), describe_entry(conflict.base),
+                      describe_entry(conflict.local), describe_entry(conflict.remote)]
+            for column, value in enumerate(values):
+                item = QTableWidgetItem(value)
+                item.setToolTip(value)
+                self.table.setItem(row, column, item)
+            combo = QComboBox()
+            for label, resolution in self.CHOICES:
+                combo.addItem(label, resolution)
+            combo.setStyleSheet("color : white; ")
+            self.table.setCellWidget(row, len(self.HEADERS) - 1, combo)
+            self.choice_combos[conflict.name] = combo
+        header = self.table.horizontalHeader()
+        header.setSectionResizeMode(QHeaderView.ResizeMode.ResizeToContents)
+        header.setSectionResizeMode(3, QHeaderView.ResizeMode.Stretch)
+        header.setSectionResizeMode(4, QHeaderView.ResizeMode.Stretch)
+        layout.addWidget(self.table)
+
+        buttons_layout = QHBoxLayout()
+        self.all_mine_button = QPushButton("All Mine")
+        self.all_theirs_button = QPushButton("All Theirs")
+        self.ok_button = QPushButton("Merge and Save")
+        self.cancel_button = QPushButton("Cancel")
+        buttons_layout.addWidget(self.all_mine_button)
+        buttons_layout.addWidget(self.all_theirs_button)
+        buttons_layout.addStretch()
+        buttons_layout.addWidget(self.ok_button)
+        buttons_layout.addWidget(self.cancel_button)
+
+        self.all_mine_button.clicked.connect(lambda: self.select_all(0))
+        self.all_theirs_button.clicked.connect(lambda: self.select_all(1))
+        self.ok_button.clicked.connect(self.accept)
+        self.cancel_button.clicked.connect(self.reject)
+
+        layout.addLayout(buttons_layout)
+
+    def select_all(self, choice_index):
+        for combo in self.choice_combos.values():
+            combo.setCurrentIndex(choice_index)
+
+    def get_resolutions(self):
+        return {name: combo.currentData() for name, combo in self.choice_combos.items()}
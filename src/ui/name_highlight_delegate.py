@@ -0,0 +1,47 @@
+from PyQt6.QtCore import Qt, QRect
+from PyQt6.QtGui import QColor
+from PyQt6.QtWidgets import QStyledItemDelegate, QStyleOptionViewItem, QStyle, QApplication
+
+
+class NameHighlightDelegate(QStyledItemDelegate):
+    # 名稱欄: 以底色標示搜尋命中的字元 (SearchQuery.spans)
+    # 只有畫面上的列會被繪製, 命中範圍在繪製時才計算; 沒有查詢時交給預設的繪製
+    TEXT_MARGIN = 3
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.query = None
+        self.highlight_color = QColor(255, 193, 7, 110)
+
+    def set_query(self, query):
+        self.query = None if query is None or query.is_empty() else query
+
+    def paint(self, painter, option, index):
+        text = index.data(Qt.ItemDataRole.DisplayRole)
+        spans = self.query.spans(text) if self.query is not None and text else None
+        if not spans:
+            super().paint(painter, option, index)
+            return
+        opt = QStyleOptionViewItem(option)
+        self.initStyleOption(opt, index)
+        opt.text = ''
+        widget = opt.widget
+        style = widget.style() if widget is not None else QApplication.style()
+        style.drawControl(QStyle.ControlElement.CE_ItemViewItem, opt, painter, widget)
+
+        rect = style.subElementRect(QStyle.SubElement.SE_ItemViewItemText, opt, widget)
+        rect = rect.adjusted(self.TEXT_MARGIN, 0, -self.TEXT_MARGIN, 0)
+        metrics = opt.fontMetrics
+        painter.save()
+        painter.setClipRect(rect)
+        for start, end in spans:
+            left = metrics.horizontalAdvance(text[:start])
+            width = metrics.horizontalAdvance(text[start:end])
+            painter.fillRect(QRect(rect.x() + left, rect.y() + 1, width, rect.height() - 2), self.highlight_color)
+        selected = opt.state & QStyle.StateFlag.State_Selected
+        painter.setPen(opt.palette.color(opt.palette.ColorRole.HighlightedText if selected else opt.palette.ColorRole.Text))
+        foreground = index.data(Qt.ItemDataRole.ForegroundRole)
+        if foreground is not None and not selected:
+            painter.setPen(foreground.color())
+        painter.drawText(rect, Qt.AlignmentFlag.AlignVCenter | Qt.AlignmentFlag.AlignLeft, text)
+        painter.restore()
@@ -0,0 +1,53 @@
+import time
+from PyQt6.QtWidgets import QLabel
+from PyQt6.QtCore import QTimer
+from .. import tracing
+
+
+class PerfHud(QLabel):
+    # 狀態列上的效能 HUD: 各 span 最近一次 / p95 的耗時與 GUI thread 的停頓
+    # 只在 --trace / --perf-hud 啟用時建立
+    SPANS = ('s3.download', 'load.parse', 'table.populate', 'table.adopt', 'filter', 'search',
+             'validate', 'save.serialize', 's3.upload', 'save')
+    TICK_MS = 50
+    STALL_MS = 16  # 超過一個 frame (60 fps) 視為停頓
+    REFRESH_TICKS = 10
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setStyleSheet("font-family: monospace; font-size: 11px;")
+        self._last_tick = time.perf_counter()
+        self._ticks = 0
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.tick)
+        self.timer.start(self.TICK_MS)
+
+    def tick(self):
+        # timer 延遲的時間 = GUI thread 忙碌 (無法處理事件) 的時間
+        now = time.perf_counter()
+        late = (now - self._last_tick) * 1000 - self.TICK_MS
+        self._last_tick = now
+        if late > self.STALL_MS:
+            tracing.count('gui.stalls')
+            tracing.observe('gui.stall', late)
+        self._ticks += 1
+        if self._ticks % self.REFRESH_TICKS == 0:
+            self.refresh()
+
+    def refresh(self):
+        tracer = tracing.tracer()
+        if tracer is None:
+            self.setText("")
+            return
+        timings, counters = tracer.snapshot()
+        parts = []
+        for name in self.SPANS + ('gui.stall',):
+            if name in timings:
+                last, p95, count = timings[name]
+                parts.append(f"{name} {last:.0f}/{p95:.0f}ms")
+        if counters.get('gui.stalls'):
+            parts.append(f"stalls {counters['gui.stalls']}")
+        self.setText("  ".join(parts))
+        self.setToolTip("last / p95 (ms) per span\n" + "\n".join(
+            f"{name}: last {last:.1f} ms, p95 {p95:.0f} ms, n={count}"
+            for name, (last, p95, count) in sorted(timings.items())))
@@ -0,0 +1,230 @@
+from bisect import bisect_left, bisect_right
+from PyQt6.QtCore import Qt, QAbstractProxyModel, QModelIndex
+from ..models.search_index import rows_of
+
+
+class PermissionFilterProxyModel(QAbstractProxyModel):
+    SOURCE_INDEX_LIMIT = 4096  # 捲動經過的格子很多時清空重來
+    # 過濾結果由 SearchIndex 預先算好: 顯示的來源列號存成一個 list, 對應只查表
+    # 不逐列呼叫 filterAcceptsRow, 每次搜尋的成本與來源列數無關 (只有 rows_of 的 C 迴圈)
+    # _rows 為 None 時全部顯示 (對應即來源列號); 沒有名次時 _rows 遞增, mapFromSource 以 bisect 查詢
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._rows = None
+        # 搜尋結果的名次; 有名次時 _rows 依名次排序, mapFromSource 改查 _position
+        self._ranked = False
+        self._position = None
+        # 來源刪除列時, rowsAboutToBeRemoved 算好的顯示範圍留給 rowsRemoved 使用
+        self._removing = None
+        # 重繪時每格會查十幾個 role, 都經過 mapToSource; 對應改變前重複使用同一個來源 index
+        self._source_indexes = {}
+
+    # region Source model
+    def setSourceModel(self, source_model):
+        self.beginResetModel()
+        self._source_indexes = {}
+        old = self.sourceModel()
+        if old is not None:
+            for signal, slot in self._source_signals(old):
+                signal.disconnect(slot)
+        super().setSourceModel(source_model)
+        if source_model is not None:
+            for signal, slot in self._source_signals(source_model):
+                signal.connect(slot)
+        self.endResetModel()
+
+    def _source_signals(self, source_model):
+        return [
+            (source_model.modelAboutToBeReset, self._on_source_about_to_be_reset),
+            (source_model.modelReset, self._on_source_reset),
+            (source_model.rowsAboutToBeInserted, self._on_rows_about_to_be_inserted),
+            (source_model.rowsInserted, self._on_rows_inserted),
+            (source_model.rowsAboutToBeRemoved, self._on_rows_about_to_be_removed),
+            (source_model.rowsRemoved, self._on_rows_removed),
+            (source_model.dataChanged, self._on_data_changed),
+            (source_model.columnsAboutToBeInserted, self._on_columns_about_to_be_inserted),
+            (source_model.columnsInserted, self.endInsertColumns),
+            (source_model.headerDataChanged, self._on_header_data_changed),
+        ]
+
+    def _on_source_about_to_be_reset(self):
+        self._source_indexes = {}
+        self.beginResetModel()
+
+    def _on_source_reset(self):
+        # 過濾結果可能還是舊 store 的列號 (例如載入開始時先清空 store), 去掉超出範圍的列
+        count = self.sourceModel().rowCount()
+        if self._rows is not None:
+            if self._ranked:
+                self._rows = [row for row in self._rows if row < count]
+            else:
+                del self._rows[bisect_left(self._rows, count):]
+            self._position = None
+        self.endResetModel()
+
+    def _on_rows_about_to_be_inserted(self, parent, first, last):
+        self._source_indexes = {}
+        if self._rows is None:
+            self.beginInsertRows(QModelIndex(), first, last)
+
+    def _on_rows_inserted(self, parent, first, last):
+        # 過濾中新加入的列 (串流載入 / redo 新增) 先隱藏, 下次套用過濾時才顯示
+        if self._rows is None:
+            self.endInsertRows()
+            return
+        count = last - first + 1
+        self._rows = [row + count if row >= first else row for row in self._rows]
+        self._position = None
+
+    def _on_rows_about_to_be_removed(self, parent, first, last):
+        self._source_indexes = {}
+        if self._rows is None:
+            self._removing = (first, last + 1)
+            self.beginRemoveRows(QModelIndex(), first, last)
+        elif self._ranked:
+            # 依名次排序時刪除的列不一定連續, 整個重設 (符合的列不多)
+            self._removing = None
+            self.beginResetModel()
+        else:
+            self._removing = (bisect_left(self._rows, first), bisect_right(self._rows, last))
+            if self._removing[0] < self._removing[1]:
+                self.beginRemoveRows(QModelIndex(), self._removing[0], self._removing[1] - 1)
+
+    def _on_rows_removed(self, parent, first, last):
+        count = last - first + 1
+        if self._rows is None:
+            self.endRemoveRows()
+            return
+        if self._ranked:
+            self._rows = [row - count if row > last else row
+                          for row in self._rows if row < first or row > last]
+            self._position = None
+            self.endResetModel()
+            return
+        start, end = self._removing
+        del self._rows[start:end]
+        self._rows[start:] = [row - count for row in self._rows[start:]]
+        if start < end:
+            self.endRemoveRows()
+
+    def _on_data_changed(self, top_left, bottom_right, roles=()):
+        first, last = self._proxy_range(top_left.row(), bottom_right.row())
+        if first <= last:
+            self.dataChanged.emit(self.index(first, top_left.column()), self.index(last, bottom_right.column()), roles)
+
+    def _on_columns_about_to_be_inserted(self, parent, first, last):
+        self._source_indexes = {}
+        self.beginInsertColumns(QModelIndex(), first, last)
+
+    def _on_header_data_changed(self, orientation, first, last):
+        if orientation == Qt.Orientation.Horizontal:
+            self.headerDataChanged.emit(orientation, first, last)
+
+    def _proxy_range(self, first, last):
+        # 來源列 first..last 在畫面上的範圍 (第一列, 最後一列); 沒有顯示的列時 first > last
+        rows = self._rows
+        if rows is None:
+            return first, last
+        if not self._ranked:
+            return bisect_left(rows, first), bisect_right(rows, last) - 1
+        positions = [position for position, row in enumerate(rows) if first <= row <= last]
+        return (positions[0], positions[-1]) if positions else (0, -1)
+    #========================================================================#
+
+    # region Filter
+    def set_visible_rows(self, visible, notify=True, rank=None):
+        # visible: bytearray, 每列一個 byte; None 代表全部顯示
+        # notify=False: source model 接著會整個 reset, 由那次 reset 一併通知 view
+        # rank: {來源列: 名次}, 只在符合的列不多時提供 (NameSearch.RANK_LIMIT)
+        rows = rows_of(visible) if visible is not None else None
+        if rows is not None and rank is not None:
+            rows.sort(key=lambda row: rank.get(row, len(rank)))
+        if not notify:
+            self._set_rows(rows, rank is not None)
+            return
+        if rows is None and self._rows is None:
+            return
+        # 以 layoutChanged 通知 view: 選取的列 (persistent index) 依來源列號移到新的位置
+        self.layoutAboutToBeChanged.emit()
+        persistent = self.persistentIndexList()
+        sources = [(self.source_row(index.row()), index.column()) for index in persistent]
+        self._set_rows(rows, rank is not None)
+        self.changePersistentIndexList(persistent, [self._index_of_source(row, column) for row, column in sources])
+        self.layoutChanged.emit()
+
+    def _set_rows(self, rows, ranked):
+        self._source_indexes = {}
+        self._rows = rows
+        self._ranked = ranked and rows is not None
+        self._position = None
+
+    def has_filter(self):
+        return self._rows is not None
+
+    def visible_source_rows(self):
+        # 顯示中的來源列號, 直接由過濾結果取出, 不逐列 mapToSource
+        if self._rows is None:
+            return list(range(self.sourceModel().rowCount()))
+        return list(self._rows)
+
+    def source_row(self, row):
+        return self._rows[row] if self._rows is not None else row
+
+    def proxy_row(self, source_row):
+        # 來源列在畫面上的列號, 沒有顯示時為 -1
+        rows = self._rows
+        if rows is None:
+            return source_row
+        if self._ranked:
+            if self._position is None:
+                self._position = {row: position for position, row in enumerate(rows)}
+            return self._position.get(source_row, -1)
+        position = bisect_left(rows, source_row)
+        return position if position < len(rows) and rows[position] == source_row else -1
+
+    def _index_of_source(self, source_row, column):
+        row = self.proxy_row(source_row)
+        return self.index(row, column) if row >= 0 else QModelIndex()
+    #========================================================================#
+
+    # region QAbstractProxyModel
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid() or self.sourceModel() is None:
+            return 0
+        return len(self._rows) if self._rows is not None else self.sourceModel().rowCount()
+
+    def columnCount(self, parent=QModelIndex()):
+        if parent.isValid() or self.sourceModel() is None:
+            return 0
+        return self.sourceModel().columnCount()
+
+    def hasChildren(self, parent=QModelIndex()):
+        return not parent.isValid() and self.rowCount() > 0
+
+    def index(self, row, column, parent=QModelIndex()):
+        if parent.isValid() or not (0 <= row < self.rowCount() and 0 <= column < self.columnCount()):
+            return QModelIndex()
+        return self.createIndex(row, column)
+
+    def parent(self, index=None):
+        if index is None:
+            return super().parent()
+        return QModelIndex()
+
+    def mapToSource(self, proxy_index):
+        if not proxy_index.isValid():
+            return QModelIndex()
+        key = (proxy_index.row(), proxy_index.column())
+        source_index = self._source_indexes.get(key)
+        if source_index is None:
+            if len(self._source_indexes) >= self.SOURCE_INDEX_LIMIT:
+                self._source_indexes = {}
+            source_index = self.sourceModel().index(self.source_row(key[0]), key[1])
+            self._source_indexes[key] = source_index
+        return source_index
+
+    def mapFromSource(self, source_index):
+        if not source_index.isValid():
+            return QModelIndex()
+        return self._index_of_source(source_index.row(), source_index.column())
+    #========================================================================#
@@ -0,0 +1,155 @@
+from PyQt6.QtCore import Qt, QAbstractTableModel, QModelIndex, QRect, QEvent, pyqtSignal
+from PyQt6.QtGui import QColor, QPen
+from PyQt6.QtWidgets import QStyledItemDelegate, QStyle
+
+
+class PermissionMatrixModel(QAbstractTableModel):
+    # 權限 x 角色的勾選矩陣: 第 0 欄為名稱, 之後每個角色一欄 (RoleRegistry 的順序)
+    # 勾選狀態直接以角色組合的 bitmask 判斷; 資料來源與表格共用同一個 PermissionTableModel
+    # 勾選不直接修改 store, 而是發出 toggle_requested, 由 MainWindow 走一般的編輯流程 (undo / 驗證 / 索引)
+    NAME_COLUMN = 0
+    toggle_requested = pyqtSignal(int, str, bool)  # (列, 角色, 勾選)
+
+    def __init__(self, source_model, parent=None):
+        super().__init__(parent)
+        self.source_model = source_model
+        self._role_count = len(self.store.registry)
+
+        # 列與表格完全相同, 直接轉送來源的通知
+        source_model.modelAboutToBeReset.connect(self.beginResetModel)
+        source_model.modelReset.connect(self.on_source_reset)
+        source_model.rowsAboutToBeInserted.connect(lambda parent, first, last: self.beginInsertRows(QModelIndex(), first, last))
+        source_model.rowsInserted.connect(self.on_rows_inserted)
+        source_model.rowsAboutToBeRemoved.connect(lambda parent, first, last: self.beginRemoveRows(QModelIndex(), first, last))
+        source_model.rowsRemoved.connect(self.endRemoveRows)
+        source_model.dataChanged.connect(self.on_data_changed)
+
+    @property
+    def store(self):
+        return self.source_model.store
+
+    def on_source_reset(self):
+        self._role_count = len(self.store.registry)
+        self.endResetModel()
+
+    def on_rows_inserted(self):
+        self.endInsertRows()
+        self.sync_roles()
+
+    def on_data_changed(self, top_left, bottom_right, roles=()):
+        # 編輯可能註冊新的角色, 先補上欄位
+        self.sync_roles()
+        self.dataChanged.emit(self.index(top_left.row(), 0), self.index(bottom_right.row(), self._role_count))
+
+    def sync_roles(self):
+        # 角色只會增加, 新角色的欄位加在最後
+        count = len(self.store.registry)
+        if count > self._role_count:
+            self.beginInsertColumns(QModelIndex(), self._role_count + 1, count)
+            self._role_count = count
+            self.endInsertColumns()
+
+    def role_of_column(self, column):
+        return self.store.registry.roles[column - 1] if column > self.NAME_COLUMN else None
+
+    def column_of_role(self, role):
+        return self.store.registry.roles.index(role) + 1
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.store)
+
+    def columnCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return self._role_count + 1
+
+    def is_checked(self, row, column):
+        store = self.store
+        return bool(store.set_masks[store.role_set_ids[row]] & (1 << (column - 1)))
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        row = index.row()
+        column = index.column()
+        if column == self.NAME_COLUMN:
+            if role == Qt.ItemDataRole.DisplayRole:
+                return self.store.name(row)
+            if role == Qt.ItemDataRole.ToolTipRole:
+                return self.store.roles_text(row)
+            return None
+        if role == Qt.ItemDataRole.CheckStateRole:
+            return Qt.CheckState.Checked if self.is_checked(row, column) else Qt.CheckState.Unchecked
+        if role == Qt.ItemDataRole.ToolTipRole:
+            return f"{self.store.name(row)}\n{self.role_of_column(column)}"
+        return None
+
+    def setData(self, index, value, role=Qt.ItemDataRole.EditRole):
+        if not index.isValid() or index.column() == self.NAME_COLUMN or role != Qt.ItemDataRole.CheckStateRole:
+            return False
+        checked = Qt.CheckState(value) == Qt.CheckState.Checked
+        self.toggle_requested.emit(index.row(), self.role_of_column(index.column()), checked)
+        return True
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if orientation != Qt.Orientation.Horizontal:
+            if role == Qt.ItemDataRole.DisplayRole:
+                return str(section + 1)
+            return None
+        if role == Qt.ItemDataRole.DisplayRole:
+            return "Permission Name" if section == self.NAME_COLUMN else self.role_of_column(section)
+        if role == Qt.ItemDataRole.ToolTipRole and section > self.NAME_COLUMN:
+            return f"Click to grant / revoke {self.role_of_column(section)} for all shown permissions"
+        return None
+
+    def flags(self, index):
+        if not index.isValid():
+            return Qt.ItemFlag.NoItemFlags
+        flags = Qt.ItemFlag.ItemIsEnabled | Qt.ItemFlag.ItemIsSelectable
+        if index.column() > self.NAME_COLUMN:
+            flags |= Qt.ItemFlag.ItemIsUserCheckable
+        return flags
+
+
+class RoleCheckDelegate(QStyledItemDelegate):
+    # 角色欄的繪製: 只畫一個方塊, 不建立 widget 也不做文字排版
+    # 滑鼠單擊或空白鍵切換勾選 (經由 model.setData)
+    BOX_SIZE = 12
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.checked_color = QColor("#26a69a")
+        self.border_pen = QPen(QColor("#8a8a8a"))
+
+    def paint(self, painter, option, index):
+        if not index.flags() & Qt.ItemFlag.ItemIsUserCheckable:
+            super().paint(painter, option, index)
+            return
+        if option.state & QStyle.StateFlag.State_Selected:
+            painter.fillRect(option.rect, option.palette.highlight())
+        size = min(self.BOX_SIZE, option.rect.height() - 4, option.rect.width() - 4)
+        box = QRect(0, 0, size, size)
+        box.moveCenter(option.rect.center())
+        if index.data(Qt.ItemDataRole.CheckStateRole) == Qt.CheckState.Checked:
+            painter.fillRect(box, self.checked_color)
+        painter.setPen(self.border_pen)
+        painter.drawRect(box)
+
+    def editorEvent(self, event, model, option, index):
+        if not index.flags() & Qt.ItemFlag.ItemIsUserCheckable:
+            return False
+        if event.type() == QEvent.Type.MouseButtonRelease:
+            if event.button() != Qt.MouseButton.LeftButton or not option.rect.contains(event.position().toPoint()):
+                return False
+        elif event.type() == QEvent.Type.MouseButtonDblClick:
+            return True  # 避免雙擊切換兩次
+        elif event.type() == QEvent.Type.KeyPress:
+            if event.key() not in (Qt.Key.Key_Space, Qt.Key.Key_Select):
+                return False
+        else:
+            return False
+        checked = index.data(Qt.ItemDataRole.CheckStateRole) == Qt.CheckState.Checked
+        new_state = Qt.CheckState.Unchecked if checked else Qt.CheckState.Checked
+        return model.setData(index, new_state, Qt.ItemDataRole.CheckStateRole)
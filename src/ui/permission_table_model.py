@@ -0,0 +1,130 @@
+from PyQt6.QtCore import Qt, QAbstractTableModel, QModelIndex
+from PyQt6.QtGui import QBrush, QColor
+from ..models.permission_store import PermissionStore
+
+
+class PermissionTableModel(QAbstractTableModel):
+    NAME_COLUMN = 0
+    DEFAULT_COLUMN = 1
+    ROLES_COLUMN = 2
+    HEADERS = ["Permission Name", "Default", "Roles"]
+
+    def __init__(self, store=None, parent=None):
+        super().__init__(parent)
+        self.store = store if store is not None else PermissionStore()
+        # 驗證結果: {row: 說明文字}, 有問題的列以紅字顯示
+        self.issues = {}
+        self.issue_brush = QBrush(QColor("#ff6b6b"))
+
+    def set_store(self, store):
+        self.beginResetModel()
+        self.store = store
+        self.issues = {}
+        self.endResetModel()
+
+    def set_issues(self, issues):
+        # 只重繪新舊結果中有問題的列
+        changed = self.issues.keys() | issues.keys()
+        self.issues = issues
+        if changed:
+            self.dataChanged.emit(self.index(min(changed), self.NAME_COLUMN), self.index(max(changed), self.ROLES_COLUMN))
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.store)
+
+    def columnCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.HEADERS)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        # 只有畫面上可見的列才會被 view 查詢, 顯示文字在這裡才產生
+        if not index.isValid():
+            return None
+        row = index.row()
+        if role != Qt.ItemDataRole.DisplayRole:
+            if row in self.issues:
+                if role == Qt.ItemDataRole.ForegroundRole:
+                    return self.issue_brush
+                if role == Qt.ItemDataRole.ToolTipRole:
+                    return self.issues[row]
+            return None
+        column = index.column()
+        if column == self.NAME_COLUMN:
+            return self.store.name(row)
+        if column == self.DEFAULT_COLUMN:
+            return str(self.store.default_value(row))
+        if column == self.ROLES_COLUMN:
+            return self.store.roles_text(row)
+        return None
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role != Qt.ItemDataRole.DisplayRole:
+            return None
+        if orientation == Qt.Orientation.Horizontal:
+            return self.HEADERS[section]
+        return str(section + 1)
+
+    def flags(self, index):
+        if not index.isValid():
+            return Qt.ItemFlag.NoItemFlags
+        return Qt.ItemFlag.ItemIsEnabled | Qt.ItemFlag.ItemIsSelectable
+
+    def update_row(self, row, default_value, roles):
+        self.store.set_row(row, default_value, roles)
+        self.dataChanged.emit(self.index(row, self.DEFAULT_COLUMN), self.index(row, self.ROLES_COLUMN))
+
+    def append_rows(self, batch):
+        # 串流載入: 每批只插入新的列, 不重設整個 model
+        if not batch:
+            return
+        first = len(self.store)
+        self.beginInsertRows(QModelIndex(), first, first + len(batch) - 1)
+        self.store.extend(batch)
+        self.endInsertRows()
+
+    def set_rows(self, values):
+        # values: [(row, default_value, roles)], 只發出一個 dataChanged 範圍
+        for row, default_value, roles in values:
+            self.store.set_row(row, default_value, roles)
+        self._emit_rows_changed([row for row, _, _ in values])
+
+    def set_row_masks(self, values):
+        # values: [(row, default_value, mask)], 角色已轉成 bitmask
+        for row, default_value, mask in values:
+            self.store.set_row_mask(row, default_value, mask)
+        self._emit_rows_changed([row for row, _, _ in values])
+
+    def remove_rows(self, rows):
+        # 由後往前依連續區段刪除, 前面的列號不受影響
+        rows = sorted(set(rows), reverse=True)
+        while rows:
+            last = first = rows.pop(0)
+            while rows and rows[0] == first - 1:
+                first = rows.pop(0)
+            self.beginRemoveRows(QModelIndex(), first, last)
+            self.store.delete_range(first, last)
+            self.endRemoveRows()
+
+    def apply_bulk(self, bulk_edit, rows):
+        # 一次套用到所有列, 只發出一個 dataChanged 範圍
+        command = bulk_edit.apply(self.store, rows)
+        self._emit_rows_changed(command.rows)
+        return command
+
+    def undo_command(self, command):
+        # 新增的列都在最後 (堆疊順序保證之後的新增已先 undo), 從尾端刪除
+        self._emit_rows_changed(command.undo(self.store))
+        if command.added:
+            self.remove_rows(command.added_rows())
+
+    def redo_command(self, command):
+        if command.added:
+            self.append_rows(command.added)
+        self._emit_rows_changed(command.redo(self.store))
+
+    def _emit_rows_changed(self, rows):
+        if len(rows):
+            self.dataChanged.emit(self.index(min(rows), self.DEFAULT_COLUMN), self.index(max(rows), self.ROLES_COLUMN))
@@ -0,0 +1,178 @@
+from PyQt6.QtCore import Qt, QAbstractItemModel, QModelIndex
+from PyQt6.QtGui import QFont
+from ..models.prefix_trie import PrefixTrie
+
+
+class PermissionTreeModel(QAbstractItemModel):
+    # 依名稱前綴分組的樹狀 model, 資料來源與表格共用同一個 PermissionTableModel
+    # 每個 index 的 internalPointer 為其父節點; 子項目依序為子群組、權限列
+    FETCH_BATCH = 500
+
+    def __init__(self, source_model, parent=None):
+        super().__init__(parent)
+        self.source_model = source_model
+        self.trie = PrefixTrie(source_model.store)
+        self._bold_font = QFont()
+        self._bold_font.setBold(True)
+        self._inserting = False
+
+        source_model.modelReset.connect(self.rebuild)
+        source_model.rowsInserted.connect(self.on_rows_inserted)
+        source_model.rowsRemoved.connect(self.rebuild)  # 刪除很少見, 直接重建
+        source_model.dataChanged.connect(self.on_data_changed)
+
+    @property
+    def store(self):
+        return self.source_model.store
+
+    def rebuild(self):
+        self.beginResetModel()
+        self.trie = PrefixTrie(self.store)
+        self.endResetModel()
+
+    def node_of(self, index):
+        # index 代表的群組節點; 權限列回傳 None
+        if not index.isValid():
+            return self.trie.root
+        parent_node = index.internalPointer()
+        if index.row() < len(parent_node.child_list):
+            return parent_node.child_list[index.row()]
+        return None
+
+    def source_row(self, index):
+        # index 對應 store 的列, 群組回傳 -1
+        if not index.isValid():
+            return -1
+        parent_node = index.internalPointer()
+        offset = index.row() - len(parent_node.child_list)
+        if offset < 0:
+            return -1
+        return parent_node.leaf_rows[offset]
+
+    def rows_of(self, index):
+        node = self.node_of(index)
+        if node is None:
+            return [self.source_row(index)]
+        return self.trie.rows_of(node)
+
+    def index(self, row, column, parent=QModelIndex()):
+        node = self.node_of(parent)
+        if node is None or row < 0 or row >= node.fetched or column < 0 or column >= self.columnCount():
+            return QModelIndex()
+        return self.createIndex(row, column, node)
+
+    def parent(self, index):
+        if not index.isValid():
+            return QModelIndex()
+        node = index.internalPointer()
+        if node is self.trie.root:
+            return QModelIndex()
+        return self.createIndex(node.position, 0, node.parent)
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.column() > 0:
+            return 0
+        node = self.node_of(parent)
+        return 0 if node is None else node.fetched
+
+    def columnCount(self, parent=QModelIndex()):
+        return len(self.source_model.HEADERS)
+
+    def hasChildren(self, parent=QModelIndex()):
+        if parent.column() > 0:
+            return False
+        node = self.node_of(parent)
+        return node is not None and node.total > 0
+
+    def canFetchMore(self, parent):
+        node = self.node_of(parent)
+        if node is None:
+            return False
+        if not node.expanded:
+            return node.total > 0
+        return node.fetched < node.child_count()
+
+    def fetchMore(self, parent):
+        # 展開節點時才建立子節點, 並分批交給 view
+        node = self.node_of(parent)
+        if node is None or self._inserting:
+            return
+        self.trie.expand(node)
+        count = min(self.FETCH_BATCH, node.child_count() - node.fetched)
+        if count <= 0:
+            return
+        self.beginInsertRows(parent, node.fetched, node.fetched + count - 1)
+        node.fetched += count
+        self.endInsertRows()
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        node = self.node_of(index)
+        if node is None:
+            if role != Qt.ItemDataRole.DisplayRole:
+                return None
+            return self.source_model.data(self.source_model.index(self.source_row(index), index.column()), role)
+
+        if role == Qt.ItemDataRole.FontRole:
+            return self._bold_font
+        if role == Qt.ItemDataRole.ToolTipRole:
+            counts = node.role_counts(self.store)
+            lines = [f"{node.prefix()}*  {node.total} permission(s)"]
+            lines.extend(f"{role_name}: {counts[role_name]}/{node.total}"
+                         for role_name in self.store.registry.roles if role_name in counts)
+            return '\n'.join(lines)
+        if role != Qt.ItemDataRole.DisplayRole:
+            return None
+        column = index.column()
+        if column == self.source_model.NAME_COLUMN:
+            return f"{node.label}_ ({node.total})"
+        if column == self.source_model.DEFAULT_COLUMN:
+            return f"True {node.default_count}/{node.total}"
+        if column == self.source_model.ROLES_COLUMN:
+            return node.roles_text(self.store)
+        return None
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        return self.source_model.headerData(section, orientation, role)
+
+    def flags(self, index):
+        if not index.isValid():
+            return Qt.ItemFlag.NoItemFlags
+        return Qt.ItemFlag.ItemIsEnabled | Qt.ItemFlag.ItemIsSelectable
+
+    def on_rows_inserted(self, parent, first, last):
+        # 串流載入: 已展開的節點才需要通知 view, 未展開的只更新統計
+        def before_insert(node, position):
+            if position <= node.fetched:
+                # view 可能在 beginInsertRows 期間呼叫 fetchMore, 以 _inserting 擋住
+                self._inserting = True
+                self.beginInsertRows(self._index_of(node), position, position)
+                node.fetched += 1
+
+        touched = set()
+        for row in range(first, last + 1):
+            touched |= self.trie.add_rows((row,), before_insert)
+            if self._inserting:
+                self.endInsertRows()
+                self._inserting = False
+        self._emit_nodes_changed(touched)
+
+    def on_data_changed(self, top_left, bottom_right, roles=()):
+        self._emit_nodes_changed(self.trie.refresh_rows(top_left.row(), bottom_right.row()))
+
+    def _index_of(self, node, column=0):
+        if node.parent is None:
+            return QModelIndex()
+        return self.createIndex(node.position, column, node.parent)
+
+    def _emit_nodes_changed(self, nodes):
+        # 群組的統計欄位與其下已顯示的權限列
+        last_column = self.columnCount() - 1
+        for node in nodes:
+            if node.parent is not None and node.position < node.parent.fetched:
+                self.dataChanged.emit(self._index_of(node, 1), self._index_of(node, last_column))
+            first_leaf = len(node.child_list)
+            if node.fetched > first_leaf:
+                self.dataChanged.emit(self.createIndex(first_leaf, 0, node),
+                                      self.createIndex(node.fetched - 1, last_column, node))
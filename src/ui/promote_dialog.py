@@ -0,0 +1,180 @@
+from PyQt6.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QLabel, QComboBox,
+    QPushButton, QTableView, QAbstractItemView, QHeaderView
+)
+from PyQt6.QtCore import Qt, QAbstractTableModel, QModelIndex
+from ..permissions.workspace import promotion_entries
+
+
+def describe_row(store, row):
+    if row is None:
+        return "(missing)"
+    return f"Default={store.default_value(row)}  Roles: {', '.join(store.roles(row))}"
+
+
+class PromotionModel(QAbstractTableModel):
+    # 兩個環境的差異: 每列一筆 (name, default_value, roles), 第 0 欄可勾選
+    # 勾選狀態存在 bytearray; 顯示文字只替畫面上的列產生
+    HEADERS = ["Permission Name", "Target", "Source"]
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.entries = []
+        self.checked = bytearray()
+        self.source_store = None
+        self.target_store = None
+
+    def set_entries(self, entries, source_store, target_store):
+        self.beginResetModel()
+        self.entries = entries
+        self.checked = bytearray(b'\x01') * len(entries)
+        self.source_store = source_store
+        self.target_store = target_store
+        self.endResetModel()
+
+    def set_all_checked(self, checked):
+        if not self.entries:
+            return
+        self.checked = (bytearray(b'\x01') if checked else bytearray(b'\x00')) * len(self.entries)
+        self.dataChanged.emit(self.index(0, 0), self.index(len(self.entries) - 1, 0), [Qt.ItemDataRole.CheckStateRole])
+
+    def selected_entries(self):
+        return [entry for entry, checked in zip(self.entries, self.checked) if checked]
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.entries)
+
+    def columnCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.HEADERS)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        row = index.row()
+        column = index.column()
+        name = self.entries[row][0]
+        if column == 0:
+            if role == Qt.ItemDataRole.DisplayRole:
+                return name
+            if role == Qt.ItemDataRole.CheckStateRole:
+                return Qt.CheckState.Checked if self.checked[row] else Qt.CheckState.Unchecked
+            return None
+        if role not in (Qt.ItemDataRole.DisplayRole, Qt.ItemDataRole.ToolTipRole):
+            return None
+        store = self.target_store if column == 1 else self.source_store
+        return describe_row(store, store.index_of.get(name))
+
+    def setData(self, index, value, role=Qt.ItemDataRole.EditRole):
+        if not index.isValid() or index.column() != 0 or role != Qt.ItemDataRole.CheckStateRole:
+            return False
+        self.checked[index.row()] = Qt.CheckState(value) == Qt.CheckState.Checked
+        self.dataChanged.emit(index, index, [role])
+        return True
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role != Qt.ItemDataRole.DisplayRole:
+            return None
+        if orientation == Qt.Orientation.Horizontal:
+            return self.HEADERS[section]
+        return str(section + 1)
+
+    def flags(self, index):
+        if not index.isValid():
+            return Qt.ItemFlag.NoItemFlags
+        flags = Qt.ItemFlag.ItemIsEnabled | Qt.ItemFlag.ItemIsSelectable
+        if index.column() == 0:
+            flags |= Qt.ItemFlag.ItemIsUserCheckable
+        return flags
+
+
+class PromoteDialog(QDialog):
+    # 工作區中環境之間的差異: 勾選要複製的權限, 由目標分頁套用為一般編輯後一次存檔
+    # 比較的是兩個分頁目前的表格 (含尚未存檔的編輯); 目標多出的權限不會被刪除
+    def __init__(self, windows, current=None, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Promote Permissions")
+        self.setModal(True)
+        self.setMinimumSize(900, 450)
+
+        self.windows = windows
+        self.model = PromotionModel(self)
+        self.setup_ui(current)
+        self.refresh()
+
+    def setup_ui(self, current):
+        layout = QVBoxLayout(self)
+        env_layout = QHBoxLayout()
+        self.source_box = QComboBox()
+        self.target_box = QComboBox()
+        names = list(self.windows)
+        self.source_box.addItems(names)
+        self.target_box.addItems(names)
+        if current in self.windows:
+            self.source_box.setCurrentText(current)
+        self.target_box.setCurrentIndex((self.source_box.currentIndex() + 1) % len(names))
+        env_layout.addWidget(QLabel("From"))
+        env_layout.addWidget(self.source_box)
+        env_layout.addWidget(QLabel("To"))
+        env_layout.addWidget(self.target_box)
+        env_layout.addStretch()
+        layout.addLayout(env_layout)
+
+        self.summary_label = QLabel()
+        layout.addWidget(self.summary_label)
+
+        self.table = QTableView()
+        self.table.setModel(self.model)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.table.verticalHeader().setDefaultSectionSize(22)
+        header = self.table.horizontalHeader()
+        header.setSectionResizeMode(0, QHeaderView.ResizeMode.Interactive)
+        header.resizeSection(0, 280)
+        header.setSectionResizeMode(1, QHeaderView.ResizeMode.Stretch)
+        header.setSectionResizeMode(2, QHeaderView.ResizeMode.Stretch)
+        layout.addWidget(self.table)
+
+        buttons_layout = QHBoxLayout()
+        self.select_all_button = QPushButton("Select All")
+        self.select_none_button = QPushButton("Select None")
+        self.ok_button = QPushButton("Promote and Save")
+        self.cancel_button = QPushButton("Cancel")
+        buttons_layout.addWidget(self.select_all_button)
+        buttons_layout.addWidget(self.select_none_button)
+        buttons_layout.addStretch()
+        buttons_layout.addWidget(self.ok_button)
+        buttons_layout.addWidget(self.cancel_button)
+        layout.addLayout(buttons_layout)
+
+        self.source_box.currentTextChanged.connect(self.refresh)
+        self.target_box.currentTextChanged.connect(self.refresh)
+        self.select_all_button.clicked.connect(lambda: self.model.set_all_checked(True))
+        self.select_none_button.clicked.connect(lambda: self.model.set_all_checked(False))
+        self.ok_button.clicked.connect(self.accept)
+        self.cancel_button.clicked.connect(self.reject)
+
+    def source(self):
+        return self.source_box.currentText()
+
+    def target(self):
+        return self.target_box.currentText()
+
+    def refresh(self):
+        # 兩個分頁共用 SharedTables, 比較時直接對照角色組合的 bitmask
+        source, target = self.source(), self.target()
+        if source == target:
+            self.model.set_entries([], None, None)
+            self.summary_label.setText("Choose two different environments.")
+            self.ok_button.setEnabled(False)
+            return
+        source_store = self.windows[source].table_model.store
+        target_store = self.windows[target].table_model.store
+        self.model.set_entries(promotion_entries(source_store, target_store), source_store, target_store)
+        self.summary_label.setText(f"{len(self.model.entries)} permission(s) differ from {source} to {target}.")
+        self.ok_button.setEnabled(bool(self.model.entries))
+
+    def selected_entries(self):
+        return self.model.selected_entries()
@@ -0,0 +1,300 @@
+import os
+import logging
+import threading
+from collections import namedtuple
+from PyQt6.QtCore import QThread, pyqtSignal
+from ..models.change_set import ChangeSet
+from ..models.model_version import ModelVersion, paused_gc
+from ..models.name_search import NameSearch, SearchResult
+from ..models.snapshot_format import read_snapshot
+from ..models.stream_parser import iter_snapshot_batches
+from ..controllers.s3_cache import (download_permissions, cached_snapshot_path,
+                                   DownloadCache, is_connection_error)
+from ..controllers.s3_publish import head_remote
+from ..permissions.permission_set import save_change_set
+from .. import startup_profiler
+from .. import tracing
+from .circle_progress_dialog import UploadProgressCallback
+
+log = logging.getLogger(__name__)
+
+
+# GUI thread 交給 SaveWorker 的存檔內容; 建立後不再修改, worker 不需要讀取任何 widget
+SaveRequest = namedtuple('SaveRequest', ['change_set', 'base_permissions', 'base_meta', 'merged'])
+
+
+class SaveWorker(QThread):
+    # finished(SaveResult, ModelVersion 或 None): 合併了其他人的變更時, 新版本在 worker 中建好
+    finished = pyqtSignal(object, object)
+    error = pyqtSignal(str)
+    progress = pyqtSignal(int, int)
+    conflicts = pyqtSignal(object)
+    offline = pyqtSignal(str)
+
+    def __init__(self, main_window):
+        super().__init__()
+        self.main_window = main_window
+        self.request = None
+
+    def submit(self, request):
+        self.request = request
+        self.start()
+
+    def run(self):
+        request = self.request
+        try:
+            transfer = self.main_window.get_transfer()
+            stats = transfer.reset_stats()
+            local_json_path = self.main_window.local_json_path
+            # 序列化 / hash / 上傳都在這個 thread 完成
+            with paused_gc():
+                result = save_change_set(
+                    transfer,
+                    request.change_set,
+                    request.base_permissions,
+                    request.base_meta,
+                    local_json_path,
+                    UploadProgressCallback(on_progress=self.progress.emit)
+                )
+                if result.conflicts:
+                    self.conflicts.emit(result)
+                    return
+                if result.patch_key:
+                    log.info("S3 upload stats: %s", stats)
+                result.merged = result.merged or request.merged
+                version = None
+                if result.merged:
+                    # 表格要改成合併後的內容: 欄式資料與索引也在這裡建立
+                    version = ModelVersion(result.permissions, result.saved_path, DownloadCache(result.saved_path).load(),
+                                           self.main_window.tables)
+            self.finished.emit(result, version)
+        except Exception as e:
+            if is_connection_error(e):
+                self.offline.emit(str(e))
+            else:
+                self.error.emit(str(e))
+
+
+class RefreshPoller(QThread):
+    remote_changed = pyqtSignal(object)
+    error = pyqtSignal(str)
+
+    def __init__(self, main_window, interval):
+        super().__init__()
+        self.main_window = main_window
+        self.interval = interval
+        self._stop_event = threading.Event()
+        self._lock = threading.Lock()
+        self._meta = {}
+        self._base = None
+
+    def watch(self, meta, base_permissions):
+        # 由 GUI thread 設定目前的基準版本與其 ETag
+        with self._lock:
+            self._meta = dict(meta)
+            self._base = base_permissions
+
+    def stop(self):
+        self._stop_event.set()
+        self.wait()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.poll()
+            except Exception as e:
+                self.error.emit(str(e))
+
+    def poll(self):
+        main_window = self.main_window
+        if main_window.load_permissions_worker.isRunning() or main_window.save_worker.isRunning():
+            return
+        with self._lock:
+            meta = self._meta
+            base = self._base
+        if base is None:
+            return
+
+        # 只發 HEAD, ETag 沒變就不下載
+        transfer = main_window.get_transfer()
+        key, response = head_remote(transfer, meta.get('Key') or transfer.layout.compact)
+        etag = response.get('ETag')
+        if etag == meta.get('ETag'):
+            return
+
+        _, path = download_permissions(transfer, main_window.local_json_path)
+        with paused_gc():
+            remote = read_snapshot(path)
+            # 差異在 worker 算好, GUI thread 只套用變更的列
+            change_set = ChangeSet.between(base, remote)
+        with self._lock:
+            if self._meta is meta:
+                self._meta = dict(meta, ETag=etag)
+        if change_set:
+            self.remote_changed.emit((change_set, remote, path, base))
+
+
+class SyncWorker(QThread):
+    # 離線時定期嘗試連線 S3, 連上後通知 GUI 重播日誌
+    online = pyqtSignal()
+
+    SYNC_INTERVAL = 15
+
+    def __init__(self, main_window):
+        super().__init__()
+        self.main_window = main_window
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        self._stop_event.set()
+        self.wait()
+
+    def run(self):
+        while not self._stop_event.wait(self.SYNC_INTERVAL):
+            try:
+                transfer = self.main_window.get_transfer()
+                head_remote(transfer, transfer.layout.compact)
+            except Exception as e:
+                if is_connection_error(e):
+                    continue
+                # 其他錯誤 (例如權限) 表示已連上 S3
+            self.online.emit()
+            return
+
+
+class LoadWorker(QThread):
+    load_started = pyqtSignal()
+    batch_loaded = pyqtSignal(object)
+    finished = pyqtSignal(bool)
+    error = pyqtSignal(str)
+    offline = pyqtSignal(str)
+    progress = pyqtSignal(int, int)
+
+    def __init__(self, main_window):
+        super().__init__()
+        self.main_window = main_window
+        self.loaded_path = main_window.local_json_path
+        self.has_data = False
+        self.permissions = None
+        self.parsed_path = None
+
+    def run(self):
+        try:
+            # 確保目標資料夾存在
+            os.makedirs(os.path.dirname(self.main_window.local_json_path), exist_ok=True)
+
+            # 先顯示本地快取, 再到 S3 檢查是否有新版本
+            cached_path = cached_snapshot_path(self.main_window.local_json_path)
+            if not self.has_data and cached_path is not None:
+                self.parse(cached_path)
+                self.has_data = True
+                startup_profiler.mark("Cached permissions shown")
+
+            # 從 S3 下載檔案 (條件式 GET, 沒變動時不傳輸)
+            try:
+                transfer = self.main_window.get_transfer()
+                stats = transfer.reset_stats()
+                changed, self.loaded_path = download_permissions(
+                    transfer,
+                    self.main_window.local_json_path,
+                    UploadProgressCallback(on_progress=self.progress.emit) )
+                log.info("S3 download stats: %s", stats)
+                if changed:
+                    log.info("Save Permission done %s", self.loaded_path)
+                else:
+                    log.info("permissions.json not modified on S3, use local cache")
+            except Exception as e:
+                if is_connection_error(e):
+                    # 離線: 已顯示的本地快取繼續使用
+                    self.offline.emit(str(e))
+                    return
+                raise Exception(f"Failed to download from S3: {str(e)}")
+
+            if changed or not self.has_data:
+                self.parse(self.loaded_path)
+            self.finished.emit(changed)
+
+        except Exception as e:
+            self.error.emit(str(e))
+
+    def parse(self, path):
+        # 在 worker 中串流解析, 每批透過 signal 交給 GUI thread
+        extra = {}
+        entries = {}
+        self.load_started.emit()
+        try:
+            with paused_gc(), tracing.span('load.parse', path=os.path.basename(path)) as span:
+                for batch in iter_snapshot_batches(path, extra=extra):
+                    for name, default_value, roles in batch:
+                        entries[name] = {'AllowedRoles': roles, 'DefaultValue': default_value}
+                    self.batch_loaded.emit(batch)
+                span.set(rows=len(entries))
+        except ValueError as e:
+            raise Exception(f"Invalid JSON format: {str(e)}")
+        extra['Permissions'] = entries
+        self.permissions = extra
+        self.parsed_path = path
+
+
+
+class SearchWorker(QThread):
+    # 模糊 / regex 搜尋: 只保留最新的查詢, 輸入時舊的查詢在下一個分段檢查點放棄
+    # 名稱複本由 GUI thread 傳入, NameSearch 只增量更新索引
+    result_ready = pyqtSignal(object)
+    error = pyqtSignal(object, str)
+
+    def __init__(self):
+        super().__init__()
+        self.engine = NameSearch()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._pending = None
+        self._generation = 0
+        self._stopped = False
+
+    def submit(self, source, version, names, query):
+        # source / version: 結果所屬的 SearchIndex 與其版本, GUI 以此判斷結果是否過期
+        with self._lock:
+            self._generation += 1
+            self._pending = (self._generation, source, version, names, query)
+        self._wake.set()
+        if not self.isRunning():
+            self.start()
+
+    def cancel(self):
+        with self._lock:
+            self._generation += 1
+            self._pending = None
+
+    def stop(self):
+        self._stopped = True
+        self.cancel()
+        self._wake.set()
+        self.wait()
+
+    def run(self):
+        while True:
+            self._wake.wait()
+            with self._lock:
+                self._wake.clear()
+                request = self._pending
+                self._pending = None
+            if self._stopped:
+                return
+            if request is None:
+                continue
+            generation, source, version, names, query = request
+            is_stale = lambda: self._generation != generation
+            try:
+                with tracing.span('search', mode=query.mode, rows=len(names)) as span:
+                    self.engine.sync(names)
+                    found = self.engine.search(query, is_stale)
+                    span.set(cancelled=found is None)
+            except Exception as e:
+                self.error.emit(query, str(e))
+                continue
+            if found is None:
+                tracing.count('search.cancelled')
+                continue
+            mask, rank, count = found
+            self.result_ready.emit(SearchResult(query, source, version, mask, rank, count))
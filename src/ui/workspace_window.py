@@ -0,0 +1,75 @@
+import logging
+from PyQt6.QtWidgets import QMainWindow, QTabWidget, QPushButton, QMessageBox
+from PyQt6.QtCore import Qt
+from .main_window import MainWindow
+from .promote_dialog import PromoteDialog
+
+log = logging.getLogger(__name__)
+
+
+class WorkspaceWindow(QMainWindow):
+    # 工作區: 每個環境一個分頁 (MainWindow), 共用 Workspace 的 S3 client 與 SharedTables
+    # 各分頁各自載入 / 編輯 / 存檔; Promote 把一個環境的差異複製到另一個環境
+    def __init__(self, workspace, poll_interval=None):
+        super().__init__()
+        self.setWindowTitle("Permission Control System - Workspace")
+        self.setGeometry(100, 100, 1100, 650)
+        self.setWindowFlags( self.windowFlags() | Qt.WindowType.Window | Qt.WindowType.WindowStaysOnTopHint )
+        self.workspace = workspace
+        self.windows = {}
+
+        self.tabs = QTabWidget()
+        self.setCentralWidget(self.tabs)
+        self.promote_button = QPushButton("Promote...")
+        self.promote_button.setEnabled(len(workspace.names()) > 1)
+        self.promote_button.clicked.connect(self.show_promote)
+        self.tabs.setCornerWidget(self.promote_button, Qt.Corner.TopRightCorner)
+
+        for name in workspace.names():
+            environment = workspace.environment(name)
+            window = MainWindow(local_json_path=environment.local_json_path, poll_interval=poll_interval,
+                                tables=workspace.tables, transfer_factory=workspace.transfer_factory(name))
+            # 嵌入分頁: 取消獨立視窗的旗標
+            window.setWindowFlags(Qt.WindowType.Widget)
+            self.windows[name] = window
+            self.tabs.addTab(window, name)
+
+    def current_name(self):
+        return self.tabs.tabText(self.tabs.currentIndex())
+
+    def show_promote(self):
+        dialog = PromoteDialog(self.windows, self.current_name(), self)
+        if dialog.exec() != PromoteDialog.DialogCode.Accepted:
+            return
+        entries = dialog.selected_entries()
+        if not entries:
+            return
+        source = self.windows[dialog.source()]
+        target = self.windows[dialog.target()]
+        self.tabs.setCurrentWidget(target)
+        message = self.promote_blocked(dialog.source(), source, dialog.target(), target)
+        if message:
+            QMessageBox.warning(self, "Promote", message)
+            return
+        # 套用為目標分頁的一般編輯 (可 undo), 再走原本的存檔流程: 驗證 -> 日誌 -> 一次上傳
+        # 目標沒有其他未存檔的編輯, 這次存檔只包含複製過去的列
+        updated, added = target.apply_entries_as_edits(entries)
+        log.info("Promoted %s -> %s: %d changed, %d added permission(s)", dialog.source(), dialog.target(), updated, added)
+        target.save_changes()
+
+    def promote_blocked(self, source_name, source, target_name, target):
+        # 載入中的表格還會被換掉; 目標已有的編輯不應該在沒有確認的情況下一起上傳
+        if source.loading or target.loading:
+            return f"{source_name if source.loading else target_name} is still loading; try again when it finishes."
+        if target.save_worker.isRunning():
+            return f"{target_name} is saving; try again when it finishes."
+        if target.dirty_rows:
+            return (f"{target_name} has {len(target.dirty_rows)} unsaved edit(s). "
+                    "Save or cancel them before promoting, so only the promoted permissions are published.")
+        return None
+
+    def closeEvent(self, event):
+        # 嵌入的 MainWindow 不會收到 closeEvent, 逐一關閉以停止背景 thread
+        for window in self.windows.values():
+            window.close()
+        super().closeEvent(event)
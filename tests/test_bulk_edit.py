@@ -0,0 +1,35 @@
+from src.models.bulk_edit import BulkEdit
+from src.models.permission_store import PermissionStore
+
+ROWS = [
+    ('A', True, ['FW', 'HW']),
+    ('B', False, ['Q']),
+    ('C', False, []),
+]
+
+
+def make_store():
+    store = PermissionStore()
+    for name, default, roles in ROWS:
+        store.append(name, default, roles)
+    return store
+
+
+def test_add_and_remove_roles():
+    store = make_store()
+    command = BulkEdit(add_roles=['Q'], remove_roles=['FW'], default_value=True).apply(store, [0, 2])
+    assert store.roles(0) == ['HW', 'Q'] and store.roles(2) == ['Q']
+    assert store.roles(1) == ['Q']
+    assert store.default_value(2) is True
+    command.undo(store)
+    assert store.roles(0) == ['FW', 'HW'] and store.roles(2) == []
+    assert store.default_value(2) is False
+
+
+def test_removing_unknown_role_does_not_register_it():
+    store = make_store()
+    count = len(store.registry)
+    BulkEdit(remove_roles=['NoSuchRole', 'HW']).apply(store, [0, 1])
+    assert 'NoSuchRole' not in store.registry
+    assert len(store.registry) == count
+    assert store.roles(0) == ['FW'] and store.roles(1) == ['Q']
@@ -0,0 +1,46 @@
+from src.controllers.change_journal import ChangeJournal
+from src.models.change_set import ChangeSet
+
+
+def change_set_of(*changes):
+    change_set = ChangeSet()
+    for name, before, after in changes:
+        change_set.record(name, before, after)
+    return change_set
+
+
+def test_empty_journal(tmp_path):
+    journal = ChangeJournal(str(tmp_path / 'permissions.json'))
+    assert not journal
+    change_set, base_meta = journal.pending()
+    assert not change_set and base_meta == {}
+    journal.clear()
+
+
+def test_pending_merges_entries_and_keeps_first_base(tmp_path):
+    path = str(tmp_path / 'permissions.json')
+    journal = ChangeJournal(path)
+    journal.append(change_set_of(('A', {'v': 1}, {'v': 2}), ('B', None, {'v': 1})), {'etag': 'e1'})
+    journal.append(change_set_of(('A', {'v': 2}, {'v': 3}), ('B', {'v': 1}, None)), {'etag': 'e2'})
+
+    # 重新開啟 (例如程式重新啟動) 仍讀得到
+    journal = ChangeJournal(path)
+    assert journal
+    assert len(journal.entries()) == 2
+    change_set, base_meta = journal.pending()
+    assert base_meta == {'etag': 'e1'}
+    # A 保留第一次的 before; B 新增後又刪除, 沒有變更
+    assert change_set.changes == {'A': ({'v': 1}, {'v': 3})}
+
+    journal.clear()
+    assert not journal
+    assert journal.entries() == []
+
+
+def test_torn_last_line_is_ignored(tmp_path):
+    journal = ChangeJournal(str(tmp_path / 'permissions.json'))
+    journal.append(change_set_of(('名稱', None, {'v': 1})), {})
+    with open(journal.path, 'a', encoding='utf-8') as file:
+        file.write('{"time": "2024-')
+    change_set, _ = journal.pending()
+    assert change_set.changes == {'名稱': (None, {'v': 1})}
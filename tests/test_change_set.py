@@ -0,0 +1,59 @@
+import copy
+from src.models.change_set import ChangeSet, apply_patch
+from src.models.permission_store import PermissionStore
+
+BASE = {
+    'Version': 3,
+    'Permissions': {
+        'Keep': {'AllowedRoles': ['FW'], 'DefaultValue': False},
+        'Edit': {'AllowedRoles': ['HW'], 'DefaultValue': False},
+        'Drop': {'AllowedRoles': [], 'DefaultValue': True},
+        'a/b~c': {'AllowedRoles': ['Q'], 'DefaultValue': False},
+    },
+}
+
+
+def test_record_keeps_first_before_and_drops_reverted_edits():
+    change_set = ChangeSet()
+    change_set.record('X', {'v': 1}, {'v': 2})
+    change_set.record('X', {'v': 2}, {'v': 3})
+    assert change_set.changes['X'] == ({'v': 1}, {'v': 3})
+    change_set.record('X', {'v': 3}, {'v': 1})
+    assert not change_set and len(change_set) == 0
+
+
+def test_from_rows_only_records_real_changes():
+    store = PermissionStore.from_dict(BASE)
+    row = store.index_of['Edit']
+    store.set_row(row, True, ['HW', 'FW'])
+    change_set = ChangeSet.from_rows(store, [row, store.index_of['Keep']], BASE['Permissions'])
+    assert list(change_set.changes) == ['Edit']
+    before, after = change_set.changes['Edit']
+    assert before == BASE['Permissions']['Edit']
+    assert after == {'AllowedRoles': ['FW', 'HW'], 'DefaultValue': True}
+
+
+def test_between_finds_added_changed_and_removed():
+    new = copy.deepcopy(BASE)
+    new['Permissions']['Edit']['DefaultValue'] = True
+    new['Permissions']['Added'] = {'AllowedRoles': [], 'DefaultValue': False}
+    del new['Permissions']['Drop']
+    change_set = ChangeSet.between(BASE, new)
+    assert set(change_set.changes) == {'Edit', 'Added', 'Drop'}
+    assert change_set.changes['Added'][0] is None
+    assert change_set.changes['Drop'][1] is None
+
+
+def test_patch_and_apply_round_trip():
+    new = copy.deepcopy(BASE)
+    new['Permissions']['a/b~c']['AllowedRoles'] = []
+    new['Permissions']['Added'] = {'AllowedRoles': ['PM'], 'DefaultValue': True}
+    del new['Permissions']['Drop']
+    change_set = ChangeSet.between(BASE, new)
+
+    patch = change_set.to_patch()
+    ops = {operation['path']: operation['op'] for operation in patch}
+    assert ops == {'/Permissions/a~1b~0c': 'replace', '/Permissions/Added': 'add', '/Permissions/Drop': 'remove'}
+
+    assert apply_patch(copy.deepcopy(BASE), patch) == new
+    assert change_set.apply(copy.deepcopy(BASE)) == new
@@ -0,0 +1,46 @@
+import json
+import pytest
+from benchmarks.s3_stub import LocalS3Stub
+from src.controllers.s3_transfer import S3Transfer
+from src.permissions import cli
+
+PERMISSIONS = {'Permissions': {
+    'A': {'AllowedRoles': ['FW'], 'DefaultValue': False},
+    'B': {'AllowedRoles': ['HW'], 'DefaultValue': True},
+}}
+
+
+@pytest.fixture
+def transfer():
+    transfer = S3Transfer(LocalS3Stub(), 'b')
+    transfer.client.put_object(Bucket='b', Key=transfer.layout.permissions, Body=json.dumps(PERMISSIONS).encode())
+    return transfer
+
+
+def apply(transfer, tmp_path, capsys, *operations):
+    batch = tmp_path / 'batch.jsonl'
+    batch.write_text('\n'.join(json.dumps(operation) for operation in operations), encoding='utf-8')
+    code = cli.main(['--cache', str(tmp_path / 'cache' / 'permissions.json'), '--json', 'apply', str(batch), '--dry-run'],
+                    transfer=transfer)
+    return code, capsys.readouterr()
+
+
+def test_apply_set_default_accepts_json_and_text_values(transfer, tmp_path, capsys):
+    code, output = apply(transfer, tmp_path, capsys,
+                         {'op': 'set-default', 'names': ['A'], 'value': True},
+                         {'op': 'set-default', 'names': ['B'], 'value': 'no'})
+    assert code == cli.EXIT_OK
+    patch = {entry['path']: entry['value']['DefaultValue'] for entry in json.loads(output.out)}
+    assert patch == {'/Permissions/A': True, '/Permissions/B': False}
+
+
+@pytest.mark.parametrize('operation', [
+    {'op': 'set-default', 'names': ['A']},
+    {'op': 'set-default', 'names': ['A'], 'value': 'maybe'},
+    {'op': 'set-default', 'names': ['A'], 'value': 1},
+])
+def test_apply_rejects_missing_or_invalid_value(transfer, tmp_path, capsys, operation):
+    code, output = apply(transfer, tmp_path, capsys, {'op': 'grant', 'names': ['B'], 'roles': ['Q']}, operation)
+    assert code == cli.EXIT_ERROR
+    assert 'line 2' in output.err
+    assert output.out == ''
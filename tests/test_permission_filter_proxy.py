@@ -0,0 +1,102 @@
+import os
+import pytest
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+QtWidgets = pytest.importorskip('PyQt6.QtWidgets')
+from PyQt6.QtCore import QItemSelectionModel
+from src.models.permission_store import PermissionStore
+from src.ui.permission_filter_proxy import PermissionFilterProxyModel
+from src.ui.permission_table_model import PermissionTableModel
+
+
+@pytest.fixture(scope='module')
+def app():
+    return QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+
+
+def make_models(count=10):
+    store = PermissionStore()
+    for row in range(count):
+        store.append('P%d' % row, row % 2 == 0, ['FW'])
+    model = PermissionTableModel(store)
+    proxy = PermissionFilterProxyModel()
+    proxy.setSourceModel(model)
+    return model, proxy
+
+
+def mask(count, rows):
+    visible = bytearray(count)
+    for row in rows:
+        visible[row] = 1
+    return visible
+
+
+def source_rows(proxy):
+    return [proxy.mapToSource(proxy.index(row, 0)).row() for row in range(proxy.rowCount())]
+
+
+def test_maps_through_visible_rows(app):
+    model, proxy = make_models()
+    assert proxy.rowCount() == 10 and not proxy.has_filter()
+    proxy.set_visible_rows(mask(10, [1, 4, 7]))
+    assert proxy.has_filter()
+    assert source_rows(proxy) == proxy.visible_source_rows() == [1, 4, 7]
+    assert proxy.mapFromSource(model.index(4, 2)).row() == 1
+    assert not proxy.mapFromSource(model.index(5, 0)).isValid()
+    assert proxy.index(0, 0).data() == 'P1'
+    proxy.set_visible_rows(None)
+    assert proxy.rowCount() == 10
+
+
+def test_rank_orders_rows(app):
+    model, proxy = make_models()
+    proxy.set_visible_rows(mask(10, [2, 3, 8]), rank={8: 0, 2: 1, 3: 2})
+    assert source_rows(proxy) == [8, 2, 3]
+    assert proxy.mapFromSource(model.index(3, 0)).row() == 2
+
+
+def test_selection_follows_source_rows(app):
+    model, proxy = make_models()
+    selection = QItemSelectionModel(proxy)
+    proxy.set_visible_rows(mask(10, [1, 4, 7]))
+    selection.select(proxy.index(2, 0), QItemSelectionModel.SelectionFlag.Select | QItemSelectionModel.SelectionFlag.Rows)
+    proxy.set_visible_rows(mask(10, [0, 7, 9]))
+    assert [proxy.mapToSource(index).row() for index in selection.selectedRows()] == [7]
+
+
+def test_appended_rows_stay_hidden_while_filtered(app):
+    model, proxy = make_models()
+    proxy.set_visible_rows(mask(10, [3]))
+    model.append_rows([('P10', True, ['FW']), ('P11', False, [])])
+    assert source_rows(proxy) == [3]
+    proxy.set_visible_rows(None)
+    model.append_rows([('P12', True, [])])
+    assert proxy.rowCount() == 13
+
+
+def test_removed_rows_shift_visible_rows(app):
+    model, proxy = make_models()
+    proxy.set_visible_rows(mask(10, [1, 4, 5, 8]))
+    model.remove_rows([4, 6])
+    assert source_rows(proxy) == [1, 4, 6]
+    assert [proxy.index(row, 0).data() for row in range(proxy.rowCount())] == ['P1', 'P5', 'P8']
+
+
+def test_data_changed_maps_to_visible_range(app):
+    model, proxy = make_models()
+    proxy.set_visible_rows(mask(10, [1, 4, 7]))
+    changed = []
+    proxy.dataChanged.connect(lambda top, bottom, roles: changed.append((top.row(), bottom.row())))
+    model.set_rows([(3, True, []), (5, True, [])])
+    model.update_row(6, True, [])
+    assert changed == [(1, 1)]
+
+
+def test_source_reset_drops_rows_past_the_end(app):
+    model, proxy = make_models()
+    proxy.set_visible_rows(mask(10, [2, 9]))
+    store = PermissionStore()
+    for row in range(5):
+        store.append('Q%d' % row, True, [])
+    model.set_store(store)
+    assert source_rows(proxy) == [2]
@@ -0,0 +1,75 @@
+import io
+from src.models.permission_store import PermissionStore
+from src.models.role_index import RoleIndex, write_access_matrix
+
+ROWS = [
+    ('A', True, ['FW', 'HW']),
+    ('B', False, ['Q']),
+    ('C', False, []),
+    ('D', True, ['CSD_PR', 'Q']),
+]
+
+
+def make_store():
+    store = PermissionStore()
+    for name, default, roles in ROWS:
+        store.append(name, default, roles)
+    return store
+
+
+def test_masks_rows_and_counts():
+    index = RoleIndex(make_store())
+    assert index.mask('Q') == bytearray([0, 1, 0, 1])
+    assert index.mask('Sales') == bytearray(4)
+    assert index.rows('FW') == [0]
+    assert index.rows('Unknown') == []
+    assert index.count('Q') == 2
+    counts = index.counts()
+    assert counts['HW'] == 1 and counts['Sales'] == 0
+
+
+def test_match_is_exact_role_name_with_or():
+    index = RoleIndex(make_store())
+    # "Q" 不會符合 "CSD_PR"
+    assert index.match('q') == bytearray([0, 1, 0, 1])
+    assert index.match('hw, csd_pr') == bytearray([1, 0, 0, 1])
+    assert index.match('nobody') == bytearray(4)
+    assert index.role_named(' fw ') == 'FW'
+    assert index.role_named('F') is None
+
+
+def test_update_rows_only_changes_edited_rows():
+    store = make_store()
+    index = RoleIndex(store)
+    store.set_row(2, False, ['FW', 'Q'])
+    store.set_row(0, True, ['HW'])
+    index.update_rows([0, 2])
+    assert index.mask('FW') == bytearray([0, 0, 1, 0])
+    assert index.mask('HW') == bytearray([1, 0, 0, 0])
+    assert index.mask('Q') == bytearray([0, 1, 1, 1])
+
+
+def test_new_role_after_load_and_extend_truncate():
+    store = make_store()
+    index = RoleIndex(store)
+    store.set_row(1, False, ['Brand_New'])
+    index.update_rows([1])
+    assert index.match('brand_new') == bytearray([0, 1, 0, 0])
+    store.append('E', False, ['Brand_New', 'FW'])
+    index.extend()
+    assert index.mask('FW') == bytearray([1, 0, 0, 0, 1])
+    assert index.mask('Brand_New') == bytearray([0, 1, 0, 0, 1])
+    index.truncate(4)
+    assert len(index) == 4
+    assert index.mask('Brand_New') == bytearray([0, 1, 0, 0])
+
+
+def test_write_access_matrix():
+    file = io.StringIO()
+    assert write_access_matrix(make_store(), file) == 4
+    lines = file.getvalue().splitlines()
+    header = lines[0].split(',')
+    assert header[:2] == ['Permission Name', 'Default Value']
+    first = dict(zip(header, lines[1].split(',')))
+    assert first['Permission Name'] == 'A' and first['Default Value'] == 'True'
+    assert first['FW'] == '1' and first['HW'] == '1' and first['Q'] == '0'
@@ -0,0 +1,89 @@
+import json
+import pytest
+from benchmarks.s3_stub import LocalS3Stub
+from src.controllers import s3_history
+from src.controllers.s3_history import load_index, record_version
+from src.controllers.s3_transfer import S3Transfer
+
+
+@pytest.fixture
+def transfer(monkeypatch):
+    monkeypatch.setattr(s3_history.time, 'sleep', lambda seconds: None)
+    transfer = S3Transfer(LocalS3Stub(), 'bucket')
+    return transfer
+
+
+def publish(transfer, snapshot, change_count=1):
+    # publish_changes 先上傳壓縮快照, 再記錄版本
+    transfer.client.put_object(Bucket='bucket', Key=transfer.layout.compact, Body=snapshot)
+    return record_version(transfer, snapshot, change_count)
+
+
+def test_record_version_creates_and_appends(transfer):
+    first = publish(transfer, b'v1')
+    second = publish(transfer, b'v2', 3)
+    versions = load_index(transfer)['versions']
+    assert [version['id'] for version in versions] == [first['id'], second['id']]
+    assert versions[1]['changes'] == 3
+    assert transfer.get_bytes(second['key']) == b'v2'
+
+
+def test_concurrent_writer_is_not_overwritten(transfer):
+    publish(transfer, b'v1')
+    stub = transfer.client
+    put_object = stub.put_object
+    raced = []
+
+    def racing_put(Bucket, Key, Body, **kwargs):
+        # 另一個人在我們讀取索引之後、寫回之前記錄了自己的版本
+        if Key == transfer.layout.history_index and not raced:
+            raced.append(True)
+            index = json.loads(stub.objects[Key][0])
+            index['versions'].append({'id': 'other', 'key': 'other.pcs', 'timestamp': '', 'size': 0,
+                                      'changes': 1, 'patch': None})
+            stub._store(Key, json.dumps(index).encode('utf-8'))
+        return put_object(Bucket, Key, Body, **kwargs)
+
+    stub.put_object = racing_put
+    mine = publish(transfer, b'v2')
+    ids = [version['id'] for version in load_index(transfer)['versions']]
+    assert ids[1:] == ['other', mine['id']]
+    # 重試時不會再複製一次快照
+    assert sum(1 for call in stub.calls if call == ('copy_object', mine['key'])) == 1
+
+
+def test_first_index_is_created_only_once(transfer):
+    stub = transfer.client
+    put_object = stub.put_object
+    raced = []
+
+    def racing_put(Bucket, Key, Body, **kwargs):
+        if Key == transfer.layout.history_index and not raced:
+            raced.append(True)
+            stub._store(Key, json.dumps({'versions': [{'id': 'other'}]}).encode('utf-8'))
+        return put_object(Bucket, Key, Body, **kwargs)
+
+    stub.put_object = racing_put
+    mine = publish(transfer, b'v1')
+    assert [version['id'] for version in load_index(transfer)['versions']] == ['other', mine['id']]
+
+
+def test_gives_up_when_index_keeps_changing(transfer):
+    publish(transfer, b'v1')
+    stub = transfer.client
+    put_object = stub.put_object
+
+    def always_racing(Bucket, Key, Body, **kwargs):
+        if Key == transfer.layout.history_index:
+            stub._store(Key, stub.objects[Key][0] + b' ')
+        return put_object(Bucket, Key, Body, **kwargs)
+
+    stub.put_object = always_racing
+    with pytest.raises(RuntimeError):
+        publish(transfer, b'v2')
+
+
+def test_index_keeps_only_recent_versions(transfer, monkeypatch):
+    monkeypatch.setattr(s3_history, 'INDEX_LIMIT', 3)
+    ids = [publish(transfer, f"v{number}".encode())['id'] for number in range(5)]
+    assert [version['id'] for version in load_index(transfer)['versions']] == ids[-3:]
@@ -0,0 +1,35 @@
+from benchmarks.s3_stub import LocalS3Stub
+from src.controllers import s3_cache
+from src.controllers.s3_transfer import S3Transfer
+
+
+class RecordingProgress:
+    def __init__(self):
+        self.total = None
+        self.amounts = []
+
+    def set_total(self, total_bytes):
+        self.total = total_bytes
+
+    def __call__(self, bytes_amount):
+        self.amounts.append(bytes_amount)
+
+
+def test_download_reports_content_length_before_chunks(tmp_path, monkeypatch):
+    monkeypatch.setattr(s3_cache, 'CHUNK_SIZE', 1000)
+    stub = LocalS3Stub()
+    data = bytes(range(256)) * 20
+    stub.put_object(Bucket='b', Key='permissions.json', Body=data)
+    transfer = S3Transfer(stub, 'b')
+    progress = RecordingProgress()
+
+    path = str(tmp_path / 'permissions.json')
+    assert transfer.conditional_download('permissions.json', path, progress)
+    assert progress.total == len(data)
+    assert sum(progress.amounts) == len(data) and len(progress.amounts) == 6
+    assert transfer.stats.bytes_received == len(data)
+
+    # 沒有變動 (304) 時不傳輸
+    progress = RecordingProgress()
+    assert not transfer.conditional_download('permissions.json', path, progress)
+    assert progress.amounts == []
@@ -0,0 +1,130 @@
+import json
+import pytest
+from benchmarks.s3_stub import LocalS3Stub
+from src.controllers import s3_history
+from src.controllers.s3_publish import RemoteChangedError
+from src.controllers.s3_transfer import S3Transfer
+from src.models.snapshot_format import encode_compact, decode_snapshot
+from src.permissions import permission_set as permission_set_module
+from src.permissions.permission_set import PermissionSet
+
+PERMISSIONS = {'Permissions': {
+    'A': {'AllowedRoles': ['FW'], 'DefaultValue': False},
+    'B': {'AllowedRoles': ['HW'], 'DefaultValue': False},
+}}
+
+
+@pytest.fixture
+def transfer(monkeypatch):
+    monkeypatch.setattr(s3_history.time, 'sleep', lambda seconds: None)
+    transfer = S3Transfer(LocalS3Stub(), 'b')
+    layout = transfer.layout
+    transfer.client.put_object(Bucket='b', Key=layout.permissions, Body=json.dumps(PERMISSIONS).encode())
+    transfer.client.put_object(Bucket='b', Key=layout.compact, Body=encode_compact(PERMISSIONS))
+    return transfer
+
+
+def open_set(transfer, tmp_path, name):
+    permission_set = PermissionSet(transfer=transfer, local_json_path=str(tmp_path / name / 'permissions.json'))
+    permission_set.load()
+    return permission_set
+
+
+def remote(transfer):
+    return decode_snapshot(transfer.get_bytes(transfer.layout.compact))['Permissions']
+
+
+def race_before_snapshot_put(transfer, other_save, times=1):
+    # 另一個人在我們檢查 S3 版本之後、寫入快照之前存檔
+    stub = transfer.client
+    put_object = stub.put_object
+    raced = []
+    saving = []
+
+    def racing_put(Bucket, Key, Body, **kwargs):
+        if Key == transfer.layout.compact and len(raced) < times and not saving:
+            raced.append(True)
+            saving.append(True)
+            other_save(len(raced))
+            saving.pop()
+        return put_object(Bucket, Key, Body, **kwargs)
+
+    stub.put_object = racing_put
+    return raced
+
+
+def test_save_merges_again_when_snapshot_changed_during_save(transfer, tmp_path):
+    mine = open_set(transfer, tmp_path, 'mine')
+    other = open_set(transfer, tmp_path, 'other')
+    mine.grant(['Q'], [mine.row_of('A')])
+    other.grant(['PM'], [other.row_of('B')])
+
+    raced = race_before_snapshot_put(transfer, lambda count: other.save())
+    result = mine.save()
+    assert raced == [True]
+    assert result.merged
+    entries = remote(transfer)
+    assert entries['A']['AllowedRoles'] == ['FW', 'Q']
+    assert entries['B']['AllowedRoles'] == ['HW', 'PM']
+    # 本地也採用合併後的版本
+    assert mine.who_can('B') == ['HW', 'PM']
+
+
+def test_save_gives_up_after_repeated_conflicts(transfer, tmp_path):
+    mine = open_set(transfer, tmp_path, 'mine')
+    mine.grant(['Q'], [mine.row_of('A')])
+
+    def other_save(count):
+        other = open_set(transfer, tmp_path, f'other{count}')
+        other.set_default(count % 2 == 1, [other.row_of('B')])
+        other.save()
+
+    race_before_snapshot_put(transfer, other_save, times=permission_set_module.SAVE_ATTEMPTS)
+    with pytest.raises(RemoteChangedError):
+        mine.save()
+    assert remote(transfer)['A']['AllowedRoles'] == ['FW']
+
+
+def test_first_snapshot_is_created_only_if_absent(transfer, tmp_path):
+    stub = transfer.client
+    del stub.objects[transfer.layout.compact]
+    mine = open_set(transfer, tmp_path, 'mine')
+    assert mine.base_meta['Key'] == transfer.layout.permissions
+    mine.grant(['Q'], [mine.row_of('A')])
+    # 只寫 JSON 的其他人 (還沒有快照) 同時修改了 B
+    other = json.loads(transfer.get_bytes(transfer.layout.permissions))
+    other['Permissions']['B']['AllowedRoles'] = ['REMOTE']
+    stub.put_object(Bucket='b', Key=transfer.layout.permissions, Body=json.dumps(other).encode())
+    mine.save()
+    assert remote(transfer)['A']['AllowedRoles'] == ['FW', 'Q']
+    assert remote(transfer)['B']['AllowedRoles'] == ['REMOTE']
+    # 基準還是 JSON 時一定匯出
+    exported = json.loads(transfer.get_bytes(transfer.layout.permissions))['Permissions']
+    assert exported['A']['AllowedRoles'] == ['FW', 'Q'] and exported['B']['AllowedRoles'] == ['REMOTE']
+
+
+def test_plain_save_round_trips_and_periodic_export(transfer, tmp_path):
+    layout = transfer.layout
+    stub = transfer.client
+    mine = open_set(transfer, tmp_path, 'mine')
+
+    # 第一次存檔: 還沒有匯出過, 連同 JSON 一起上傳
+    mine.grant(['Q'], [mine.row_of('A')])
+    mine.save()
+    assert json.loads(transfer.get_bytes(layout.permissions))['Permissions']['A']['AllowedRoles'] == ['FW', 'Q']
+
+    # 之後的存檔: 不 HEAD, JSON 留到下次匯出; 下載快取的 ETag 取自 PutObject 的回應
+    del stub.calls[:]
+    mine.grant(['PM'], [mine.row_of('B')])
+    mine.save()
+    operations = [operation for operation, _ in stub.calls]
+    assert operations == ['put_object', 'upload_fileobj', 'get_object', 'copy_object', 'put_object']
+    assert remote(transfer)['B']['AllowedRoles'] == ['HW', 'PM']
+    assert json.loads(transfer.get_bytes(layout.permissions))['Permissions']['B']['AllowedRoles'] == ['HW']
+    assert mine.base_meta['ETag'] == stub.etag_of(transfer.get_bytes(layout.compact))
+
+    mine.set_default(True, [mine.row_of('B')])
+    mine.save(export_json=True)
+    exported = json.loads(transfer.get_bytes(layout.permissions))['Permissions']
+    assert exported['B'] == {'AllowedRoles': ['HW', 'PM'], 'DefaultValue': True}
+    assert json.loads(transfer.get_bytes(layout.backup))['Permissions']['B']['AllowedRoles'] == ['HW']
@@ -0,0 +1,112 @@
+import random
+import pytest
+from src.models.permission_store import PermissionStore
+from src.models.search_index import SearchIndex, find_rows, rows_of
+
+NAMES = ['Motor_Bank 1 CRC', 'Motor_Bank 2 CRC', 'Battery_Temperature 1', 'battery_voltage', 'Charger_Mode', 'BANKED']
+
+
+def make_store(names=NAMES):
+    store = PermissionStore()
+    for row, name in enumerate(names):
+        store.append(name, row % 2 == 0, ['FW', 'HW'] if row % 3 == 0 else ['Battery'])
+    return store
+
+
+def expected(names, text):
+    return bytearray(text.lower() in name.lower() for name in names)
+
+
+def test_match_name_is_case_insensitive_substring():
+    index = SearchIndex(make_store())
+    assert index.match_name('bank') == bytearray([1, 1, 0, 0, 0, 1])
+    assert index.match_name('BATTERY_') == bytearray([0, 0, 1, 1, 0, 0])
+    assert index.match_name('') == index.all_rows()
+    assert index.match_name('zzz') == index.no_rows()
+
+
+def test_match_name_does_not_cross_row_boundaries():
+    index = SearchIndex(make_store())
+    # haystack 以 '\n' 串接, 跨兩列的字串不應該符合
+    assert index.match_name('crc\nmotor') == index.no_rows()
+    assert index.match_name('crcmotor') == index.no_rows()
+    assert index.match_name('crc') == bytearray([1, 1, 0, 0, 0, 0])
+
+
+def test_match_name_typing_and_backspace_match_full_scan():
+    rng = random.Random(3)
+    words = ['motor', 'bank', 'crc', 'temperature', 'battery', 'mode', 'fw']
+    names = [f"{rng.choice(words)}_{rng.choice(words)} {rng.randrange(100)}" for _ in range(2000)]
+    index = SearchIndex(make_store(names))
+    for word in ['bank 1', 'temperature 9', 'mo', 'zz']:
+        for length in list(range(1, len(word) + 1)) + list(range(len(word) - 1, 0, -1)):
+            text = word[:length]
+            assert index.match_name(text) == expected(names, text), text
+
+
+def test_match_name_result_is_a_copy():
+    index = SearchIndex(make_store())
+    result = index.match_name('bank')
+    result[0] = 0
+    assert index.match_name('bank')[0] == 1
+    assert index.match_name('bank 1') == bytearray([1, 0, 0, 0, 0, 0])
+
+
+def test_match_name_after_extend_and_truncate():
+    store = make_store()
+    index = SearchIndex(store)
+    assert index.match_name('bank') == bytearray([1, 1, 0, 0, 0, 1])
+    store.append('New_Bank', False, [])
+    index.extend()
+    assert index.match_name('bank') == bytearray([1, 1, 0, 0, 0, 1, 1])
+    store.delete_range(6, 6)
+    index.truncate(6)
+    assert index.match_name('bank') == bytearray([1, 1, 0, 0, 0, 1])
+    assert index.match_name('new') == index.no_rows()
+
+
+def test_find_rows_switches_to_scan_for_common_text():
+    names = ['ab' * (row % 5 + 1) for row in range(1000)]
+    lower = [name.lower() for name in names]
+    offsets, offset = [], 0
+    for name in lower:
+        offsets.append(offset)
+        offset += len(name) + 1
+    haystack = '\n'.join(lower)
+    for text in ['a', 'abab', 'ababababab', 'b\na', 'x']:
+        assert find_rows(haystack, offsets, lower, text) == expected(names, text)
+
+
+@pytest.mark.parametrize('hits', [0, 1, 10, 500, 1000])
+def test_rows_of(hits):
+    mask = bytearray(1000)
+    rows = sorted(random.Random(hits).sample(range(1000), hits))
+    for row in rows:
+        mask[row] = 1
+    assert rows_of(mask) == rows
+
+
+def test_match_prefix():
+    index = SearchIndex(make_store())
+    assert sorted(index.match_prefix('bat')) == [2, 3]
+    assert sorted(index.match_prefix('BANK')) == [5]
+    assert index.match_prefix('q') == []
+
+
+def test_match_roles_and_combine():
+    store = make_store()
+    index = SearchIndex(store)
+    fw = index.match_roles('fw')
+    assert fw == bytearray([1, 0, 0, 1, 0, 0])
+    assert index.match_roles('  ') == index.all_rows()
+    both = SearchIndex.combine(fw, index.match_name('battery'))
+    assert both == bytearray([0, 0, 0, 1, 0, 0])
+
+
+def test_update_rows_refreshes_role_results():
+    store = make_store()
+    index = SearchIndex(store)
+    store.set_row(1, True, ['FW'])
+    index.update_row(1)
+    assert index.match_roles('FW') == bytearray([1, 1, 0, 1, 0, 0])
+    assert index.match_roles('Battery') == bytearray([0, 0, 1, 0, 1, 1])
@@ -0,0 +1,88 @@
+import io
+import gzip
+import json
+import pytest
+from src.models import stream_parser
+from src.models.stream_parser import PermissionStreamParser, iter_snapshot_batches
+from src.models.snapshot_format import encode_compact
+
+PERMISSIONS = {
+    'Version': 1.5e10,
+    'Offset': -0.25,
+    'Zero': -0.0,
+    'Count': 12345,
+    'Permissions': {
+        'Motor_Bank 1 CRC': {'AllowedRoles': ['FW', 'HW'], 'DefaultValue': True},
+        'Motor_"quoted"\\path': {'AllowedRoles': [], 'DefaultValue': False},
+        '電池_溫度 2': {'AllowedRoles': ['Battery'], 'DefaultValue': False},
+        'Empty': {},
+    },
+    'Tail': [1e-3, 2E+4, None, True],
+}
+
+
+def parse(text, read_size, monkeypatch, batch_size=2):
+    # 以很小的 READ_SIZE 讓每個值都有機會被切在 chunk 邊界
+    monkeypatch.setattr(stream_parser, 'READ_SIZE', read_size)
+    parser = PermissionStreamParser(io.StringIO(text), batch_size)
+    rows = [row for batch in parser.batches() for row in batch]
+    return rows, parser.extra
+
+
+def expected_rows(permissions):
+    return [(name, value.get('DefaultValue', False), value.get('AllowedRoles', []))
+            for name, value in permissions['Permissions'].items()]
+
+
+@pytest.mark.parametrize('read_size', range(1, 12))
+@pytest.mark.parametrize('indent', [None, 2])
+def test_values_split_at_chunk_boundaries(read_size, indent, monkeypatch):
+    text = json.dumps(PERMISSIONS, indent=indent, ensure_ascii=False)
+    rows, extra = parse(text, read_size, monkeypatch)
+    assert rows == expected_rows(PERMISSIONS)
+    assert extra == {key: value for key, value in PERMISSIONS.items() if key != 'Permissions'}
+
+
+@pytest.mark.parametrize('number', ['1.5e10', '-0.25', '-0.0', '1E-7', '123456789', '0'])
+def test_numbers_at_every_split_position(number, monkeypatch):
+    text = '{"Z": %s, "Permissions": {}}' % number
+    for read_size in range(1, len(text) + 1):
+        rows, extra = parse(text, read_size, monkeypatch)
+        assert rows == []
+        assert extra == {'Z': json.loads(number)}
+
+
+def test_batches_respect_batch_size(monkeypatch):
+    permissions = {'Permissions': {f"P{i}": {'AllowedRoles': ['FW'], 'DefaultValue': i % 2 == 0} for i in range(7)}}
+    monkeypatch.setattr(stream_parser, 'READ_SIZE', 16)
+    parser = PermissionStreamParser(io.StringIO(json.dumps(permissions)), batch_size=3)
+    assert [len(batch) for batch in parser.batches()] == [3, 3, 1]
+
+
+@pytest.mark.parametrize('value', ['[]', '"FW"', '1', 'null'])
+def test_non_object_permission_raises_value_error(value, monkeypatch):
+    text = '{"Permissions": {"A": {"AllowedRoles": [], "DefaultValue": false}, "B": %s}}' % value
+    with pytest.raises(ValueError):
+        parse(text, 4, monkeypatch)
+
+
+@pytest.mark.parametrize('text', ['{"Permissions": {"A": {"AllowedRoles": ["FW"]', '{"Permissions": {"A" {}}}', ''])
+def test_invalid_or_truncated_json_raises_value_error(text, monkeypatch):
+    with pytest.raises(ValueError):
+        parse(text, 3, monkeypatch)
+
+
+def test_snapshot_files(tmp_path):
+    permissions = {'Version': 2, 'Permissions': PERMISSIONS['Permissions']}
+    json_path = tmp_path / 'permissions.json'
+    json_path.write_text(json.dumps(permissions, indent=4, ensure_ascii=False), encoding='utf-8-sig')
+    compact_path = tmp_path / 'permissions.pcs'
+    compact_path.write_bytes(encode_compact(permissions))
+    gzip_path = tmp_path / 'permissions.json.gz'
+    gzip_path.write_bytes(gzip.compress(json.dumps(permissions).encode('utf-8')))
+    for path in (json_path, compact_path, gzip_path):
+        extra = {}
+        batches = list(iter_snapshot_batches(str(path), batch_size=3, extra=extra))
+        assert [len(batch) for batch in batches] == [3, 1]
+        assert [row for batch in batches for row in batch] == expected_rows(permissions)
+        assert extra == {'Version': 2}
@@ -0,0 +1,80 @@
+import copy
+from src.models.change_set import ChangeSet
+from src.models.three_way_merge import (
+    merge_changes, merge_entry, merge_roles, ENTRY_FIELD, RESOLVE_LOCAL, RESOLVE_REMOTE
+)
+
+
+def entry(roles, default=False):
+    return {'AllowedRoles': roles, 'DefaultValue': default}
+
+
+BASE = {'Permissions': {
+    'A': entry(['FW']),
+    'B': entry(['HW']),
+    'C': entry([], True),
+}}
+
+
+def local_changes(**after):
+    change_set = ChangeSet()
+    for name, value in after.items():
+        change_set.record(name, BASE['Permissions'].get(name), value)
+    return change_set
+
+
+def test_merge_roles_applies_local_additions_and_removals_to_remote():
+    assert merge_roles(['FW', 'HW'], ['FW', 'Q'], ['FW', 'HW', 'PM']) == ['FW', 'PM', 'Q']
+    assert merge_roles([], ['Q'], ['Q']) == ['Q']
+
+
+def test_merge_entry():
+    base = entry(['FW'])
+    assert merge_entry(base, entry(['FW'], True), base) == (entry(['FW'], True), [])
+    assert merge_entry(base, base, entry(['HW'])) == (entry(['HW']), [])
+    merged, fields = merge_entry(base, entry(['FW', 'Q']), entry(['FW', 'HW'], True))
+    assert fields == [] and merged == entry(['FW', 'HW', 'Q'], True)
+    # 兩邊都改了 DefaultValue 且不同
+    merged, fields = merge_entry(base, entry(['FW', 'Q'], True), entry(['FW'], 'remote'))
+    assert fields == ['DefaultValue'] and merged['AllowedRoles'] == ['FW', 'Q']
+    # 一邊刪除一邊修改
+    assert merge_entry(base, None, entry(['HW'])) == (None, [ENTRY_FIELD])
+
+
+def test_merge_changes_auto_merges_and_keeps_remote_edits():
+    remote = copy.deepcopy(BASE)
+    remote['Permissions']['B'] = entry(['HW', 'PM'])
+    remote['Permissions']['D'] = entry(['Sales'])
+    result = merge_changes(local_changes(A=entry(['FW'], True), B=entry(['HW', 'Q'])), remote)
+    assert not result.conflicts
+    assert result.auto_merged == ['B']
+    entries = result.permissions['Permissions']
+    assert entries['A'] == entry(['FW'], True)
+    assert entries['B'] == entry(['HW', 'PM', 'Q'])
+    assert entries['D'] == entry(['Sales'])
+    # 上傳的變更相對於 S3 版本
+    assert set(result.change_set.changes) == {'A', 'B'}
+    assert result.change_set.changes['B'][0] == entry(['HW', 'PM'])
+    # 不修改傳入的 S3 版本
+    assert remote['Permissions']['B'] == entry(['HW', 'PM'])
+
+
+def test_conflicts_and_resolve():
+    remote = copy.deepcopy(BASE)
+    del remote['Permissions']['C']
+    remote['Permissions']['A'] = entry(['FW', 'HW'], 'remote')
+    changes = local_changes(A=entry(['FW', 'Q'], 'local'), C=entry(['Q'], True))
+
+    result = merge_changes(changes, remote)
+    assert sorted(conflict.name for conflict in result.conflicts) == ['A', 'C']
+    result.resolve({'A': RESOLVE_LOCAL, 'C': RESOLVE_REMOTE})
+    entries = result.permissions['Permissions']
+    # 衝突欄位取本地, 角色仍然合併
+    assert entries['A'] == entry(['FW', 'HW', 'Q'], 'local')
+    assert 'C' not in entries
+    assert not result.conflicts
+
+    result = merge_changes(changes, remote).resolve({'C': RESOLVE_LOCAL})
+    entries = result.permissions['Permissions']
+    assert entries['C'] == entry(['Q'], True)
+    assert entries['A'] == entry(['FW', 'HW', 'Q'], 'remote')